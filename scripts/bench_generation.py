@@ -0,0 +1,260 @@
+"""
+数据生成吞吐量基准测试
+
+并发驱动 /generate/start 与 /generate/stream，报告：
+- 吞吐量（条/秒）
+- 单条生成延迟 p50 / p99 以及首个事件时间
+- 事件循环延迟（仅进程内模式）
+- 内存峰值（仅进程内模式）
+
+默认在本进程内启动模拟大模型服务器（独立线程）和 API 服务器（当前事件循环），
+这样可以直接测量 API 服务器的事件循环延迟。指定 --target 时改为压测已启动的服务器。
+
+运行: uv run python -m scripts.bench_generation --tasks 50 --count 20 --latency-ms 300
+"""
+
+import argparse
+import asyncio
+import json
+import socket
+import statistics
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import httpx
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent.parent
+sys.path.append(str(project_root))
+
+from scripts.mock_llm_server import add_mock_arguments, config_from_args, create_app
+
+
+def percentile(values: List[float], pct: float) -> Optional[float]:
+    """计算百分位数（最近秩法）"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100 * len(ordered) + 0.5)) - 1))
+    return round(ordered[index], 3)
+
+
+def free_port() -> int:
+    """获取一个空闲端口"""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def peak_rss_mb() -> Optional[float]:
+    """当前进程的内存峰值（MB），不支持的平台返回 None"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux 单位为 KB，macOS 为字节
+    return round(usage / 1024 / (1024 if sys.platform == "darwin" else 1), 1)
+
+
+class LoopLagMonitor:
+    """通过定时 sleep 的超时量测量事件循环延迟"""
+
+    def __init__(self, interval: float = 0.01):
+        self.interval = interval
+        self.lags: List[float] = []
+        self._task: Optional[asyncio.Task] = None
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            start = loop.time()
+            await asyncio.sleep(self.interval)
+            self.lags.append(max(0.0, loop.time() - start - self.interval) * 1000)
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    def summary(self) -> Dict[str, Optional[float]]:
+        return {
+            "p50_ms": percentile(self.lags, 50),
+            "p99_ms": percentile(self.lags, 99),
+            "max_ms": max(self.lags) if self.lags else None,
+        }
+
+
+def start_mock_server(args: argparse.Namespace) -> str:
+    """在独立线程中启动模拟大模型服务器，返回其 base_url"""
+    import uvicorn
+
+    port = free_port()
+    server = uvicorn.Server(uvicorn.Config(
+        create_app(config_from_args(args)), host="127.0.0.1", port=port, log_level="warning"
+    ))
+    thread = threading.Thread(target=server.run, daemon=True, name="mock-llm")
+    thread.start()
+    while not server.started:
+        time.sleep(0.01)
+    return f"http://127.0.0.1:{port}/v1"
+
+
+async def start_api_server() -> tuple:
+    """在当前事件循环中启动 API 服务器，返回 (server, serve_task, url)"""
+    import uvicorn
+    from server.main import app
+
+    port = free_port()
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    serve_task = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.01)
+    return server, serve_task, f"http://127.0.0.1:{port}"
+
+
+async def run_task(client: httpx.AsyncClient, target: str, payload: Dict, results: Dict):
+    """启动一个生成任务并消费其事件流，记录各条数据的到达时间"""
+    start = time.perf_counter()
+    response = await client.post(f"{target}/generate/start", json=payload)
+    response.raise_for_status()
+    task_id = response.json()["task_id"]
+
+    last = time.perf_counter()
+    first_event = None
+    first_delta = None
+    items = 0
+    async with client.stream("GET", f"{target}/generate/stream/{task_id}") as stream:
+        async for line in stream.aiter_lines():
+            if not line.startswith("data: "):
+                continue
+            now = time.perf_counter()
+            if first_event is None:
+                first_event = now - start
+            event = json.loads(line[6:])
+            if event.get("type") == "delta":
+                if first_delta is None:
+                    first_delta = now - start
+                continue
+            if "latest_text" in event:
+                items += 1
+                results["item_latencies_ms"].append((now - last) * 1000)
+                last = now
+
+    results["first_event_ms"].append((first_event or 0) * 1000)
+    if first_delta is not None:
+        results["first_delta_ms"].append(first_delta * 1000)
+    results["items"] += items
+    results["tasks_done"] += 1
+
+
+async def run_benchmark(args: argparse.Namespace) -> Dict:
+    """运行基准测试并返回汇总结果"""
+    monitor = None
+    api_server = None
+    serve_task = None
+
+    if args.target:
+        target = args.target.rstrip("/")
+        base_url = args.llm_base_url
+        if not base_url:
+            raise SystemExit("压测远程服务器时需要通过 --llm-base-url 指定模拟大模型服务器地址")
+    else:
+        base_url = args.llm_base_url or start_mock_server(args)
+        api_server, serve_task, target = await start_api_server()
+        monitor = LoopLagMonitor()
+        monitor.start()
+
+    payload = {
+        "api_key": "mock",
+        "base_url": base_url,
+        "model": "mock-model",
+        "system_prompt": "你是数据生成助手",
+        "user_prompt": "生成一条客服对话文本",
+        "count": args.count,
+        "parse_regex": r"文本[:：]\s*(?P<text>[^\n]+)\n标签[:：]\s*(?P<labels>.+)",
+        "dedup_mode": args.dedup_mode,
+        "cache_policy": "off",
+        "stream_tokens": args.stream_tokens,
+    }
+    results = {"items": 0, "tasks_done": 0, "item_latencies_ms": [], "first_event_ms": [], "first_delta_ms": []}
+
+    limits = httpx.Limits(max_connections=args.tasks * 2 + 10)
+    start = time.perf_counter()
+    async with httpx.AsyncClient(timeout=httpx.Timeout(None), limits=limits) as client:
+        outcomes = await asyncio.gather(
+            *(run_task(client, target, payload, results) for _ in range(args.tasks)),
+            return_exceptions=True
+        )
+    elapsed = time.perf_counter() - start
+
+    if monitor:
+        await monitor.stop()
+    if api_server:
+        api_server.should_exit = True
+        await serve_task
+
+    failures = [repr(o) for o in outcomes if isinstance(o, Exception)]
+    latencies = results["item_latencies_ms"]
+    first_delta = results["first_delta_ms"]
+    return {
+        "config": {
+            "tasks": args.tasks,
+            "count_per_task": args.count,
+            "stream_tokens": args.stream_tokens,
+            "dedup_mode": args.dedup_mode,
+            "latency_dist": args.latency_dist,
+            "latency_ms": args.latency_ms,
+            "error_rate": args.error_rate,
+            "output_chars": args.output_chars,
+            "mode": "remote" if args.target else "in-process",
+        },
+        "elapsed_s": round(elapsed, 3),
+        "tasks_completed": results["tasks_done"],
+        "task_failures": failures,
+        "items": results["items"],
+        "items_per_s": round(results["items"] / elapsed, 2) if elapsed else None,
+        "item_latency_ms": {
+            "p50": percentile(latencies, 50),
+            "p99": percentile(latencies, 99),
+            "mean": round(statistics.fmean(latencies), 2) if latencies else None,
+        },
+        "first_event_ms_p50": percentile(results["first_event_ms"], 50),
+        "first_delta_ms_p50": percentile(first_delta, 50),
+        "event_loop_lag": monitor.summary() if monitor else None,
+        "peak_rss_mb": peak_rss_mb() if not args.target else None,
+    }
+
+
+def main():
+    """命令行入口"""
+    parser = argparse.ArgumentParser(description="数据生成吞吐量基准测试")
+    parser.add_argument("--tasks", type=int, default=20, help="并发生成任务数")
+    parser.add_argument("--count", type=int, default=10, help="每个任务生成的数量")
+    parser.add_argument("--stream-tokens", action="store_true", help="启用 token 流式转发")
+    parser.add_argument("--dedup-mode", choices=["off", "flag", "retry"], default="flag")
+    parser.add_argument("--target", help="压测已启动的 API 服务器（如 http://localhost:8000）")
+    parser.add_argument("--llm-base-url", help="使用已启动的模拟大模型服务器（如 http://localhost:9000/v1）")
+    parser.add_argument("--output", help="将结果写入 JSON 文件")
+    add_mock_arguments(parser)
+    args = parser.parse_args()
+
+    summary = asyncio.run(run_benchmark(args))
+    text = json.dumps(summary, ensure_ascii=False, indent=2)
+    print(text)
+    if args.output:
+        Path(args.output).write_text(text, encoding="utf-8")
+        print(f"结果已保存到: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
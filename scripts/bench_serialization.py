@@ -0,0 +1,130 @@
+"""
+搜索响应序列化基准
+
+对比搜索接口的两条路径，并校验两者输出逐字节一致：
+- 原路径：ORM 对象 → AnnotationDataResponse.from_orm（逐行校验标签）→ response_model 序列化 → json.dumps
+- 快速路径：(id, text, labels) 元组 → 缓存的标签规范化 → orjson（未安装时回退到 json）
+
+同时单独测量 SQL 耗时，报告序列化在总耗时中的占比。
+
+运行: uv run python -m scripts.bench_serialization --rows 100k --per-page 50,1000 --repeat 20
+"""
+
+import argparse
+import json
+import logging
+import sys
+from pathlib import Path
+from typing import Dict
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent.parent
+sys.path.append(str(project_root))
+
+from pydantic import TypeAdapter
+from sqlalchemy.orm import sessionmaker
+from starlette.responses import JSONResponse
+
+from scripts.benchmark_suite import DEFAULT_DATA_DIR, build_database, format_scale, measure, summarize
+from scripts.synth_corpus import CorpusGenerator, parse_rows
+from server import fast_json, schemas
+from server.models import AnnotationData, create_db_engine
+from server.services import AnnotationService
+
+_LIST_ADAPTER = TypeAdapter(schemas.AnnotationDataList)
+
+
+def legacy_response(service: AnnotationService, request: schemas.SearchRequest) -> bytes:
+    """模拟原路径：构建 Pydantic 模型，按 response_model 序列化后由 JSONResponse 渲染"""
+    result = service.search_annotations(request)
+    content = _LIST_ADAPTER.dump_python(_LIST_ADAPTER.validate_python(result), mode="json")
+    return JSONResponse(content).body
+
+
+def sql_only(service: AnnotationService, request: schemas.SearchRequest):
+    """只执行快速路径中的 SQL 部分（总数 + 元组查询）"""
+    query = service._build_search_query(request)
+    service._count_query(query)
+    offset = (request.page - 1) * request.per_page
+    return query.with_entities(
+        AnnotationData.id, AnnotationData.text, AnnotationData.labels
+    ).offset(offset).limit(request.per_page).all()
+
+
+def run_case(service: AnnotationService, request: schemas.SearchRequest, repeat: int, warmup: int) -> Dict:
+    """测量一个搜索请求在两条路径上的耗时并校验输出一致"""
+    legacy_body = legacy_response(service, request)
+    fast_body = service.search_annotations_json(request)
+    orjson_module, fast_json.orjson = fast_json.orjson, None
+    try:
+        fallback_body = service.search_annotations_json(request)
+    finally:
+        fast_json.orjson = orjson_module
+
+    sql = summarize(measure(lambda: sql_only(service, request), repeat, warmup))
+    legacy = summarize(measure(lambda: legacy_response(service, request), repeat, warmup))
+    fast = summarize(measure(lambda: service.search_annotations_json(request), repeat, warmup))
+
+    def share(total: Dict) -> float:
+        return round(max(0.0, total["p50_ms"] - sql["p50_ms"]) / total["p50_ms"], 3)
+
+    return {
+        "identical": legacy_body == fast_body,
+        "identical_stdlib_fallback": legacy_body == fallback_body,
+        "response_bytes": len(fast_body),
+        "sql_p50_ms": sql["p50_ms"],
+        "legacy_p50_ms": legacy["p50_ms"],
+        "fast_p50_ms": fast["p50_ms"],
+        "speedup": round(legacy["p50_ms"] / fast["p50_ms"], 2),
+        "legacy_serialization_share": share(legacy),
+        "fast_serialization_share": share(fast),
+    }
+
+
+def main():
+    """命令行入口"""
+    parser = argparse.ArgumentParser(description="搜索响应序列化基准")
+    parser.add_argument("--rows", default="100k", help="合成数据规模")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--data-dir", default=str(DEFAULT_DATA_DIR))
+    parser.add_argument("--per-page", default="50,1000", help="逗号分隔的每页条数")
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--warmup", type=int, default=2)
+    parser.add_argument("--output", help="将结果写入 JSON 文件")
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+    rows = parse_rows(args.rows)
+    db_path = build_database(Path(args.data_dir) / f"bench_{format_scale(rows)}_seed{args.seed}.db", rows, args.seed)
+    engine = create_db_engine(f"sqlite:///{db_path}")
+    db = sessionmaker(bind=engine)()
+    service = AnnotationService(db)
+    label = CorpusGenerator(seed=args.seed).catalog[0].label
+
+    results = {}
+    for per_page in (int(p) for p in args.per_page.split(",")):
+        cases = {
+            f"page1.per_page_{per_page}": schemas.SearchRequest(page=1, per_page=per_page),
+            f"labels.per_page_{per_page}": schemas.SearchRequest(labels=label, per_page=per_page),
+        }
+        for name, request in cases.items():
+            results[name] = run_case(service, request, args.repeat, args.warmup)
+
+    db.close()
+    engine.dispose()
+
+    report = {"rows": rows, "orjson": fast_json.orjson is not None, "cases": results}
+    print(f"{'用例':<26}{'SQL':>8}{'原路径':>9}{'快速路径':>10}{'加速':>7}{'序列化占比(前→后)':>20}{'一致':>6}")
+    for name, r in results.items():
+        shares = f"{r['legacy_serialization_share']:.0%} → {r['fast_serialization_share']:.0%}"
+        identical = "是" if r["identical"] and r["identical_stdlib_fallback"] else "否"
+        print(f"{name:<26}{r['sql_p50_ms']:>8.2f}{r['legacy_p50_ms']:>9.2f}{r['fast_p50_ms']:>10.2f}"
+              f"{r['speedup']:>7.2f}{shares:>20}{identical:>6}")
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+    if not all(r["identical"] and r["identical_stdlib_fallback"] for r in results.values()):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
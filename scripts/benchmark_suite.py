@@ -0,0 +1,308 @@
+"""
+进程内性能基准套件
+
+在不同数据规模（如 100k / 1M / 10M 行）下构建合成数据库，
+直接在进程内调用 AnnotationService、StatisticsService 和 FastAPI 应用，
+排除 HTTP 网络开销，输出每个操作的延迟百分位和吞吐量（JSON）。
+
+覆盖：
+- 搜索变体（分页、深分页、关键词、标签、排除标签、未标注、复合、大页面）
+- 批量标签更新
+- 文本导入
+- 系统统计
+- 进程内 API 调用（包含路由、校验和序列化开销）
+
+运行: uv run python -m scripts.benchmark_suite --scales 100k,1m --repeat 20 --output bench.json
+追加到历史记录（见 scripts/perf_history.py）: 加上 --record
+"""
+
+import argparse
+import json
+import logging
+import platform
+import sqlite3
+import statistics
+import sys
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent.parent
+sys.path.append(str(project_root))
+
+from sqlalchemy import text as sql_text
+from sqlalchemy.orm import sessionmaker
+
+from scripts.perf_history import DEFAULT_HISTORY_PATH, git_info, record_benchmark_report
+from scripts.synth_corpus import CorpusGenerator, parse_rows, write_sqlite
+from server import schemas
+from server.async_db import ThreadpoolRunner, get_db_runner
+from server.models import create_db_engine, get_db
+from server.services import AnnotationService, StatisticsService
+
+DEFAULT_DATA_DIR = project_root / "bench_data"
+
+
+def format_scale(rows: int) -> str:
+    """将行数格式化为规模字符串"""
+    if rows >= 1_000_000 and rows % 1_000_000 == 0:
+        return f"{rows // 1_000_000}m"
+    if rows >= 1_000 and rows % 1_000 == 0:
+        return f"{rows // 1_000}k"
+    return str(rows)
+
+
+def build_database(path: Path, rows: int, seed: int = 42) -> Path:
+    """
+    构建合成数据库（已存在时直接复用）。
+
+    Args:
+        path: 数据库文件路径
+        rows: 行数
+        seed: 随机种子
+
+    Returns:
+        数据库文件路径
+    """
+    if path.exists():
+        return path
+
+    tmp_path = path.with_suffix(".building")
+    tmp_path.unlink(missing_ok=True)
+
+    start = time.perf_counter()
+    write_sqlite(CorpusGenerator(seed=seed), rows, tmp_path)
+    tmp_path.rename(path)
+    print(f"已构建 {path.name}: {rows} 行, 耗时 {time.perf_counter() - start:.1f}秒", file=sys.stderr)
+    return path
+
+
+def summarize(samples: List[float], work_units: int = 1) -> Dict[str, float]:
+    """汇总延迟样本（毫秒）"""
+    ordered = sorted(samples)
+
+    def pct(p: float) -> float:
+        return round(ordered[min(len(ordered) - 1, int(p / 100 * len(ordered)))], 3)
+
+    mean = statistics.fmean(ordered)
+    return {
+        "n": len(ordered),
+        "min_ms": round(ordered[0], 3),
+        "p50_ms": pct(50),
+        "p90_ms": pct(90),
+        "p99_ms": pct(99),
+        "mean_ms": round(mean, 3),
+        "ops_per_s": round(1000 / mean, 2) if mean else None,
+        "units_per_s": round(work_units * 1000 / mean, 1) if mean else None,
+        "samples_ms": [round(s, 3) for s in samples],
+    }
+
+
+def measure(fn: Callable[[], object], repeat: int, warmup: int,
+            setup: Optional[Callable[[], None]] = None,
+            teardown: Optional[Callable[[], None]] = None) -> List[float]:
+    """重复执行并返回每次的耗时（毫秒），setup/teardown 不计入耗时"""
+    samples = []
+    for i in range(warmup + repeat):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        fn()
+        elapsed = (time.perf_counter() - start) * 1000
+        if teardown:
+            teardown()
+        if i >= warmup:
+            samples.append(elapsed)
+    return samples
+
+
+def run_scale(db_path: Path, rows: int, seed: int, repeat: int, warmup: int, include_api: bool) -> Dict[str, Dict]:
+    """在单个规模的数据库上运行全部操作"""
+    # 按 Zipf 排名选取常见、中等和稀有标签
+    catalog = CorpusGenerator(seed=seed).catalog
+    common, medium, rare = catalog[0].label, catalog[3].label, catalog[40].label
+
+    engine = create_db_engine(f"sqlite:///{db_path}")
+    Session = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    db = Session()
+    annotations = AnnotationService(db)
+    stats = StatisticsService(db)
+    results: Dict[str, Dict] = {}
+
+    search_cases = {
+        "search.page1": schemas.SearchRequest(page=1, per_page=50),
+        "search.deep_page": schemas.SearchRequest(page=max(1, rows // 50 // 2), per_page=50),
+        "search.keyword": schemas.SearchRequest(query="refund", per_page=20),
+        "search.keywords_multi": schemas.SearchRequest(keywords=["订单", "退款"], exclude_keywords=["发票"], per_page=20),
+        "search.labels": schemas.SearchRequest(labels=medium, per_page=20),
+        "search.labels_rare": schemas.SearchRequest(labels=rare, per_page=20),
+        "search.exclude_labels": schemas.SearchRequest(exclude_labels=f"{common},{medium}", per_page=20),
+        "search.unlabeled": schemas.SearchRequest(unlabeled_only=True, per_page=20),
+        "search.compound": schemas.SearchRequest(query="weather", labels=common, per_page=20),
+        "search.per_page_1000": schemas.SearchRequest(page=1, per_page=1000),
+    }
+    # 与 POST /annotations/search 一致，测量直接序列化 JSON 的快速路径
+    for name, request in search_cases.items():
+        results[name] = summarize(measure(lambda r=request: annotations.search_annotations_json(r), repeat, warmup))
+
+    results["stats.system"] = summarize(measure(stats.get_system_stats, repeat, warmup))
+
+    # 批量标签更新：对同一批 ID 交替添加和删除标签，保持数据状态不变
+    target_ids = list(range(1, min(rows, 1000) + 1))
+    add_request = schemas.BulkLabelUpdateRequest(text_ids=target_ids, labels_to_add="bench_tmp")
+    remove_request = schemas.BulkLabelUpdateRequest(text_ids=target_ids, labels_to_remove="bench_tmp")
+    results["bulk_update.add_1000_ids"] = summarize(
+        measure(lambda: annotations.bulk_update_labels(add_request), repeat, warmup,
+                teardown=lambda: annotations.bulk_update_labels(remove_request)),
+        work_units=len(target_ids)
+    )
+    criteria_add = schemas.BulkLabelUpdateRequest(
+        search_criteria=schemas.SearchRequest(labels=rare), labels_to_add="bench_tmp"
+    )
+    criteria_remove = schemas.BulkLabelUpdateRequest(
+        search_criteria=schemas.SearchRequest(labels=rare), labels_to_remove="bench_tmp"
+    )
+    results["bulk_update.by_criteria"] = summarize(
+        measure(lambda: annotations.bulk_update_labels(criteria_add), repeat, warmup,
+                teardown=lambda: annotations.bulk_update_labels(criteria_remove))
+    )
+
+    # 导入：每轮导入一批新文本，计时结束后删除，保持数据规模不变
+    import_size = 1000
+    counter = {"round": 0}
+
+    def make_import_request() -> schemas.TextImportRequest:
+        counter["round"] += 1
+        return schemas.TextImportRequest(
+            texts=[f"bench import {counter['round']}-{i}" for i in range(import_size)]
+        )
+
+    pending = {}
+
+    def import_setup():
+        pending["request"] = make_import_request()
+
+    def import_teardown():
+        db.execute(
+            sql_text("DELETE FROM annotation_data WHERE text LIKE :prefix"),
+            {"prefix": f"bench import {counter['round']}-%"}
+        )
+        db.commit()
+
+    results["import.texts_1000"] = summarize(
+        measure(lambda: annotations.import_texts(pending["request"]), repeat, warmup,
+                setup=import_setup, teardown=import_teardown),
+        work_units=import_size
+    )
+
+    if include_api:
+        results.update(run_api_cases(Session, medium, repeat, warmup))
+
+    db.close()
+    engine.dispose()
+    return results
+
+
+def run_api_cases(Session, label: str, repeat: int, warmup: int) -> Dict[str, Dict]:
+    """通过 FastAPI 应用进程内调用，测量路由、校验和序列化开销"""
+    from fastapi.testclient import TestClient
+    from server.main import app
+
+    def override_get_db():
+        db = Session()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    # 单条标注、搜索和标签端点经数据库执行器访问数据库，同样改用基准数据库（不访问应用自身的数据库文件）
+    async def override_get_db_runner():
+        runner = ThreadpoolRunner(Session)
+        try:
+            yield runner
+        finally:
+            await runner.aclose()
+
+    app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_db_runner] = override_get_db_runner
+    client = TestClient(app)
+    cases = {
+        "api.search_page1": lambda: client.post("/annotations/search", json={"page": 1, "per_page": 50}),
+        "api.search_per_page_1000": lambda: client.post("/annotations/search", json={"page": 1, "per_page": 1000}),
+        "api.search_labels": lambda: client.post("/annotations/search", json={"labels": label, "per_page": 20}),
+        "api.stats": lambda: client.get("/stats"),
+        "api.labels": lambda: client.get("/labels/"),
+    }
+    results = {}
+    try:
+        for name, call in cases.items():
+            response = call()
+            response.raise_for_status()
+            results[name] = summarize(measure(call, repeat, warmup))
+    finally:
+        app.dependency_overrides.pop(get_db, None)
+        app.dependency_overrides.pop(get_db_runner, None)
+    return results
+
+
+def environment_info() -> Dict[str, str]:
+    """运行环境信息"""
+    return {
+        "python": platform.python_version(),
+        "sqlite": sqlite3.sqlite_version,
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "processor": platform.processor(),
+    }
+
+
+def main():
+    """命令行入口"""
+    parser = argparse.ArgumentParser(description="进程内性能基准套件")
+    parser.add_argument("--scales", default="100k", help="逗号分隔的数据规模，如 100k,1m,10m")
+    parser.add_argument("--repeat", type=int, default=20, help="每个操作的计时次数")
+    parser.add_argument("--warmup", type=int, default=2, help="每个操作的预热次数")
+    parser.add_argument("--seed", type=int, default=42, help="合成数据的随机种子（见 synth_corpus）")
+    parser.add_argument("--data-dir", default=str(DEFAULT_DATA_DIR), help="合成数据库目录（可复用）")
+    parser.add_argument("--no-api", action="store_true", help="跳过进程内 API 调用")
+    parser.add_argument("--output", help="将结果写入 JSON 文件")
+    parser.add_argument("--record", action="store_true", help="将结果追加到性能历史记录")
+    parser.add_argument("--history", default=str(DEFAULT_HISTORY_PATH), help="性能历史文件路径")
+    args = parser.parse_args()
+
+    # 计时期间关闭逐请求的 INFO 日志，避免日志 I/O 计入延迟
+    logging.disable(logging.INFO)
+
+    report = {
+        "timestamp": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "environment": environment_info(),
+        # 运行时的提交，perf_history record --from 按此归档（而不是写入历史时的 HEAD）
+        "git": git_info(),
+        "config": {"repeat": args.repeat, "warmup": args.warmup, "seed": args.seed},
+        "scales": {},
+    }
+    for scale in args.scales.split(","):
+        rows = parse_rows(scale)
+        db_path = Path(args.data_dir) / f"bench_{format_scale(rows)}_seed{args.seed}.db"
+        build_database(db_path, rows, seed=args.seed)
+        print(f"运行规模 {format_scale(rows)} ...", file=sys.stderr)
+        report["scales"][format_scale(rows)] = {
+            "rows": rows,
+            "operations": run_scale(db_path, rows, args.seed, args.repeat, args.warmup, not args.no_api),
+        }
+
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        Path(args.output).write_text(text, encoding="utf-8")
+        print(f"结果已保存到: {args.output}", file=sys.stderr)
+    else:
+        print(text)
+
+    if args.record:
+        count = record_benchmark_report(report, Path(args.history))
+        print(f"已追加 {count} 条记录到: {args.history}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
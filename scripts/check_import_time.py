@@ -0,0 +1,97 @@
+"""
+服务端导入耗时预算检查
+
+在全新的解释器中以 -X importtime 导入 server.main（重复多次取最小值以排除抖动），检查：
+- server.main 的累计导入耗时不超过预算
+- 数据生成、旧数据导入等较重的依赖没有出现在启动路径上
+
+预算与禁止模块定义在 tests/slo_thresholds.json 的 startup 部分，不达标时退出码为 1。
+
+运行: uv run python -m scripts.check_import_time --repeat 5
+"""
+
+import argparse
+import json
+import re
+import subprocess
+import sys
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+project_root = Path(__file__).parent.parent
+DEFAULT_SLO_PATH = project_root / "tests" / "slo_thresholds.json"
+
+_IMPORTTIME_LINE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s+)(\S+)$")
+
+
+def measure_import(module: str = "server.main") -> Tuple[float, Dict[str, int], List[Tuple[str, int]]]:
+    """
+    在子进程中导入模块。
+
+    Returns:
+        (模块累计耗时毫秒, 已导入模块 -> 累计耗时微秒, 顶层导入列表 [(模块, 累计微秒)])
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=project_root, capture_output=True, text=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"导入 {module} 失败:\n{result.stderr[-2000:]}")
+
+    cumulative: Dict[str, int] = {}
+    top_level: List[Tuple[str, int]] = []
+    for line in result.stderr.splitlines():
+        match = _IMPORTTIME_LINE.match(line)
+        if not match:
+            continue
+        name, total = match.group(4), int(match.group(2))
+        cumulative[name] = total
+        # 只保留最外两层（被测模块本身及其直接导入），用于定位热点
+        if len(match.group(3)) <= 3:
+            top_level.append((name, total))
+    if module not in cumulative:
+        raise RuntimeError(f"未在 importtime 输出中找到 {module}")
+    return cumulative[module] / 1000, cumulative, top_level
+
+
+def main():
+    """命令行入口"""
+    parser = argparse.ArgumentParser(description="服务端导入耗时预算检查")
+    parser.add_argument("--repeat", type=int, default=5, help="重复次数（取最小值）")
+    parser.add_argument("--slo", default=str(DEFAULT_SLO_PATH), help="阈值文件")
+    parser.add_argument("--budget-ms", type=float, help="覆盖阈值文件中的导入耗时预算")
+    args = parser.parse_args()
+
+    startup = json.loads(Path(args.slo).read_text(encoding="utf-8"))["startup"]
+    module = startup.get("module", "server.main")
+    budget = args.budget_ms or startup["import_budget_ms"]
+    forbidden = startup.get("forbidden_modules", [])
+
+    best_ms, best_modules, best_top = None, {}, []
+    for _ in range(args.repeat):
+        elapsed_ms, modules, top = measure_import(module)
+        if best_ms is None or elapsed_ms < best_ms:
+            best_ms, best_modules, best_top = elapsed_ms, modules, top
+
+    print(f"{module} 导入耗时: {best_ms:.1f}ms（{args.repeat} 次中的最小值，预算 {budget}ms）")
+    print("耗时最多的顶层导入:")
+    for name, total in sorted(best_top, key=lambda item: item[1], reverse=True)[:10]:
+        print(f"  {name:<40}{total / 1000:>8.1f}ms")
+
+    failures = []
+    if best_ms > budget:
+        failures.append(f"导入耗时 {best_ms:.1f}ms 超出预算 {budget}ms")
+    loaded = [name for name in forbidden if name in best_modules]
+    if loaded:
+        failures.append(f"启动路径上出现了应延迟加载的模块: {', '.join(loaded)}")
+
+    if failures:
+        print("\n❌ 导入耗时检查未通过:")
+        for failure in failures:
+            print(f"  - {failure}")
+        sys.exit(1)
+    print("\n✅ 导入耗时检查通过")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,443 @@
+"""
+并发混合负载压测工具
+
+模拟标注员在其他人搜索时写入的场景，按配置的权重混合回放：
+- 各类过滤条件的搜索
+- 单条 PUT /annotations/{id}
+- bulk-update-labels
+- 统计
+- 文本导入
+
+报告每个端点的 p50/p95/p99、错误率、吞吐量以及按秒的吞吐时间线，
+并可与 tests/slo_thresholds.json 中的 SLO 阈值比对（不达标时退出码为 1）。
+
+注意：压测会写入数据，请对合成数据库运行（见 scripts/synth_corpus.py）。
+
+--workers 1,2,4 为扩展性模式：对每个工作进程数，复制 --database 指定的数据库到临时目录，
+以 python -m server.main --workers N 启动服务器并运行同样的负载，报告吞吐量随进程数的变化
+（需要多核机器，工作进程数不宜超过 CPU 核数）。
+
+--compare-db-modes 为数据库执行方式对比模式：分别以线程池（默认）和异步数据库层（ASYNC_DB_ENABLED）
+启动单进程服务器，用同样的负载比较吞吐量和延迟，适合 --users 500 以上的高并发连接。
+
+运行: uv run python -m scripts.load_test --target http://localhost:8000 --users 32 --duration 60 --slo tests/slo_thresholds.json
+扩展性: uv run python -m scripts.load_test --workers 1,2,4 --database data/bench_100k_seed42.db --users 32 --duration 30
+异步对比: uv run python -m scripts.load_test --compare-db-modes --database data/bench_100k_seed42.db --users 500 --duration 30
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import httpx
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent.parent
+sys.path.append(str(project_root))
+
+from scripts.bench_generation import percentile
+
+DEFAULT_SLO_PATH = project_root / "tests" / "slo_thresholds.json"
+
+# 默认负载组合（权重）
+DEFAULT_MIX = {
+    "search.page": 30,
+    "search.keyword": 10,
+    "search.labels": 10,
+    "search.compound": 5,
+    "search.unlabeled": 5,
+    "search.large_page": 3,
+    "annotation.update": 25,
+    "bulk_update_labels": 3,
+    "stats": 7,
+    "import_texts": 2,
+}
+
+_KEYWORDS = ["订单", "退款", "发票", "refund", "weather", "order", "price"]
+
+
+class Workload:
+    """根据服务器现有数据构造各类请求。"""
+
+    def __init__(self, ids: List[int], labels: List[str], total: int, seed: int):
+        self.ids = ids or [1]
+        self.labels = labels or ["label"]
+        self.total = max(total, 1)
+        self.rng = random.Random(seed)
+        self.import_counter = 0
+
+    def build(self, name: str) -> Tuple[str, str, Optional[dict]]:
+        """返回 (method, path, json_body)"""
+        rng = self.rng
+        if name == "search.page":
+            max_page = max(1, min(self.total // 50, 200))
+            return "POST", "/annotations/search", {"page": rng.randint(1, max_page), "per_page": 50}
+        if name == "search.keyword":
+            return "POST", "/annotations/search", {"query": rng.choice(_KEYWORDS), "per_page": 20}
+        if name == "search.labels":
+            return "POST", "/annotations/search", {"labels": rng.choice(self.labels), "per_page": 20}
+        if name == "search.compound":
+            return "POST", "/annotations/search", {
+                "keywords": [rng.choice(_KEYWORDS)],
+                "labels": rng.choice(self.labels),
+                "exclude_labels": rng.choice(self.labels),
+                "per_page": 20,
+            }
+        if name == "search.unlabeled":
+            return "POST", "/annotations/search", {"unlabeled_only": True, "per_page": 20}
+        if name == "search.large_page":
+            return "POST", "/annotations/search", {"page": 1, "per_page": 1000}
+        if name == "annotation.update":
+            labels = ", ".join(rng.sample(self.labels, k=min(len(self.labels), rng.randint(1, 2))))
+            return "PUT", f"/annotations/{rng.choice(self.ids)}", {"labels": labels}
+        if name == "bulk_update_labels":
+            ids = rng.sample(self.ids, k=min(len(self.ids), 50))
+            key = "labels_to_add" if rng.random() < 0.5 else "labels_to_remove"
+            return "POST", "/annotations/bulk-update-labels", {"text_ids": ids, key: "loadtest_tmp"}
+        if name == "stats":
+            return "GET", "/stats", None
+        if name == "import_texts":
+            self.import_counter += 1
+            stamp = f"{time.time_ns()}-{self.import_counter}"
+            return "POST", "/annotations/import-texts", {
+                "texts": [f"压测导入文本 {stamp}-{i}" for i in range(20)]
+            }
+        raise ValueError(f"未知的负载类型: {name}")
+
+
+class Recorder:
+    """记录每次请求的延迟与结果。"""
+
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, int] = defaultdict(int)
+        self.status_codes: Dict[str, Dict[int, int]] = defaultdict(lambda: defaultdict(int))
+        self.timeline: Dict[int, Dict[str, int]] = defaultdict(lambda: {"requests": 0, "errors": 0})
+
+    def record(self, name: str, elapsed_ms: float, status: Optional[int], second: int):
+        ok = status is not None and status < 400
+        self.latencies[name].append(elapsed_ms)
+        if status is not None:
+            self.status_codes[name][status] += 1
+        bucket = self.timeline[second]
+        bucket["requests"] += 1
+        if not ok:
+            self.errors[name] += 1
+            bucket["errors"] += 1
+
+    def report(self, duration: float) -> Dict:
+        endpoints = {}
+        for name, values in sorted(self.latencies.items()):
+            count = len(values)
+            endpoints[name] = {
+                "requests": count,
+                "errors": self.errors[name],
+                "error_rate": round(self.errors[name] / count, 4) if count else 0.0,
+                "throughput_rps": round(count / duration, 2),
+                "p50_ms": percentile(values, 50),
+                "p95_ms": percentile(values, 95),
+                "p99_ms": percentile(values, 99),
+                "max_ms": round(max(values), 3),
+                "status_codes": dict(self.status_codes[name]),
+            }
+        total = sum(len(v) for v in self.latencies.values())
+        return {
+            "duration_s": round(duration, 2),
+            "total_requests": total,
+            "total_rps": round(total / duration, 2),
+            "endpoints": endpoints,
+            "timeline": [{"second": s, **self.timeline[s]} for s in sorted(self.timeline)],
+        }
+
+
+async def discover(client: httpx.AsyncClient) -> Tuple[List[int], List[str], int]:
+    """从服务器读取可用的 ID 和标签"""
+    response = await client.post("/annotations/search", json={"page": 1, "per_page": 1000})
+    response.raise_for_status()
+    data = response.json()
+    ids = [item["id"] for item in data["items"]]
+    labels_response = await client.get("/labels/")
+    labels = [item["label"] for item in labels_response.json()] if labels_response.status_code == 200 else []
+    return ids, labels[:50], data["total"]
+
+
+async def user_loop(client: httpx.AsyncClient, workload: Workload, mix: Dict[str, float],
+                    recorder: Recorder, deadline: float, started: float, think_time: float):
+    """单个虚拟用户：按权重循环发送请求直到截止时间"""
+    names = list(mix)
+    weights = [mix[n] for n in names]
+    while time.perf_counter() < deadline:
+        name = workload.rng.choices(names, weights=weights)[0]
+        method, path, body = workload.build(name)
+        start = time.perf_counter()
+        status = None
+        try:
+            response = await client.request(method, path, json=body)
+            status = response.status_code
+        except httpx.HTTPError:
+            pass
+        now = time.perf_counter()
+        recorder.record(name, (now - start) * 1000, status, int(now - started))
+        if think_time:
+            await asyncio.sleep(think_time)
+
+
+async def run_load(target: str, users: int, duration: float, mix: Dict[str, float],
+                   seed: int = 0, think_time: float = 0.0) -> Dict:
+    """
+    对目标服务器运行混合负载。
+
+    Args:
+        target: 服务器地址
+        users: 并发虚拟用户数
+        duration: 持续时间（秒）
+        mix: 负载组合权重
+        seed: 随机种子
+        think_time: 每个用户两次请求之间的等待（秒）
+
+    Returns:
+        压测报告
+    """
+    limits = httpx.Limits(max_connections=users + 5, max_keepalive_connections=users + 5)
+    async with httpx.AsyncClient(base_url=target, timeout=httpx.Timeout(60.0), limits=limits) as client:
+        ids, labels, total = await discover(client)
+        recorder = Recorder()
+        started = time.perf_counter()
+        deadline = started + duration
+        await asyncio.gather(*(
+            user_loop(client, Workload(ids, labels, total, seed + i), mix, recorder, deadline, started, think_time)
+            for i in range(users)
+        ))
+        elapsed = time.perf_counter() - started
+    report = recorder.report(elapsed)
+    report["config"] = {"target": target, "users": users, "duration_s": duration, "mix": mix, "seed": seed}
+    return report
+
+
+# 覆盖配置后再导入应用（只对单进程有效：多进程时各工作进程重新导入 server.config）
+_CONFIG_BOOTSTRAP = """
+import json, sys
+import server.config as config
+for name, value in json.loads(sys.argv[1]).items():
+    setattr(config, name, value)
+from server.main import main
+main(sys.argv[2:])
+"""
+
+
+def start_server(workers: int, port: int, workdir: Path, config: Optional[Dict[str, object]] = None) -> subprocess.Popen:
+    """
+    在 workdir 中启动服务器（默认数据库 ./annotation.db 即 workdir 中的副本）。
+
+    Args:
+        config: 覆盖 server.config 中的配置项（如 {"ASYNC_DB_ENABLED": True}），只用于单进程
+    """
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [str(project_root), os.environ.get("PYTHONPATH")])))
+    server_args = ["--host", "127.0.0.1", "--port", str(port), "--workers", str(workers)]
+    if config:
+        command = [sys.executable, "-c", _CONFIG_BOOTSTRAP, json.dumps(config), *server_args]
+    else:
+        command = [sys.executable, "-m", "server.main", *server_args]
+    return subprocess.Popen(command, cwd=workdir, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+async def wait_ready(target: str, timeout: float = 60.0):
+    """等待服务器可以响应请求"""
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient(base_url=target, timeout=5.0) as client:
+        while time.monotonic() < deadline:
+            try:
+                if (await client.get("/debug/startup")).status_code == 200:
+                    return
+            except httpx.HTTPError:
+                pass
+            await asyncio.sleep(0.2)
+    raise TimeoutError(f"服务器 {target} 在 {timeout}s 内未就绪")
+
+
+def run_isolated(database: Path, port: int, title: str, users: int, duration: float, mix: Dict[str, float],
+                 seed: int = 0, think_time: float = 0.0, workers: int = 1,
+                 config: Optional[Dict[str, object]] = None) -> Dict:
+    """在数据库的全新副本上启动服务器并运行一轮负载，返回压测报告"""
+    target = f"http://127.0.0.1:{port}"
+    with tempfile.TemporaryDirectory(prefix="load_test_") as workdir:
+        shutil.copyfile(database, Path(workdir) / "annotation.db")
+        process = start_server(workers, port, Path(workdir), config)
+        try:
+            asyncio.run(wait_ready(target))
+            print(f"\n=== {title} ===")
+            report = asyncio.run(run_load(target, users, duration, mix, seed, think_time))
+            print_summary(report)
+            return report
+        finally:
+            process.terminate()
+            process.wait(timeout=30)
+
+
+def run_db_modes(database: Path, port: int, users: int, duration: float, mix: Dict[str, float],
+                 seed: int = 0, think_time: float = 0.0) -> Dict:
+    """
+    对比线程池和异步数据库层在同样负载下的表现。
+
+    Returns:
+        {"runs": {"threadpool" / "async": 压测报告}, "relative_rps": 异步相对线程池的吞吐倍数}
+    """
+    runs = {}
+    for mode, config in (("threadpool", None), ("async", {"ASYNC_DB_ENABLED": True})):
+        runs[mode] = run_isolated(database, port, f"{mode}（{users} 个并发连接）", users, duration, mix, seed,
+                                  think_time, config=config)
+        runs[mode]["config"]["db_mode"] = mode
+    base = runs["threadpool"]["total_rps"]
+    return {"runs": runs, "relative_rps": round(runs["async"]["total_rps"] / base, 2) if base else None}
+
+
+def run_scaling(database: Path, worker_counts: List[int], port: int, users: int, duration: float,
+                mix: Dict[str, float], seed: int = 0, think_time: float = 0.0) -> Dict:
+    """
+    对不同工作进程数依次运行同样的负载。
+
+    每轮使用数据库的全新副本，保证写入负载不影响下一轮。
+
+    Returns:
+        {"cpu_count", "runs": {进程数: 压测报告}, "scaling": {进程数: 相对单进程的吞吐倍数}}
+    """
+    runs = {}
+    for workers in worker_counts:
+        runs[workers] = run_isolated(database, port, f"{workers} 个工作进程", users, duration, mix, seed, think_time,
+                                     workers=workers)
+        runs[workers]["config"]["workers"] = workers
+    base = runs[worker_counts[0]]["total_rps"]
+    return {
+        "cpu_count": os.cpu_count(),
+        "runs": runs,
+        "scaling": {workers: round(run["total_rps"] / base, 2) if base else None for workers, run in runs.items()},
+    }
+
+
+def load_slo(slo_path: Path = DEFAULT_SLO_PATH) -> Dict[str, Dict[str, float]]:
+    """读取 SLO 阈值（端点名 -> 阈值）"""
+    return json.loads(Path(slo_path).read_text(encoding="utf-8"))["endpoints"]
+
+
+def check_slo(report: Dict, slo_path: Path = DEFAULT_SLO_PATH) -> Tuple[bool, List[str]]:
+    """
+    将压测报告与 SLO 阈值比对。
+
+    Returns:
+        (是否全部通过, 违规描述列表)
+    """
+    thresholds = load_slo(slo_path)
+    violations = []
+    for name, stats in report["endpoints"].items():
+        limit = thresholds.get(name)
+        if not limit:
+            continue
+        for key in ("p95_ms", "p99_ms"):
+            if key in limit and stats[key] is not None and stats[key] > limit[key]:
+                violations.append(f"{name}: {key} {stats[key]:.1f} > {limit[key]}")
+        if "max_error_rate" in limit and stats["error_rate"] > limit["max_error_rate"]:
+            violations.append(f"{name}: error_rate {stats['error_rate']:.4f} > {limit['max_error_rate']}")
+    return not violations, violations
+
+
+def parse_mix(value: Optional[str]) -> Dict[str, float]:
+    """解析负载组合：JSON 文件路径或 name=weight,name=weight"""
+    if not value:
+        return dict(DEFAULT_MIX)
+    path = Path(value)
+    if path.exists():
+        return json.loads(path.read_text(encoding="utf-8"))
+    mix = {}
+    for part in value.split(","):
+        name, weight = part.split("=")
+        mix[name.strip()] = float(weight)
+    return mix
+
+
+def print_summary(report: Dict):
+    """打印可读的摘要表"""
+    print(f"\n总请求: {report['total_requests']}, 吞吐: {report['total_rps']} req/s, 时长: {report['duration_s']}s")
+    print(f"{'端点':<22}{'请求':>8}{'错误率':>9}{'rps':>9}{'p50':>10}{'p95':>10}{'p99':>10}")
+    for name, s in report["endpoints"].items():
+        print(f"{name:<22}{s['requests']:>8}{s['error_rate']:>9.2%}{s['throughput_rps']:>9.1f}"
+              f"{s['p50_ms']:>10.1f}{s['p95_ms']:>10.1f}{s['p99_ms']:>10.1f}")
+
+
+def main(argv: Optional[List[str]] = None):
+    """命令行入口"""
+    parser = argparse.ArgumentParser(description="并发混合负载压测")
+    parser.add_argument("--target", default="http://localhost:8000")
+    parser.add_argument("--users", type=int, default=16, help="并发虚拟用户数")
+    parser.add_argument("--duration", type=float, default=30, help="持续时间（秒）")
+    parser.add_argument("--mix", help="负载组合：JSON 文件或 name=weight,...（默认内置组合）")
+    parser.add_argument("--think-time", type=float, default=0.0, help="每个用户两次请求间的等待（秒）")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--slo", nargs="?", const=str(DEFAULT_SLO_PATH), help="与 SLO 阈值比对（默认 tests/slo_thresholds.json）")
+    parser.add_argument("--output", help="将报告写入 JSON 文件")
+    parser.add_argument("--workers", help="扩展性模式：逗号分隔的工作进程数，如 1,2,4（忽略 --target）")
+    parser.add_argument("--compare-db-modes", action="store_true", help="对比线程池与异步数据库层（忽略 --target）")
+    parser.add_argument("--database", help="扩展性 / 对比模式使用的数据库（每轮复制一份）")
+    parser.add_argument("--port", type=int, default=8765, help="扩展性 / 对比模式的服务器端口")
+    args = parser.parse_args(argv)
+
+    if args.compare_db_modes:
+        if not args.database:
+            parser.error("--compare-db-modes 需要同时指定 --database")
+        comparison = run_db_modes(Path(args.database), args.port, args.users, args.duration, parse_mix(args.mix),
+                                  args.seed, args.think_time)
+        print(f"\n数据库执行方式对比（{args.users} 个并发连接）:")
+        for mode, run in comparison["runs"].items():
+            latencies = [s["p99_ms"] for s in run["endpoints"].values() if s["p99_ms"] is not None]
+            print(f"  {mode:<10} {run['total_rps']:>8.1f} req/s  最大 p99 {max(latencies, default=0):>8.1f} ms")
+        print(f"  异步 / 线程池吞吐: ×{comparison['relative_rps']}")
+        if args.output:
+            Path(args.output).write_text(json.dumps(comparison, ensure_ascii=False, indent=2), encoding="utf-8")
+            print(f"报告已保存到: {args.output}")
+        return
+
+    if args.workers:
+        if not args.database:
+            parser.error("--workers 需要同时指定 --database")
+        worker_counts = [int(w) for w in args.workers.split(",")]
+        scaling = run_scaling(Path(args.database), worker_counts, args.port, args.users, args.duration,
+                              parse_mix(args.mix), args.seed, args.think_time)
+        print(f"\n吞吐量扩展（CPU 核数 {scaling['cpu_count']}）:")
+        for workers in worker_counts:
+            run = scaling["runs"][workers]
+            print(f"  {workers:>2} 个进程: {run['total_rps']:>8.1f} req/s  ×{scaling['scaling'][workers]}")
+        if args.output:
+            Path(args.output).write_text(json.dumps(scaling, ensure_ascii=False, indent=2), encoding="utf-8")
+            print(f"报告已保存到: {args.output}")
+        return
+
+    report = asyncio.run(run_load(args.target, args.users, args.duration, parse_mix(args.mix), args.seed, args.think_time))
+    print_summary(report)
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+        print(f"报告已保存到: {args.output}")
+
+    if args.slo:
+        passed, violations = check_slo(report, Path(args.slo))
+        report["slo"] = {"passed": passed, "violations": violations}
+        if passed:
+            print("\n✅ SLO 全部达标")
+        else:
+            print("\n❌ SLO 未达标:")
+            for violation in violations:
+                print(f"  - {violation}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,217 @@
+"""
+本地模拟大模型服务器
+
+提供 OpenAI 兼容的 /v1/chat/completions 接口（支持 stream=True），
+用于在不调用付费 API 的情况下测量数据生成流程的性能。
+
+可配置：
+- 延迟分布（fixed / uniform / lognormal）
+- 错误率（返回 HTTP 500）
+- 输出长度及 token 流速
+
+运行: uv run python -m scripts.mock_llm_server --port 9000 --latency-ms 800 --error-rate 0.02
+数据生成时将 base_url 设置为 http://localhost:9000/v1，api_key 任意。
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import time
+import uuid
+from dataclasses import dataclass
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+
+@dataclass
+class MockConfig:
+    """模拟服务器配置。"""
+    latency_dist: str = "lognormal"  # fixed / uniform / lognormal
+    latency_ms: float = 500.0  # 延迟中位数（uniform 时为均值）
+    latency_spread: float = 0.5  # uniform 时为 ±比例，lognormal 时为 sigma
+    error_rate: float = 0.0  # 返回 500 的概率
+    output_chars: int = 60  # 生成文本的平均字符数
+    output_spread: float = 0.3  # 输出长度的 ±比例
+    token_chars: int = 2  # 流式输出时每个 token 的字符数
+    label_count: int = 20  # 输出中随机标签的取值数量
+    seed: int = 0
+
+
+_WORDS = [
+    "订单", "物流", "退款", "发票", "尺码", "颜色", "快递", "客服", "售后", "优惠",
+    "price", "refund", "shipping", "order", "size", "delivery", "coupon", "return",
+]
+
+
+class MockLLM:
+    """按配置生成模拟响应。"""
+
+    def __init__(self, config: MockConfig):
+        self.config = config
+        self.rng = random.Random(config.seed)
+        self.requests = 0
+        self.errors = 0
+
+    def sample_latency(self) -> float:
+        """按配置的分布采样延迟（秒）"""
+        c = self.config
+        if c.latency_dist == "fixed":
+            ms = c.latency_ms
+        elif c.latency_dist == "uniform":
+            ms = self.rng.uniform(c.latency_ms * (1 - c.latency_spread), c.latency_ms * (1 + c.latency_spread))
+        else:
+            ms = self.rng.lognormvariate(0, c.latency_spread) * c.latency_ms
+        return max(ms, 0.0) / 1000
+
+    def should_fail(self) -> bool:
+        """按错误率决定本次请求是否失败"""
+        return self.rng.random() < self.config.error_rate
+
+    def sample_output(self) -> str:
+        """生成一条 "文本: ...\\n标签: ..." 格式的输出"""
+        c = self.config
+        target = max(1, int(c.output_chars * self.rng.uniform(1 - c.output_spread, 1 + c.output_spread)))
+        parts = []
+        length = 0
+        while length < target:
+            word = self.rng.choice(_WORDS)
+            parts.append(word)
+            length += len(word) + 1
+        text = " ".join(parts)[:target]
+        label = f"label_{self.rng.randrange(c.label_count)}"
+        return f"文本: {text} #{uuid.uuid4().hex[:8]}\n标签: {label}"
+
+
+def create_app(config: MockConfig) -> FastAPI:
+    """
+    创建模拟服务器应用。
+
+    Args:
+        config: 模拟配置
+
+    Returns:
+        FastAPI 应用
+    """
+    app = FastAPI(title="Mock LLM")
+    llm = MockLLM(config)
+    app.state.llm = llm
+
+    @app.get("/v1/models")
+    async def list_models():
+        return {"object": "list", "data": [{"id": "mock-model", "object": "model", "owned_by": "mock"}]}
+
+    @app.get("/stats")
+    async def mock_stats():
+        return {"requests": llm.requests, "errors": llm.errors}
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        llm.requests += 1
+        latency = llm.sample_latency()
+        model = body.get("model", "mock-model")
+        completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+        created = int(time.time())
+
+        if llm.should_fail():
+            llm.errors += 1
+            await asyncio.sleep(latency / 2)
+            return JSONResponse(
+                status_code=500,
+                content={"error": {"message": "mock internal error", "type": "server_error"}}
+            )
+
+        output = llm.sample_output()
+
+        if not body.get("stream"):
+            await asyncio.sleep(latency)
+            return {
+                "id": completion_id,
+                "object": "chat.completion",
+                "created": created,
+                "model": model,
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": output},
+                    "finish_reason": "stop",
+                }],
+                "usage": {"prompt_tokens": 10, "completion_tokens": len(output), "total_tokens": 10 + len(output)},
+            }
+
+        async def event_stream():
+            step = max(1, config.token_chars)
+            tokens = [output[i:i + step] for i in range(0, len(output), step)]
+            # 首 token 延迟占总延迟的一半，其余均匀分布到每个 token
+            await asyncio.sleep(latency / 2)
+            interval = latency / 2 / max(1, len(tokens))
+            for token in tokens:
+                chunk = {
+                    "id": completion_id,
+                    "object": "chat.completion.chunk",
+                    "created": created,
+                    "model": model,
+                    "choices": [{"index": 0, "delta": {"content": token}, "finish_reason": None}],
+                }
+                yield f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n"
+                await asyncio.sleep(interval)
+            done = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": created,
+                "model": model,
+                "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}],
+            }
+            yield f"data: {json.dumps(done)}\n\n"
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(event_stream(), media_type="text/event-stream")
+
+    return app
+
+
+def add_mock_arguments(parser: argparse.ArgumentParser):
+    """向命令行解析器添加模拟配置参数（供基准脚本复用）"""
+    defaults = MockConfig()
+    parser.add_argument("--latency-dist", choices=["fixed", "uniform", "lognormal"], default=defaults.latency_dist)
+    parser.add_argument("--latency-ms", type=float, default=defaults.latency_ms)
+    parser.add_argument("--latency-spread", type=float, default=defaults.latency_spread)
+    parser.add_argument("--error-rate", type=float, default=defaults.error_rate)
+    parser.add_argument("--output-chars", type=int, default=defaults.output_chars)
+    parser.add_argument("--output-spread", type=float, default=defaults.output_spread)
+    parser.add_argument("--token-chars", type=int, default=defaults.token_chars)
+    parser.add_argument("--seed", type=int, default=defaults.seed)
+
+
+def config_from_args(args: argparse.Namespace) -> MockConfig:
+    """从命令行参数构建模拟配置"""
+    return MockConfig(
+        latency_dist=args.latency_dist,
+        latency_ms=args.latency_ms,
+        latency_spread=args.latency_spread,
+        error_rate=args.error_rate,
+        output_chars=args.output_chars,
+        output_spread=args.output_spread,
+        token_chars=args.token_chars,
+        seed=args.seed,
+    )
+
+
+def main():
+    """启动模拟服务器"""
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="OpenAI 兼容的本地模拟大模型服务器")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9000)
+    add_mock_arguments(parser)
+    args = parser.parse_args()
+
+    config = config_from_args(args)
+    print(f"模拟大模型服务器: http://{args.host}:{args.port}/v1  配置: {config}")
+    uvicorn.run(create_app(config), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
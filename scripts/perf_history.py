@@ -0,0 +1,320 @@
+"""
+性能基准历史记录与回归比较
+
+每次基准运行追加一行到 tests/perf_history.jsonl，记录 git 提交、机器指纹、数据规模
+和每个操作的原始样本。compare 命令在相同机器指纹和规模下，对两个提交的样本
+做分层 bootstrap 置信区间比较（先重采样运行，再在每次运行内重采样样本，
+计入运行间的波动），标记统计显著的回归。
+
+运行:
+    uv run python -m scripts.benchmark_suite --scales 100k --repeat 30 --record
+    uv run python -m scripts.perf_history record --from bench.json
+    uv run python -m scripts.perf_history list
+    uv run python -m scripts.perf_history compare --baseline main --candidate HEAD --scale 100k
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import platform
+import random
+import sqlite3
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+project_root = Path(__file__).parent.parent
+DEFAULT_HISTORY_PATH = project_root / "tests" / "perf_history.jsonl"
+
+
+def git_info() -> Dict[str, Optional[object]]:
+    """当前 git 提交及工作区是否有未提交修改"""
+    def run(*args: str) -> Optional[str]:
+        try:
+            result = subprocess.run(["git", *args], cwd=project_root, capture_output=True, text=True, timeout=10)
+        except (OSError, subprocess.SubprocessError):
+            return None
+        return result.stdout.strip() if result.returncode == 0 else None
+
+    status = run("status", "--porcelain", "--untracked-files=no")
+    return {
+        "commit": run("rev-parse", "HEAD"),
+        "branch": run("rev-parse", "--abbrev-ref", "HEAD"),
+        "dirty": bool(status) if status is not None else None,
+    }
+
+
+def resolve_commit(ref: str) -> str:
+    """将分支名、标签或短哈希解析为完整提交哈希（无法解析时原样返回，按前缀匹配）"""
+    try:
+        result = subprocess.run(["git", "rev-parse", ref], cwd=project_root, capture_output=True, text=True, timeout=10)
+    except (OSError, subprocess.SubprocessError):
+        return ref
+    return result.stdout.strip() if result.returncode == 0 else ref
+
+
+def machine_info() -> Dict[str, object]:
+    """机器信息及指纹（只在相同指纹的运行之间比较）"""
+    info = {
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "processor": platform.processor(),
+        "cpu_count": os.cpu_count(),
+        "python": platform.python_version(),
+        "sqlite": sqlite3.sqlite_version,
+    }
+    digest = hashlib.sha256(json.dumps(info, sort_keys=True).encode("utf-8")).hexdigest()
+    info["fingerprint"] = digest[:16]
+    return info
+
+
+def record_run(source: str, scale: str, samples: Dict[str, List[float]],
+               config: Optional[Dict] = None, path: Path = DEFAULT_HISTORY_PATH,
+               git: Optional[Dict] = None) -> Dict:
+    """
+    追加一次运行记录。
+
+    Args:
+        source: 来源（如 benchmark_suite、test_performance）
+        scale: 数据规模（如 100k）
+        samples: 操作名 -> 延迟样本（毫秒）
+        config: 运行参数
+        path: 历史文件路径
+        git: 运行时的 git 信息（默认读取当前工作区）
+
+    Returns:
+        写入的记录
+    """
+    entry = {
+        "timestamp": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "source": source,
+        "scale": scale,
+        "git": git if git is not None else git_info(),
+        "machine": machine_info(),
+        "config": config or {},
+        "operations": {name: [round(s, 3) for s in values] for name, values in samples.items() if values},
+    }
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+    return entry
+
+
+def record_benchmark_report(report: Dict, path: Path = DEFAULT_HISTORY_PATH) -> int:
+    """
+    将 benchmark_suite 的报告按规模逐条写入历史，返回写入条数。
+
+    git 信息取自报告（运行基准时的提交），而不是写入历史时的工作区；
+    旧版报告没有 git 信息时提交记为未知，不参与比较。
+    """
+    git = report.get("git") or {"commit": None, "branch": None, "dirty": None}
+    count = 0
+    for scale, data in report["scales"].items():
+        samples = {name: op["samples_ms"] for name, op in data["operations"].items()}
+        record_run("benchmark_suite", scale, samples, config={**report.get("config", {}), "rows": data["rows"]},
+                   path=path, git=git)
+        count += 1
+    return count
+
+
+def load_history(path: Path = DEFAULT_HISTORY_PATH) -> List[Dict]:
+    """读取全部历史记录（跳过损坏的行）"""
+    path = Path(path)
+    if not path.exists():
+        return []
+    entries = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                entries.append(json.loads(line))
+            except json.JSONDecodeError:
+                continue
+    return entries
+
+
+def hierarchical_resample(runs: List[List[float]], rng: random.Random) -> List[float]:
+    """两级重采样：有放回地抽取运行，再在每次抽中的运行内有放回地抽取样本"""
+    resampled: List[float] = []
+    for samples in rng.choices(runs, k=len(runs)):
+        resampled.extend(rng.choices(samples, k=len(samples)))
+    return resampled
+
+
+def bootstrap_ratio_ci(baseline: List[List[float]], candidate: List[List[float]], iterations: int = 2000,
+                       confidence: float = 0.95, seed: int = 0) -> Tuple[float, float, float]:
+    """
+    候选/基线中位数之比及其分层 bootstrap 置信区间。
+
+    Args:
+        baseline: 基线各次运行的样本
+        candidate: 候选各次运行的样本
+
+    Returns:
+        (点估计, 区间下界, 区间上界)
+    """
+    rng = random.Random(seed)
+    point = (statistics.median([s for run in candidate for s in run])
+             / statistics.median([s for run in baseline for s in run]))
+    ratios = []
+    for _ in range(iterations):
+        b = statistics.median(hierarchical_resample(baseline, rng))
+        c = statistics.median(hierarchical_resample(candidate, rng))
+        if b > 0:
+            ratios.append(c / b)
+    ratios.sort()
+    alpha = (1 - confidence) / 2
+    lower = ratios[int(alpha * (len(ratios) - 1))]
+    upper = ratios[int((1 - alpha) * (len(ratios) - 1))]
+    return point, lower, upper
+
+
+def select_runs(entries: List[Dict], commit: str, scale: str, source: str,
+                fingerprint: Optional[str]) -> List[Dict]:
+    """按提交（前缀匹配）、规模、来源和机器指纹筛选运行记录"""
+    return [
+        e for e in entries
+        if (e["git"].get("commit") or "").startswith(commit)
+        and e["scale"] == scale
+        and e["source"] == source
+        and (fingerprint is None or e["machine"]["fingerprint"] == fingerprint)
+    ]
+
+
+def group_samples(runs: List[Dict]) -> Dict[str, List[List[float]]]:
+    """按操作收集各次运行的样本（保留运行边界）"""
+    grouped: Dict[str, List[List[float]]] = {}
+    for run in runs:
+        for name, samples in run["operations"].items():
+            if samples:
+                grouped.setdefault(name, []).append(samples)
+    return grouped
+
+
+def compare_runs(baseline_runs: List[Dict], candidate_runs: List[Dict], threshold: float = 0.05,
+                 confidence: float = 0.95, iterations: int = 2000, min_samples: int = 5) -> List[Dict]:
+    """
+    逐操作比较两组运行。
+
+    置信区间下界超过 1 + threshold 判定为回归，上界低于 1 - threshold 判定为改进；
+    样本不足的操作标记为 insufficient。
+    """
+    baseline = group_samples(baseline_runs)
+    candidate = group_samples(candidate_runs)
+    rows = []
+    for name in sorted(set(baseline) & set(candidate)):
+        b = [s for run in baseline[name] for s in run]
+        c = [s for run in candidate[name] for s in run]
+        row = {
+            "operation": name,
+            "baseline_median_ms": round(statistics.median(b), 3),
+            "candidate_median_ms": round(statistics.median(c), 3),
+            "baseline_n": len(b),
+            "candidate_n": len(c),
+            "baseline_runs": len(baseline[name]),
+            "candidate_runs": len(candidate[name]),
+        }
+        if len(b) < min_samples or len(c) < min_samples or statistics.median(b) <= 0:
+            row.update({"ratio": None, "ci": None, "verdict": "insufficient"})
+        else:
+            point, lower, upper = bootstrap_ratio_ci(baseline[name], candidate[name], iterations, confidence)
+            if lower > 1 + threshold:
+                verdict = "regression"
+            elif upper < 1 - threshold:
+                verdict = "improvement"
+            else:
+                verdict = "unchanged"
+            row.update({"ratio": round(point, 3), "ci": [round(lower, 3), round(upper, 3)], "verdict": verdict})
+        rows.append(row)
+    return rows
+
+
+def print_comparison(rows: List[Dict]):
+    """打印比较结果表"""
+    marks = {"regression": "❌", "improvement": "✅", "unchanged": "  ", "insufficient": "? "}
+    print(f"{'':2} {'操作':<28}{'基线 p50':>11}{'候选 p50':>11}{'比值':>8}  {'置信区间':<16}")
+    for row in rows:
+        ratio = f"{row['ratio']:.3f}" if row["ratio"] is not None else "-"
+        ci = f"[{row['ci'][0]:.3f}, {row['ci'][1]:.3f}]" if row["ci"] else "-"
+        print(f"{marks[row['verdict']]} {row['operation']:<28}{row['baseline_median_ms']:>11.2f}"
+              f"{row['candidate_median_ms']:>11.2f}{ratio:>8}  {ci:<16}")
+
+
+def cmd_record(args: argparse.Namespace):
+    report = json.loads(Path(args.source_file).read_text(encoding="utf-8"))
+    if not (report.get("git") or {}).get("commit"):
+        print("警告: 报告中没有 git 提交信息（旧版 benchmark_suite 生成），记录将无法参与 compare", file=sys.stderr)
+    count = record_benchmark_report(report, Path(args.history))
+    print(f"已追加 {count} 条记录到 {args.history}")
+
+
+def cmd_list(args: argparse.Namespace):
+    for entry in load_history(Path(args.history)):
+        commit = (entry["git"].get("commit") or "unknown")[:10]
+        dirty = "*" if entry["git"].get("dirty") else " "
+        print(f"{entry['timestamp']}  {commit}{dirty} {entry['source']:<18}{entry['scale']:<8}"
+              f"{entry['machine']['fingerprint']}  {len(entry['operations'])} 个操作")
+
+
+def cmd_compare(args: argparse.Namespace):
+    entries = load_history(Path(args.history))
+    fingerprint = None if args.any_machine else machine_info()["fingerprint"]
+    baseline_runs = select_runs(entries, resolve_commit(args.baseline), args.scale, args.source, fingerprint)
+    candidate_runs = select_runs(entries, resolve_commit(args.candidate), args.scale, args.source, fingerprint)
+    if not baseline_runs or not candidate_runs:
+        print(f"没有可比较的记录（基线 {len(baseline_runs)} 次，候选 {len(candidate_runs)} 次）；"
+              f"注意默认只比较与本机指纹相同的运行，可用 --any-machine 放宽", file=sys.stderr)
+        sys.exit(2)
+
+    rows = compare_runs(baseline_runs, candidate_runs, args.threshold, args.confidence, args.iterations)
+    print(f"基线 {args.baseline}: {len(baseline_runs)} 次运行，候选 {args.candidate}: {len(candidate_runs)} 次运行，"
+          f"规模 {args.scale}，阈值 ±{args.threshold:.0%}，置信度 {args.confidence:.0%}")
+    print_comparison(rows)
+    if args.output:
+        Path(args.output).write_text(json.dumps(rows, ensure_ascii=False, indent=2), encoding="utf-8")
+
+    regressions = [r["operation"] for r in rows if r["verdict"] == "regression"]
+    if regressions:
+        print(f"\n❌ 显著回归: {', '.join(regressions)}")
+        sys.exit(1)
+    print("\n✅ 无显著回归")
+
+
+def main():
+    """命令行入口"""
+    parser = argparse.ArgumentParser(description="性能基准历史记录与回归比较")
+    parser.add_argument("--history", default=str(DEFAULT_HISTORY_PATH), help="历史文件路径")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    record = subparsers.add_parser("record", help="将 benchmark_suite 的 JSON 结果追加到历史")
+    record.add_argument("--from", dest="source_file", required=True, help="benchmark_suite --output 生成的文件")
+    record.set_defaults(func=cmd_record)
+
+    listing = subparsers.add_parser("list", help="列出历史记录")
+    listing.set_defaults(func=cmd_list)
+
+    compare = subparsers.add_parser("compare", help="比较两个提交的基准结果")
+    compare.add_argument("--baseline", required=True, help="基线提交（分支、标签或哈希前缀）")
+    compare.add_argument("--candidate", default="HEAD", help="候选提交（默认 HEAD）")
+    compare.add_argument("--scale", default="100k", help="数据规模")
+    compare.add_argument("--source", default="benchmark_suite", help="记录来源")
+    compare.add_argument("--threshold", type=float, default=0.05, help="最小显著变化比例")
+    compare.add_argument("--confidence", type=float, default=0.95, help="置信度")
+    compare.add_argument("--iterations", type=int, default=2000, help="bootstrap 重采样次数")
+    compare.add_argument("--any-machine", action="store_true", help="不限制机器指纹")
+    compare.add_argument("--output", help="将比较结果写入 JSON 文件")
+    compare.set_defaults(func=cmd_compare)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,336 @@
+"""
+合成语料生成器
+
+流式生成大量中英文混合的客服类文本，按 Zipf 分布分配多标签（标签目录带分组），
+用于在生产规模下测试性能。相同种子生成完全相同的数据。
+
+输出格式：
+- text: 每行一条文本（可用于 /import/text-file）
+- old-data: <group>/<label>.txt 目录树和 label_config.yaml（可用于 /import/old-data）
+- sqlite: 直接批量写入 SQLite 数据库（annotation_data 和 labels 表）
+
+运行:
+    uv run python -m scripts.synth_corpus --rows 10m --format sqlite --output bench_data/synth_10m.db
+    uv run python -m scripts.synth_corpus --rows 100k --format text --output tmp/synth_100k.txt
+"""
+
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import time
+from bisect import bisect
+from dataclasses import dataclass
+from itertools import accumulate, islice
+from pathlib import Path
+from typing import Iterator, List, Optional, Tuple
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent.parent
+sys.path.append(str(project_root))
+
+_ZH_TEMPLATES = [
+    "我的订单{n}里的{p}还没到，{t}能发货吗",
+    "请问{p}有{c}的吗？订单号{n}",
+    "{p}收到后发现{i}，订单{n}怎么退款",
+    "{t}下单的{p}一直显示{s}，单号{n}",
+    "客服你好，{p}的价格比昨天贵了，订单{n}能退差价吗",
+    "{p}尺码偏小，想换大一号，订单{n}",
+    "发票抬头写错了，订单{n}的{p}能重新开吗",
+    "优惠券用不了，结算{p}时提示{i}，单号{n}",
+    "快递员说{t}送达，但{p}到现在都没收到（{n}）",
+    "天气太热了，{p}能不能{t}再发，订单{n}",
+]
+
+_EN_TEMPLATES = [
+    "My order {n} for the {p} has not arrived yet, can you check {t}?",
+    "Do you have the {p} in {c}? Order {n}",
+    "The {p} arrived {i}, how do I get a refund for order {n}?",
+    "Order {n}: the {p} still shows {s} since {t}",
+    "The price of the {p} dropped after I paid, order {n}, can I get the difference?",
+    "The {p} runs small, I want to return it and exchange for a larger size ({n})",
+    "Coupon not working when I check out the {p}, order {n}",
+    "Shipping for order {n} is delayed because of the weather, when will the {p} arrive?",
+]
+
+_ZH_SLOTS = {
+    "p": ["连衣裙", "运动鞋", "蓝牙耳机", "保温杯", "羽绒服", "牛仔裤", "手机壳", "背包", "台灯", "衬衫", "电饭煲", "围巾"],
+    "c": ["黑色", "白色", "红色", "均码", "XL码", "38码", "大号", "小号"],
+    "i": ["有破损", "颜色不对", "少了配件", "质量很差", "和描述不符", "系统错误"],
+    "t": ["今天", "明天", "这周末", "下周一", "三天前", "昨天晚上"],
+    "s": ["已揽收", "运输中", "待发货", "派送中", "异常"],
+}
+
+_EN_SLOTS = {
+    "p": ["dress", "sneakers", "headphones", "water bottle", "jacket", "jeans", "phone case", "backpack", "desk lamp"],
+    "c": ["black", "white", "red", "size M", "size XL", "a larger size"],
+    "i": ["damaged", "in the wrong color", "missing parts", "broken", "late"],
+    "t": ["today", "tomorrow", "this weekend", "last Monday", "three days ago"],
+    "s": ["in transit", "pending shipment", "out for delivery", "delayed"],
+}
+
+_GROUPS = {
+    "物流": ["配送", "时效", "异常"],
+    "售后": ["退款", "换货", "投诉"],
+    "商品": ["尺码", "质量", "咨询"],
+    "支付": ["价格", "优惠", "发票"],
+    "账户": ["登录", "信息"],
+}
+
+_LABEL_VERBS = ["ask", "complain", "request", "check", "report", "confirm"]
+_LABEL_NOUNS = ["Delivery", "Refund", "Size", "Price", "Invoice", "Coupon", "Quality", "Exchange",
+                "Account", "Stock", "Color", "Address", "Weather", "Order"]
+
+# 用于把行号映射为看起来随机且唯一的订单号（素数模下的乘法是双射）
+_ORDER_MODULUS = 2_147_483_647
+_ORDER_MULTIPLIER = 48_271
+
+
+@dataclass
+class CatalogLabel:
+    """标签目录中的一个标签。"""
+    id: int
+    label: str
+    description: str
+    groups: str
+
+
+def build_label_catalog(label_count: int, seed: int) -> List[CatalogLabel]:
+    """
+    生成带分组的标签目录。
+
+    标签按排名排序，排名越靠前在 Zipf 分布中出现越频繁。
+
+    Args:
+        label_count: 标签数量
+        seed: 随机种子
+
+    Returns:
+        标签列表
+    """
+    rng = random.Random(seed)
+    names = [verb + noun for noun in _LABEL_NOUNS for verb in _LABEL_VERBS]
+    rng.shuffle(names)
+    while len(names) < label_count:
+        names.append(f"{rng.choice(_LABEL_VERBS)}{rng.choice(_LABEL_NOUNS)}{len(names)}")
+
+    group_paths = [(group, sub) for group, subs in _GROUPS.items() for sub in subs]
+    catalog = []
+    for i, name in enumerate(names[:label_count]):
+        group, sub = group_paths[i % len(group_paths)]
+        catalog.append(CatalogLabel(id=i, label=name, description=f"{group}/{sub}", groups=f"{group}/{sub}"))
+    return catalog
+
+
+class CorpusGenerator:
+    """
+    按种子流式生成 (text, labels) 记录。
+
+    Attributes:
+        catalog: 标签目录
+    """
+
+    def __init__(
+        self,
+        seed: int = 42,
+        label_count: int = 80,
+        zipf_s: float = 1.1,
+        unlabeled_ratio: float = 0.2,
+        multi_label_p: float = 0.35,
+        max_labels: int = 4,
+        zh_ratio: float = 0.6,
+    ):
+        self.seed = seed
+        self.catalog = build_label_catalog(label_count, seed)
+        self.unlabeled_ratio = unlabeled_ratio
+        self.multi_label_p = multi_label_p
+        self.max_labels = max_labels
+        self.zh_ratio = zh_ratio
+        self._cum_weights = list(accumulate(1 / (rank + 1) ** zipf_s for rank in range(label_count)))
+
+    def _fill(self, rng: random.Random, template: str, slots: dict, order_no: str) -> str:
+        """填充模板槽位"""
+        values = {key: options[int(rng.random() * len(options))] for key, options in slots.items()}
+        return template.format(n=order_no, **values)
+
+    def _pick_labels(self, rng: random.Random) -> str:
+        """按 Zipf 分布抽取多标签"""
+        if rng.random() < self.unlabeled_ratio:
+            return ""
+        count = 1
+        while count < self.max_labels and rng.random() < self.multi_label_p:
+            count += 1
+        total = self._cum_weights[-1]
+        picked = dict.fromkeys(
+            self.catalog[bisect(self._cum_weights, rng.random() * total)].label for _ in range(count)
+        )
+        return ", ".join(picked)
+
+    def records(self, rows: int, start: int = 0) -> Iterator[Tuple[str, str]]:
+        """
+        生成记录。
+
+        Args:
+            rows: 记录数量
+            start: 起始行号（用于分段生成，行号决定唯一订单号）
+
+        Yields:
+            (文本, 逗号分隔标签) 元组，未标注时标签为空字符串
+        """
+        rng = random.Random(f"{self.seed}:{start}")
+        for i in range(start, start + rows):
+            order_no = str((i + 1) * _ORDER_MULTIPLIER % _ORDER_MODULUS).zfill(10)
+            if rng.random() < self.zh_ratio:
+                template = _ZH_TEMPLATES[int(rng.random() * len(_ZH_TEMPLATES))]
+                text = self._fill(rng, template, _ZH_SLOTS, order_no)
+            else:
+                template = _EN_TEMPLATES[int(rng.random() * len(_EN_TEMPLATES))]
+                text = self._fill(rng, template, _EN_SLOTS, order_no)
+            yield text, self._pick_labels(rng)
+
+
+def _batches(iterator: Iterator, size: int) -> Iterator[list]:
+    """按批次切分迭代器"""
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+def write_text(generator: CorpusGenerator, rows: int, output: Path) -> int:
+    """写入纯文本文件，每行一条文本"""
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with open(output, "w", encoding="utf-8", buffering=1024 * 1024) as f:
+        for batch in _batches(generator.records(rows), 100_000):
+            f.write("\n".join(text for text, _ in batch))
+            f.write("\n")
+    return rows
+
+
+def write_old_data(generator: CorpusGenerator, rows: int, output: Path) -> int:
+    """
+    写入旧数据目录树：<group>/<label>.txt 和 label_config.yaml。
+
+    旧数据格式没有未标注的概念，未标注记录会被跳过。
+
+    Returns:
+        写入的记录数
+    """
+    output.mkdir(parents=True, exist_ok=True)
+    handles = {}
+    written = 0
+    try:
+        for item in generator.catalog:
+            directory = output / item.groups.split("/")[0]
+            directory.mkdir(exist_ok=True)
+            handles[item.label] = open(directory / f"{item.label}.txt", "w", encoding="utf-8", buffering=256 * 1024)
+
+        for text, labels in generator.records(rows):
+            if not labels:
+                continue
+            for label in labels.split(", "):
+                handles[label].write(text + "\n")
+            written += 1
+    finally:
+        for handle in handles.values():
+            handle.close()
+
+    with open(output / "label_config.yaml", "w", encoding="utf-8") as f:
+        f.write("id2label:\n")
+        for item in generator.catalog:
+            f.write(f"  {item.id}: {item.label}\n")
+    return written
+
+
+def write_sqlite(generator: CorpusGenerator, rows: int, output: Path, batch_size: int = 100_000) -> int:
+    """
+    直接批量写入 SQLite 数据库。
+
+    先按应用模型建表并临时删除 annotation_data 的索引，批量插入后再重建索引，
+    比逐行维护索引快一个数量级。
+
+    Returns:
+        写入的记录数
+    """
+    from server.models import AnnotationData, Base, create_db_engine
+
+    output.parent.mkdir(parents=True, exist_ok=True)
+    engine = create_db_engine(f"sqlite:///{output}")
+    Base.metadata.create_all(bind=engine)
+    indexes = list(AnnotationData.__table__.indexes)
+    for index in indexes:
+        index.drop(bind=engine)
+    engine.dispose()
+
+    conn = sqlite3.connect(str(output))
+    conn.execute("PRAGMA journal_mode=OFF")
+    conn.execute("PRAGMA synchronous=OFF")
+    conn.execute("PRAGMA cache_size=-262144")
+    conn.execute("PRAGMA temp_store=MEMORY")
+    conn.executemany(
+        "INSERT INTO labels (id, label, description, groups) VALUES (?, ?, ?, ?)",
+        [(item.id, item.label, item.description, item.groups) for item in generator.catalog]
+    )
+    for batch in _batches(generator.records(rows), batch_size):
+        conn.executemany("INSERT INTO annotation_data (text, labels) VALUES (?, ?)", batch)
+    conn.commit()
+    conn.close()
+
+    engine = create_db_engine(f"sqlite:///{output}")
+    for index in indexes:
+        index.create(bind=engine)
+    with engine.connect() as connection:
+        connection.exec_driver_sql("ANALYZE")
+    engine.dispose()
+
+    conn = sqlite3.connect(str(output))
+    conn.execute("PRAGMA journal_mode=DELETE")
+    conn.close()
+    return rows
+
+
+def parse_rows(value: str) -> int:
+    """解析行数，支持 k / m 后缀"""
+    value = value.strip().lower()
+    if value.endswith("k"):
+        return int(float(value[:-1]) * 1_000)
+    if value.endswith("m"):
+        return int(float(value[:-1]) * 1_000_000)
+    return int(value)
+
+
+def main(argv: Optional[List[str]] = None):
+    """命令行入口"""
+    parser = argparse.ArgumentParser(description="合成语料生成器")
+    parser.add_argument("--rows", default="100k", help="记录数，支持 k / m 后缀")
+    parser.add_argument("--format", choices=["text", "old-data", "sqlite"], default="sqlite")
+    parser.add_argument("--output", required=True, help="输出文件或目录")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--labels", type=int, default=80, help="标签目录大小")
+    parser.add_argument("--zipf-s", type=float, default=1.1, help="Zipf 分布指数")
+    parser.add_argument("--unlabeled-ratio", type=float, default=0.2)
+    parser.add_argument("--force", action="store_true", help="覆盖已存在的输出")
+    args = parser.parse_args(argv)
+
+    rows = parse_rows(args.rows)
+    output = Path(args.output)
+    if output.exists() and not args.force:
+        raise SystemExit(f"输出已存在: {output}（使用 --force 覆盖）")
+    if output.exists() and output.is_file():
+        os.remove(output)
+
+    generator = CorpusGenerator(
+        seed=args.seed, label_count=args.labels, zipf_s=args.zipf_s, unlabeled_ratio=args.unlabeled_ratio
+    )
+    writers = {"text": write_text, "old-data": write_old_data, "sqlite": write_sqlite}
+
+    start = time.perf_counter()
+    written = writers[args.format](generator, rows, output)
+    elapsed = time.perf_counter() - start
+    print(f"已生成 {written} 条记录 -> {output}（{args.format}），耗时 {elapsed:.1f}秒，{written / elapsed:,.0f} 条/秒")
+
+
+if __name__ == "__main__":
+    main()
@@ -6,15 +6,38 @@
 
 import requests
 import time
+from pathlib import Path
 from typing import Dict, List
 import json
 
+# SLO 阈值与 scripts/load_test.py 共用，单次请求按 p95 阈值判定
+SLO_PATH = Path(__file__).parent.parent / "tests" / "slo_thresholds.json"
+
+
+def load_expected_times(slo_path: Path = SLO_PATH) -> Dict[str, float]:
+    """读取 SLO 阈值，返回 端点名 -> 期望耗时（秒）"""
+    with open(slo_path, "r", encoding="utf-8") as f:
+        endpoints = json.load(f)["endpoints"]
+    return {name: limit["p95_ms"] / 1000 for name, limit in endpoints.items()}
+
+
+def record_history(source: str, samples: Dict[str, List[float]]) -> None:
+    """将本次结果追加到性能历史记录（见 scripts/perf_history.py）"""
+    import sys
+
+    sys.path.append(str(Path(__file__).parent.parent))
+    from scripts.perf_history import DEFAULT_HISTORY_PATH, record_run
+
+    record_run(source, "local", samples)
+    print(f"已追加到性能历史: {DEFAULT_HISTORY_PATH}")
+
 
 def test_api_performance(base_url: str = "http://localhost:8000") -> None:
     """测试API性能"""
     
     print("=== API性能测试 ===")
     print(f"测试服务器: {base_url}")
+    expected_times = load_expected_times()
     
     # 测试健康检查
     try:
@@ -34,56 +57,56 @@ def test_api_performance(base_url: str = "http://localhost:8000") -> None:
             "name": "获取系统统计",
             "method": "GET",
             "url": "/stats",
-            "expected_time": 1.0  # 期望1秒内完成
+            "slo": "stats"
         },
         {
             "name": "分页查询（前50条）",
             "method": "POST",
             "url": "/annotations/search",
             "data": {"query": "", "page": 1, "per_page": 50},
-            "expected_time": 0.5
+            "slo": "search.page"
         },
         {
             "name": "分页查询（中间页）",
             "method": "POST",
             "url": "/annotations/search",
             "data": {"query": "", "page": 100, "per_page": 50},
-            "expected_time": 0.5
+            "slo": "search.page"
         },
         {
             "name": "文本搜索（通用关键词）",
             "method": "POST",
             "url": "/annotations/search",
             "data": {"query": "the", "page": 1, "per_page": 20},
-            "expected_time": 1.0
+            "slo": "search.keyword"
         },
         {
             "name": "标签搜索",
             "method": "POST",
             "url": "/annotations/search",
             "data": {"labels": "intent", "page": 1, "per_page": 20},
-            "expected_time": 1.0
+            "slo": "search.labels"
         },
         {
             "name": "复合搜索",
             "method": "POST",
             "url": "/annotations/search",
             "data": {"query": "weather", "labels": "intent", "page": 1, "per_page": 20},
-            "expected_time": 1.5
+            "slo": "search.compound"
         },
         {
             "name": "未标注数据查询",
             "method": "POST",
             "url": "/annotations/search",
             "data": {"unlabeled_only": True, "page": 1, "per_page": 20},
-            "expected_time": 1.0
+            "slo": "search.unlabeled"
         },
         {
             "name": "大页面查询",
             "method": "POST",
             "url": "/annotations/search",
             "data": {"query": "", "page": 1, "per_page": 200},
-            "expected_time": 1.0
+            "slo": "search.large_page"
         }
     ]
     
@@ -93,6 +116,7 @@ def test_api_performance(base_url: str = "http://localhost:8000") -> None:
     
     for i, test_case in enumerate(test_cases, 1):
         print(f"\n[{i}/{total_tests}] 测试: {test_case['name']}")
+        test_case["expected_time"] = expected_times[test_case["slo"]]
         
         start_time = time.time()
         
@@ -134,6 +158,7 @@ def test_api_performance(base_url: str = "http://localhost:8000") -> None:
                     "test": test_case["name"],
                     "time": execution_time,
                     "expected": test_case["expected_time"],
+                    "slo": test_case["slo"],
                     "passed": passed,
                     "info": info
                 })
@@ -178,6 +203,12 @@ def test_api_performance(base_url: str = "http://localhost:8000") -> None:
     
     print(f"\n详细结果已保存到: performance_test_results.json")
 
+    # 以 SLO 端点名分组追加到历史记录，便于跨提交比较
+    samples: Dict[str, List[float]] = {}
+    for result in results:
+        samples.setdefault(f"api.{result['slo']}", []).append(result["time"] * 1000)
+    record_history("test_performance", samples)
+
 
 def test_database_queries() -> None:
     """直接测试数据库查询性能"""
@@ -195,6 +226,7 @@ def test_database_queries() -> None:
     from server.services import AnnotationService, StatisticsService
     from server.schemas import SearchRequest
     
+    expected_times = load_expected_times()
     db = SessionLocal()
     annotation_service = AnnotationService(db)
     stats_service = StatisticsService(db)
@@ -205,45 +237,47 @@ def test_database_queries() -> None:
             {
                 "name": "统计查询",
                 "func": lambda: stats_service.get_system_stats(),
-                "expected_time": 1.0
+                "slo": "stats"
             },
             {
                 "name": "简单分页",
                 "func": lambda: annotation_service.search_annotations(
                     SearchRequest(query="", page=1, per_page=50)
                 ),
-                "expected_time": 0.3
+                "slo": "search.page"
             },
             {
                 "name": "文本搜索",
                 "func": lambda: annotation_service.search_annotations(
                     SearchRequest(query="weather", page=1, per_page=20)
                 ),
-                "expected_time": 0.5
+                "slo": "search.keyword"
             },
             {
                 "name": "标签搜索",
                 "func": lambda: annotation_service.search_annotations(
                     SearchRequest(labels="intent", page=1, per_page=20)
                 ),
-                "expected_time": 0.5
+                "slo": "search.labels"
             },
             {
                 "name": "复合搜索",
                 "func": lambda: annotation_service.search_annotations(
                     SearchRequest(query="weather", labels="intent", page=1, per_page=20)
                 ),
-                "expected_time": 0.8
+                "slo": "search.compound"
             }
         ]
         
+        samples: Dict[str, List[float]] = {}
         for query in queries:
             start_time = time.time()
             result = query["func"]()
             end_time = time.time()
             execution_time = end_time - start_time
+            samples.setdefault(f"db.{query['slo']}", []).append(execution_time * 1000)
             
-            passed = execution_time <= query["expected_time"]
+            passed = execution_time <= expected_times[query["slo"]]
             status = "✅ 通过" if passed else "⚠️  较慢"
             
             print(f"{query['name']}: {execution_time:.3f}秒 {status}")
@@ -253,6 +287,8 @@ def test_database_queries() -> None:
                 print(f"  结果数量: {result.total}")
             elif hasattr(result, 'total_texts'):
                 print(f"  总文本: {result.total_texts}, 已标注: {result.labeled_texts}")
+
+        record_history("test_performance", samples)
     
     finally:
         db.close()
@@ -0,0 +1,270 @@
+"""
+准入控制模块
+
+本模块提供以下功能：
+- 按路由类别（interactive / search / stats / bulk）的加权并发限制
+- 搜索请求、批量操作的代价估计（权重单位）
+- 超出容量时按 FIFO 排队，排队超时或队列已满时返回 503 并附带 Retry-After
+
+准入在事件循环中完成（异步依赖），排队的请求不占用线程池线程和数据库连接；
+重查询只能占满自己类别的容量，单条标注操作的延迟不受其影响。
+"""
+
+import asyncio
+import math
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Deque, Dict, Tuple
+
+from fastapi import HTTPException
+
+from .config import ADMISSION_CONTROL_ENABLED, ADMISSION_LIMITS
+from . import metrics, schemas
+
+# 每页 250 条计 1 个单位：per_page=1000 的搜索比默认分页贵 4 个单位
+_ROWS_PER_UNIT = 250
+# 深分页（OFFSET）需要先扫过前面的行
+_OFFSET_ROWS_PER_UNIT = 50000
+# 按 ID 的批量操作每 1000 条计 1 个单位
+_IDS_PER_UNIT = 1000
+
+
+class AdmissionRejected(Exception):
+    """请求未获准入（队列已满或排队超时）"""
+
+    def __init__(self, route_class: str, reason: str, retry_after: int):
+        super().__init__(f"{route_class}: {reason}")
+        self.route_class = route_class
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class WeightedLimiter:
+    """
+    加权并发限制器（只在事件循环线程中使用）。
+
+    同时持有的权重之和不超过 capacity，超过单个请求容量的权重按 capacity 计（独占）。
+    排队严格按到达顺序放行，重请求不会被源源不断的轻请求饿死。
+    """
+
+    def __init__(self, name: str, capacity: int, max_queue: int, queue_timeout: float):
+        self.name = name
+        self.capacity = capacity
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.in_use = 0
+        self._waiters: Deque[Tuple[int, asyncio.Future]] = deque()
+        # 每单位权重的平均持有时间（秒），用于估计 Retry-After
+        self._hold_per_unit = 0.05
+
+    @property
+    def queued(self) -> int:
+        return sum(1 for _, future in self._waiters if not future.done())
+
+    def clamp(self, weight: int) -> int:
+        return min(max(1, weight), self.capacity)
+
+    def retry_after(self, weight: int) -> int:
+        """按排在前面的权重和平均持有时间估计多久后重试（秒，至少 1）"""
+        queued_weight = sum(w for w, future in self._waiters if not future.done())
+        return max(1, math.ceil(self._hold_per_unit * (self.in_use + queued_weight + weight) / self.capacity))
+
+    def _grant(self):
+        while self._waiters:
+            weight, future = self._waiters[0]
+            if future.done():
+                self._waiters.popleft()
+                continue
+            if self.in_use + weight > self.capacity:
+                break
+            self._waiters.popleft()
+            self.in_use += weight
+            future.set_result(None)
+
+    async def acquire(self, weight: int, timeout: float = None) -> float:
+        """
+        获取权重，必要时排队。
+
+        Args:
+            weight: 已按 clamp 处理的权重
+            timeout: 最长排队时间（秒），默认使用类别配置
+
+        Returns:
+            排队等待时间（秒）
+
+        Raises:
+            AdmissionRejected: 队列已满或排队超时
+        """
+        if not self._waiters and self.in_use + weight <= self.capacity:
+            self.in_use += weight
+            return 0.0
+        if self.queued >= self.max_queue:
+            raise AdmissionRejected(self.name, "queue_full", self.retry_after(weight))
+
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.append((weight, future))
+        start = time.perf_counter()
+        try:
+            await asyncio.wait_for(future, self.queue_timeout if timeout is None else timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if future.done() and not future.cancelled():
+                # 超时与放行同时发生：已经计入 in_use，归还后再处理
+                self.release(weight)
+            else:
+                future.cancel()
+                self._grant()
+            if isinstance(e, asyncio.CancelledError):
+                raise
+            raise AdmissionRejected(self.name, "timeout", self.retry_after(weight)) from None
+        return time.perf_counter() - start
+
+    def release(self, weight: int, held_seconds: float = None):
+        """归还权重并放行排队的请求"""
+        self.in_use -= weight
+        if held_seconds is not None:
+            self._hold_per_unit = 0.8 * self._hold_per_unit + 0.2 * held_seconds / weight
+        self._grant()
+
+
+limiters: Dict[str, WeightedLimiter] = {
+    name: WeightedLimiter(name, **limits) for name, limits in ADMISSION_LIMITS.items()
+}
+
+
+def _count_terms(value) -> int:
+    if not value:
+        return 0
+    if isinstance(value, str):
+        return sum(1 for term in value.split(",") if term.strip())
+    return sum(1 for term in value if term.strip())
+
+
+def estimate_search_cost(search_request: schemas.SearchRequest) -> int:
+    """
+    估计搜索请求的代价（权重单位，至少 1）。
+
+    文本包含 / 排除条件是 LIKE '%...%' 全表扫描，代价最高；标签条件同样是 LIKE 匹配但列较短；
+    每页条数越大，序列化和传输越多（只返回 ID 时按 1 页 1000 条计）；深分页需要跳过大量行。
+    """
+    cost = 1
+    text_terms = (
+        bool(search_request.query) + bool(search_request.exclude_query)
+        + _count_terms(search_request.keywords) + _count_terms(search_request.exclude_keywords)
+    )
+    if text_terms:
+        cost += 2 + (text_terms - 1)
+    label_terms = _count_terms(search_request.labels) + _count_terms(search_request.exclude_labels)
+    if label_terms:
+        cost += 1 + label_terms // 4
+    if search_request.ids_only:
+        return cost + 1000 // _ROWS_PER_UNIT
+    cost += search_request.per_page // _ROWS_PER_UNIT
+    cost += (search_request.page - 1) * search_request.per_page // _OFFSET_ROWS_PER_UNIT
+    return cost
+
+
+def estimate_bulk_update_cost(update_request: schemas.BulkLabelUpdateRequest) -> int:
+    """估计批量标签更新的代价：按 ID 更新按条数计，按搜索条件更新需要先扫描再逐条写入"""
+    if update_request.text_ids:
+        return 1 + len(update_request.text_ids) // _IDS_PER_UNIT
+    criteria = update_request.search_criteria or schemas.SearchRequest()
+    # 按条件更新会处理全部匹配行，与每页条数无关
+    return 2 + estimate_search_cost(criteria) - criteria.per_page // _ROWS_PER_UNIT
+
+
+def estimate_batch_cost(count: int) -> int:
+    """估计逐条执行的批量标注读写的代价：每 _ROWS_PER_UNIT 条多计 1 个单位"""
+    return 1 + count // _ROWS_PER_UNIT
+
+
+@asynccontextmanager
+async def admission(route_class: str, weight: int = 1):
+    """
+    在 route_class 的限制器中持有 weight 个单位。
+
+    Raises:
+        HTTPException: 503，带 Retry-After 响应头
+    """
+    limiter = limiters.get(route_class)
+    if not ADMISSION_CONTROL_ENABLED or limiter is None:
+        yield
+        return
+
+    weight = limiter.clamp(weight)
+    try:
+        waited = await limiter.acquire(weight)
+    except AdmissionRejected as e:
+        metrics.admission_rejected.inc(route_class, e.reason)
+        raise HTTPException(
+            status_code=503,
+            detail=f"服务繁忙（{route_class} 类请求{'排队已满' if e.reason == 'queue_full' else '排队超时'}），请稍后重试",
+            headers={"Retry-After": str(e.retry_after)},
+        )
+    metrics.admission_wait.observe(waited, route_class)
+
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        limiter.release(weight, time.perf_counter() - start)
+
+
+def admit(route_class: str, weight: int = 1, exclusive: bool = False):
+    """
+    固定权重的准入依赖，用法: dependencies=[Depends(admit("interactive"))]。
+
+    Args:
+        route_class: 路由类别
+        weight: 权重单位
+        exclusive: 独占整个类别的容量
+    """
+    if exclusive:
+        weight = ADMISSION_LIMITS.get(route_class, {}).get("capacity", weight)
+
+    async def dependency():
+        async with admission(route_class, weight):
+            yield
+
+    return dependency
+
+
+# 以下依赖的参数名需与端点的请求体参数名一致，FastAPI 才会将两者合并为同一个请求体
+
+
+async def admit_search(search_request: schemas.SearchRequest):
+    """搜索请求的准入依赖（按估计代价加权）"""
+    async with admission("search", estimate_search_cost(search_request)):
+        yield
+
+
+async def admit_annotation_batch(batch_request: schemas.AnnotationBatchRequest):
+    """批量读取 / 更新标注的准入依赖（代替多次单条请求，归入 interactive 类）"""
+    async with admission("interactive", estimate_batch_cost(len(batch_request.ids) + len(batch_request.updates))):
+        yield
+
+
+async def admit_bulk_update(update_request: schemas.BulkLabelUpdateRequest):
+    """批量标签更新的准入依赖"""
+    async with admission("bulk", estimate_bulk_update_cost(update_request)):
+        yield
+
+
+async def admit_bulk_label(bulk_request: schemas.BulkLabelRequest):
+    """按 ID 批量标注的准入依赖"""
+    async with admission("bulk", 1 + len(bulk_request.text_ids) // _IDS_PER_UNIT):
+        yield
+
+
+async def admit_import_texts(import_request: schemas.TextImportRequest):
+    """文本导入的准入依赖"""
+    async with admission("bulk", 1 + len(import_request.texts) // _IDS_PER_UNIT):
+        yield
+
+
+def admission_stats() -> Dict[str, Dict[str, int]]:
+    """各类别的容量、占用权重和排队请求数"""
+    return {
+        name: {"capacity": limiter.capacity, "in_use": limiter.in_use, "queued": limiter.queued}
+        for name, limiter in limiters.items()
+    }
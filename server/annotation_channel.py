@@ -0,0 +1,225 @@
+"""
+WebSocket 标注通道
+
+高速标注时每次标签修改都是一次 HTTP 请求，另外还要请求下一批条目和统计。
+本模块在一个 WebSocket 连接上完成这些交互：
+
+客户端消息：
+- {"type": "ops", "seq": 1, "ops": [{"id": 1, "labels": "a, b"}, ...]}
+  批量标签操作，逐条经 AnnotationService.update_annotation 执行，回复 ack
+- {"type": "queue", "filter": {...SearchRequest...}, "prefetch": 20}
+  设置待标注队列（按 ID 顺序），立即推送前 prefetch 条
+- {"type": "next", "count": 10}
+  继续取队列中的条目
+- {"type": "stats"}
+  请求完整的系统统计
+
+服务端消息：
+- {"type": "ack", "seq": 1, "results": [{"id": 1, "ok": true, "item": {...}} | {"id": 2, "ok": false, "error": "..."}]}
+- {"type": "items", "items": [...], "done": false}
+  队列中已推送但尚未标注的条目少于 prefetch 的一半时，服务端在 ack 之后自动补足
+- {"type": "stats", "stats": {...SystemStats...}}
+- {"type": "stats_delta", "labeled_texts": 1, "unlabeled_texts": -1, "labels": {"a": 1}, ...}
+  字段同 /events 的 stats 事件（见 change_events.py）；任一连接的标签操作提交后推送给所有连接；发送不及时的连接上多个增量合并为一条，不会丢失
+- {"type": "error", "seq": 1, "detail": "...", "retry_after": 1}
+
+标签操作与 POST /annotations/batch 一样经过 interactive 类准入控制（按操作数加权），取条目和统计经过 stats 类准入控制。
+"""
+
+import asyncio
+import json
+import logging
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from fastapi import HTTPException, WebSocket, WebSocketDisconnect
+
+from .admission import admission, estimate_batch_cost
+from .async_db import ThreadpoolRunner, new_db_runner
+from .change_events import StatsDelta
+from .config import ANNOTATION_WS_DEFAULT_PREFETCH, ANNOTATION_WS_MAX_OPS, ANNOTATION_WS_MAX_PREFETCH
+from .services import AnnotationService, StatisticsService
+from . import fast_json, metrics, schemas
+
+logger = logging.getLogger(__name__)
+
+# 发送队列中表示“发送合并后的统计增量”的标记
+_FLUSH_DELTA = object()
+
+_MESSAGE_TYPES = ("ops", "queue", "next", "stats")
+
+
+def apply_label_ops(session, ops: List[schemas.AnnotationLabelOp]) -> Tuple[List[Dict[str, Any]], StatsDelta]:
+    """
+    依次执行标签操作。
+
+    Returns:
+        (每条操作的结果, 统计变化)
+    """
+    service = AnnotationService(session)
+    results = []
+    delta = StatsDelta()
+    for op in ops:
+        annotation = service.get_annotation(op.id)
+        if annotation is None:
+            results.append({"id": op.id, "ok": False, "error": "标注未找到"})
+            continue
+        old_labels = annotation.labels
+        annotation = service.update_annotation(op.id, schemas.AnnotationDataUpdate(labels=op.labels))
+        delta.record(old_labels, annotation.labels)
+        item = schemas.AnnotationDataResponse.model_validate(annotation).model_dump()
+        results.append({"id": op.id, "ok": True, "item": item})
+    return results, delta
+
+
+class AnnotationChannel:
+    """单个 WebSocket 连接：接收消息的协程按顺序处理请求，发送协程按顺序发送回复和统计增量"""
+
+    def __init__(self, websocket: WebSocket):
+        self.websocket = websocket
+        self._outbox: asyncio.Queue = asyncio.Queue()
+        self._delta: Optional[StatsDelta] = None
+        self._queue_filter: Optional[schemas.SearchRequest] = None
+        self._cursor = 0
+        self._prefetch = ANNOTATION_WS_DEFAULT_PREFETCH
+        self._queue_done = False
+        # 已推送但尚未在本连接上标注的条目
+        self._outstanding: Set[int] = set()
+
+    def send(self, message: Dict[str, Any]):
+        self._outbox.put_nowait(message)
+
+    def push_delta(self, delta: StatsDelta):
+        """合并统计增量，发送协程空闲时发出"""
+        if self._delta is None:
+            self._delta = StatsDelta()
+            self._outbox.put_nowait(_FLUSH_DELTA)
+        self._delta.merge(delta)
+
+    async def send_loop(self):
+        while True:
+            message = await self._outbox.get()
+            if message is None:
+                return
+            if message is _FLUSH_DELTA:
+                delta, self._delta = self._delta, None
+                if delta is None or delta.is_empty():
+                    continue
+                message = {"type": "stats_delta", **delta.to_dict()}
+            await self.websocket.send_text(fast_json.dumps(message).decode("utf-8"))
+
+    def close(self):
+        self._outbox.put_nowait(None)
+
+    async def handle(self, message: Dict[str, Any]):
+        kind = message.get("type")
+        metrics.annotation_channel_messages.inc(kind if kind in _MESSAGE_TYPES else "unknown")
+        if kind == "ops":
+            await self._handle_ops(message)
+        elif kind == "queue":
+            self._queue_filter = schemas.SearchRequest.model_validate(message.get("filter") or {})
+            self._prefetch = min(max(1, int(message.get("prefetch", ANNOTATION_WS_DEFAULT_PREFETCH))),
+                                 ANNOTATION_WS_MAX_PREFETCH)
+            self._cursor = 0
+            self._queue_done = False
+            self._outstanding.clear()
+            await self._send_items(self._prefetch)
+        elif kind == "next":
+            if self._queue_filter is None:
+                raise ValueError("请先发送 queue 消息设置待标注队列")
+            count = int(message.get("count", self._prefetch))
+            await self._send_items(min(max(1, count), ANNOTATION_WS_MAX_PREFETCH))
+        elif kind == "stats":
+            async with admission("stats"):
+                stats = await _run(lambda session: StatisticsService(session).get_system_stats(), cpu_bound=True)
+            self.send({"type": "stats", "stats": stats.model_dump()})
+        else:
+            raise ValueError(f"未知的消息类型: {kind}")
+
+    async def _handle_ops(self, message: Dict[str, Any]):
+        raw_ops = message.get("ops") or []
+        if len(raw_ops) > ANNOTATION_WS_MAX_OPS:
+            raise ValueError(f"单条消息最多 {ANNOTATION_WS_MAX_OPS} 个操作")
+        ops = [schemas.AnnotationLabelOp.model_validate(op) for op in raw_ops]
+        async with admission("interactive", estimate_batch_cost(len(ops))):
+            results, delta = await _run(apply_label_ops, ops)
+        self.send({"type": "ack", "seq": message.get("seq"), "results": results})
+        if not delta.is_empty():
+            hub.broadcast(delta)
+
+        self._outstanding.difference_update(op.id for op in ops)
+        if self._queue_filter is not None and not self._queue_done and len(self._outstanding) * 2 < self._prefetch:
+            await self._send_items(self._prefetch - len(self._outstanding))
+
+    async def _send_items(self, count: int):
+        search_request, after_id = self._queue_filter, self._cursor
+        async with admission("stats"):
+            items = await _run(
+                lambda session: AnnotationService(session).next_annotations(search_request, after_id, count)
+            )
+        if items:
+            self._cursor = items[-1]["id"]
+            self._outstanding.update(item["id"] for item in items)
+        self._queue_done = len(items) < count
+        self.send({"type": "items", "items": items, "done": self._queue_done})
+
+
+async def _run(fn, *args, cpu_bound: bool = False):
+    """在新的数据库会话上执行 fn(session, *args)；计算量大的操作（统计）始终在线程池中执行"""
+    runner = ThreadpoolRunner() if cpu_bound else new_db_runner()
+    try:
+        return await runner.run(fn, *args)
+    finally:
+        await runner.aclose()
+
+
+class ChannelHub:
+    """本进程内所有标注通道（只在事件循环线程中使用）"""
+
+    def __init__(self):
+        self.channels: Set[AnnotationChannel] = set()
+
+    def broadcast(self, delta: StatsDelta):
+        for channel in self.channels:
+            channel.push_delta(delta)
+
+
+hub = ChannelHub()
+
+
+async def serve_annotation_channel(websocket: WebSocket):
+    """处理一个 WebSocket 标注连接，直到客户端断开"""
+    await websocket.accept()
+    channel = AnnotationChannel(websocket)
+    hub.channels.add(channel)
+    sender = asyncio.create_task(channel.send_loop())
+    try:
+        while True:
+            text = await websocket.receive_text()
+            seq = None
+            try:
+                message = json.loads(text)
+                if not isinstance(message, dict):
+                    raise ValueError("消息必须是 JSON 对象")
+                seq = message.get("seq")
+                await channel.handle(message)
+            except HTTPException as e:
+                # 准入控制拒绝：与 HTTP 端点的 503 + Retry-After 相同
+                retry_after = (e.headers or {}).get("Retry-After")
+                channel.send({"type": "error", "seq": seq, "detail": e.detail,
+                              "retry_after": int(retry_after) if retry_after else None})
+            except (ValueError, TypeError) as e:
+                channel.send({"type": "error", "seq": seq, "detail": str(e)})
+            except Exception as e:
+                # 单条消息处理失败（如数据库错误）不断开连接
+                logger.exception(f"标注通道消息处理失败: {e}")
+                channel.send({"type": "error", "seq": seq, "detail": "服务器内部错误"})
+    except WebSocketDisconnect:
+        pass
+    finally:
+        hub.channels.discard(channel)
+        channel.close()
+        try:
+            await sender
+        except Exception:
+            # 连接已断开，剩余消息无法发送
+            pass
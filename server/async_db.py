@@ -0,0 +1,174 @@
+"""
+异步数据库层
+
+本模块提供以下功能：
+- 基于 SQLAlchemy asyncio 扩展和 aiosqlite 的异步引擎与会话（ASYNC_DB_ENABLED 时启用）
+- 数据库执行器依赖 get_db_runner：端点以 async def 编写，服务层代码保持同步，
+  由执行器决定在线程池中运行（默认），还是通过 AsyncSession.run_sync 在事件循环中运行、
+  等待数据库时让出事件循环（不占用线程池线程）
+
+异步模式下服务代码中的 Python 计算在事件循环中执行，只适合查询为主的端点；
+批量操作、导入和统计（逐行统计标签）仍使用线程池中的同步会话。
+异步连接上没有进度回调，查询时间预算和断开中断只作用于同步会话。
+"""
+
+import importlib.util
+import logging
+import time
+from abc import ABC, abstractmethod
+from typing import Any, Callable, Optional
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import event, make_url
+from sqlalchemy.orm import Session
+
+from .config import (
+    ASYNC_DB_ENABLED, DATABASE_URL, DB_POOL_MAX_OVERFLOW, DB_POOL_SIZE, METRICS_ENABLED, SLOW_QUERY_LOG_ENABLED,
+    SQLITE_WAL_ENABLED
+)
+from . import metrics, models, slow_query
+
+logger = logging.getLogger(__name__)
+
+# 可选依赖（pip install text-annotation[async]）
+ASYNC_DB_AVAILABLE = all(importlib.util.find_spec(name) is not None for name in ("aiosqlite", "greenlet"))
+
+
+class DatabaseRunner(ABC):
+    """数据库执行器：在请求的数据库会话上执行同步服务代码"""
+
+    @abstractmethod
+    async def run(self, fn: Callable[..., Any], *args) -> Any:
+        """
+        执行 fn(session, *args) 并返回结果。
+
+        Args:
+            fn: 第一个参数为同步 Session 的函数
+        """
+
+    @abstractmethod
+    async def aclose(self):
+        """关闭会话（请求结束时调用）"""
+
+
+class ThreadpoolRunner(DatabaseRunner):
+    """在线程池中使用同步会话执行服务代码（会话在第一次执行时创建）"""
+
+    def __init__(self, session_factory: Callable[[], Session] = models.open_session):
+        """
+        Args:
+            session_factory: 创建会话的函数（默认为应用数据库，基准测试可传入其他数据库的 sessionmaker）
+        """
+        self.session_factory = session_factory
+        self.session: Optional[Session] = None
+
+    def _call(self, fn: Callable[..., Any], args) -> Any:
+        if self.session is None:
+            self.session = self.session_factory()
+        return fn(self.session, *args)
+
+    async def run(self, fn: Callable[..., Any], *args) -> Any:
+        return await run_in_threadpool(self._call, fn, args)
+
+    async def aclose(self):
+        if self.session is not None:
+            await run_in_threadpool(self.session.close)
+
+
+class AsyncSessionRunner(DatabaseRunner):
+    """通过 AsyncSession.run_sync 执行服务代码：语句交给 aiosqlite 执行，等待期间事件循环可处理其他请求"""
+
+    def __init__(self):
+        self.session = None
+
+    async def run(self, fn: Callable[..., Any], *args) -> Any:
+        if self.session is None:
+            # 建表检查在首次调用后只是一次标志判断
+            models.ensure_tables()
+            self.session = AsyncSessionLocal()
+            if METRICS_ENABLED:
+                start = time.perf_counter()
+                await self.session.connection()
+                metrics.observe_connection_wait(time.perf_counter() - start)
+        return await self.session.run_sync(fn, *args)
+
+    async def aclose(self):
+        if self.session is not None:
+            await self.session.close()
+
+
+def create_async_db_engine(database_url: str = DATABASE_URL):
+    """
+    创建连接同一数据库的异步引擎（WAL、监控指标和慢查询日志与同步引擎一致）。
+
+    Args:
+        database_url: 同步引擎使用的数据库连接 URL
+
+    Returns:
+        SQLAlchemy AsyncEngine
+    """
+    from sqlalchemy.ext.asyncio import create_async_engine
+    from sqlalchemy.pool import StaticPool
+
+    url = make_url(database_url).set(drivername="sqlite+aiosqlite")
+    in_memory = url.database in (None, "", ":memory:")
+    if in_memory:
+        pool_options = {"poolclass": StaticPool}
+    else:
+        # 未指定 poolclass 时 aiosqlite 的文件数据库使用 AsyncAdaptedQueuePool
+        pool_options = {"pool_size": DB_POOL_SIZE, "max_overflow": DB_POOL_MAX_OVERFLOW}
+    engine = create_async_engine(
+        url,
+        connect_args={"check_same_thread": False, "timeout": 20, "isolation_level": None},
+        pool_pre_ping=True,
+        echo=False,
+        **pool_options,
+    )
+    sync_engine = engine.sync_engine
+    if SQLITE_WAL_ENABLED and not in_memory:
+        event.listen(sync_engine, "connect", models._enable_wal)
+    if METRICS_ENABLED:
+        metrics.instrument_engine(sync_engine)
+    if SLOW_QUERY_LOG_ENABLED:
+        slow_query.instrument_engine(sync_engine)
+    return engine
+
+
+async_engine = None
+AsyncSessionLocal = None
+
+if ASYNC_DB_ENABLED and not ASYNC_DB_AVAILABLE:
+    logger.warning("ASYNC_DB_ENABLED 已开启但未安装 aiosqlite / greenlet，使用线程池执行数据库操作")
+elif ASYNC_DB_ENABLED:
+    from sqlalchemy.ext.asyncio import async_sessionmaker
+
+    async_engine = create_async_db_engine()
+    # 本进程经异步引擎的写入同样递增数据版本，并共用查询缓存
+    models.data_version.track(async_engine.sync_engine)
+    models.app_engines.append(async_engine.sync_engine)
+    # 提交后不使对象过期：返回的对象在会话之外序列化，过期属性的延迟加载无法在事件循环中进行
+    AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+
+def new_db_runner() -> DatabaseRunner:
+    """创建数据库执行器：ASYNC_DB_ENABLED 且已安装 aiosqlite 时使用异步会话，否则使用线程池（用完需 aclose）"""
+    return AsyncSessionRunner() if AsyncSessionLocal is not None else ThreadpoolRunner()
+
+
+async def get_db_runner():
+    """
+    数据库执行器依赖。
+
+    会话在第一次执行时才创建，不访问数据库的请求（如合并写入的标签更新）不占用连接。
+    """
+    runner = new_db_runner()
+    try:
+        yield runner
+    finally:
+        await runner.aclose()
+
+
+async def dispose_async_engine():
+    """关闭异步引擎的连接（aiosqlite 的每个连接各有一个线程，需显式关闭）"""
+    if async_engine is not None:
+        await async_engine.dispose()
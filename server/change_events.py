@@ -0,0 +1,271 @@
+"""
+数据变化通知模块
+
+前端在每次操作后重新请求 /stats 和搜索结果以保持最新。本模块在 /events（SSE）上推送简短的变化通知，
+客户端据此增量更新，不再轮询：
+- annotations: {"version", "action": "created" | "updated" | "deleted", "ids": [...], "count"}
+  涉及的标注过多（超过 EVENTS_MAX_IDS）或无法得知 ID（导入）时 ids 为 null
+- labels: {"version", "action", "id"} 标签目录变化
+- stats: {"version", "total_texts", "labeled_texts", "unlabeled_texts", "total_labels", "labels": {...}}
+  统计增量；无法得知旧标签的批量操作（bulk-label）发送 {"version", "stale": true}，客户端重新请求 /stats
+- resync: {"version", "reason"} 客户端需重新加载全部数据：overflow（缓冲区溢出）、expired（断线期间的事件已不在历史中）、
+  import（旧数据导入等无法描述变化的写入）
+
+事件 ID 为 "<实例标识>:<版本号>"，版本号在本进程内单调递增。EventSource 断线重连时带上 Last-Event-ID，
+最近 EVENTS_HISTORY 条事件内的从断点补发，否则发送 resync。
+
+发布在服务层提交之后进行，可在任意线程调用：事件编码一次后放入每个订阅者的有界缓冲区，
+每次发布只向事件循环投递一次唤醒。多进程部署时每个进程只通知本进程的写入。
+"""
+
+import asyncio
+import threading
+import time
+from collections import deque
+from typing import Any, AsyncIterator, Deque, Dict, List, Optional, Set
+
+from .config import EVENTS_HISTORY, EVENTS_KEEPALIVE_SECONDS, EVENTS_MAX_IDS, EVENTS_SUBSCRIBER_BUFFER
+from . import fast_json, metrics
+
+
+def _label_counts(labels: Optional[str]) -> Dict[str, int]:
+    """按系统统计的规则计数标签（与 StatisticsService._get_label_statistics 一致）"""
+    counts: Dict[str, int] = {}
+    if labels:
+        for label in labels.split(","):
+            label = label.strip()
+            if label:
+                counts[label] = counts.get(label, 0) + 1
+    return counts
+
+
+class StatsDelta:
+    """写入引起的系统统计变化"""
+
+    def __init__(self):
+        self.total_texts = 0
+        self.labeled_texts = 0
+        self.total_labels = 0
+        self.labels: Dict[str, int] = {}
+
+    def record(self, old_labels: Optional[str], new_labels: Optional[str]):
+        """一条已有标注的标签从 old_labels 变为 new_labels"""
+        self.labeled_texts += bool(new_labels) - bool(old_labels)
+        for label, count in _label_counts(old_labels).items():
+            self.labels[label] = self.labels.get(label, 0) - count
+        for label, count in _label_counts(new_labels).items():
+            self.labels[label] = self.labels.get(label, 0) + count
+
+    def record_created(self, labels: Optional[str]):
+        self.total_texts += 1
+        self.record(None, labels)
+
+    def record_deleted(self, labels: Optional[str]):
+        self.total_texts -= 1
+        self.record(labels, None)
+
+    def merge(self, other: "StatsDelta"):
+        self.total_texts += other.total_texts
+        self.labeled_texts += other.labeled_texts
+        self.total_labels += other.total_labels
+        for label, count in other.labels.items():
+            self.labels[label] = self.labels.get(label, 0) + count
+
+    def is_empty(self) -> bool:
+        return not (self.total_texts or self.labeled_texts or self.total_labels or any(self.labels.values()))
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "total_texts": self.total_texts,
+            "labeled_texts": self.labeled_texts,
+            "unlabeled_texts": self.total_texts - self.labeled_texts,
+            "total_labels": self.total_labels,
+            "labels": {label: count for label, count in self.labels.items() if count},
+        }
+
+
+class Subscription:
+    """一个 SSE 客户端的有界事件缓冲区（由 ChangeBroker 的锁保护）"""
+
+    def __init__(self, max_pending: int):
+        self.max_pending = max_pending
+        self.pending: Deque[bytes] = deque()
+        # 缓冲区溢出或无法补发时丢弃积压的事件，下次读取时只发送 resync（值为原因）
+        self.resync: Optional[str] = None
+        self.wakeup = asyncio.Event()
+
+
+class ChangeBroker:
+    """变化事件的发布与分发（线程安全）"""
+
+    def __init__(self, history: int = EVENTS_HISTORY, max_pending: int = EVENTS_SUBSCRIBER_BUFFER):
+        self.instance = format(int(time.time() * 1000), "x")
+        self.version = 0
+        self.max_pending = max_pending
+        self._history: Deque[tuple] = deque(maxlen=history)
+        self._subscribers: Set[Subscription] = set()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._lock = threading.Lock()
+
+    @property
+    def subscriber_count(self) -> int:
+        return len(self._subscribers)
+
+    def _encode(self, event_type: str, data: Dict[str, Any]) -> bytes:
+        return (
+            f"id: {self.instance}:{self.version}\nevent: {event_type}\ndata: ".encode()
+            + fast_json.dumps(data) + b"\n\n"
+        )
+
+    def publish(self, event_type: str, **data):
+        """
+        发布一个事件。
+
+        Args:
+            event_type: annotations / labels / stats / resync
+            **data: 事件内容（自动加上 version）
+        """
+        with self._lock:
+            self.version += 1
+            data["version"] = self.version
+            event = self._encode(event_type, data)
+            self._history.append((self.version, event))
+            for subscription in self._subscribers:
+                if subscription.resync:
+                    continue
+                if len(subscription.pending) >= subscription.max_pending:
+                    subscription.pending.clear()
+                    subscription.resync = "overflow"
+                    continue
+                subscription.pending.append(event)
+            loop = self._loop if self._subscribers else None
+        metrics.change_events.inc(event_type)
+        if loop is not None:
+            try:
+                loop.call_soon_threadsafe(self._wake_all)
+            except RuntimeError:
+                # 事件循环已关闭
+                pass
+
+    def _wake_all(self):
+        for subscription in list(self._subscribers):
+            if subscription.pending or subscription.resync:
+                subscription.wakeup.set()
+
+    def subscribe(self, last_event_id: Optional[str] = None) -> Subscription:
+        """
+        注册订阅者（在事件循环中调用）。
+
+        Args:
+            last_event_id: 客户端收到的最后一个事件 ID，从其后补发
+        """
+        subscription = Subscription(self.max_pending)
+        with self._lock:
+            self._loop = asyncio.get_running_loop()
+            self._subscribers.add(subscription)
+            if last_event_id:
+                self._replay(subscription, last_event_id)
+        if subscription.pending or subscription.resync:
+            subscription.wakeup.set()
+        return subscription
+
+    def _replay(self, subscription: Subscription, last_event_id: str):
+        instance, _, version = last_event_id.partition(":")
+        try:
+            version = int(version)
+        except ValueError:
+            version = -1
+        oldest = self._history[0][0] if self._history else self.version + 1
+        if instance != self.instance or version > self.version or version < oldest - 1:
+            # 服务已重启或断线期间的事件已不在历史中
+            subscription.resync = "expired"
+            return
+        missed = [event for event_version, event in self._history if event_version > version]
+        if len(missed) > subscription.max_pending:
+            subscription.resync = "expired"
+        else:
+            subscription.pending.extend(missed)
+
+    def unsubscribe(self, subscription: Subscription):
+        with self._lock:
+            self._subscribers.discard(subscription)
+
+    def take(self, subscription: Subscription) -> List[bytes]:
+        """取出订阅者缓冲区中的全部事件；溢出时只返回一个 resync 事件"""
+        with self._lock:
+            subscription.wakeup.clear()
+            if subscription.resync:
+                reason, subscription.resync = subscription.resync, None
+                subscription.pending.clear()
+                metrics.change_event_resyncs.inc(reason)
+                return [self._encode("resync", {"version": self.version, "reason": reason})]
+            events = list(subscription.pending)
+            subscription.pending.clear()
+            return events
+
+    async def stream(self, last_event_id: Optional[str] = None,
+                     keepalive: float = EVENTS_KEEPALIVE_SECONDS) -> AsyncIterator[bytes]:
+        """
+        SSE 响应体：有事件时一次写出全部积压事件，空闲时定期发送注释行保持连接。
+
+        响应体开始发送时才注册订阅者：客户端在此之前断开时生成器不会执行，也就不会留下订阅者。
+
+        Args:
+            last_event_id: 客户端收到的最后一个事件 ID，从其后补发
+        """
+        subscription = self.subscribe(last_event_id)
+        try:
+            yield f"retry: 3000\n: {self.instance}:{self.version}\n\n".encode()
+            while True:
+                try:
+                    await asyncio.wait_for(subscription.wakeup.wait(), keepalive)
+                except asyncio.TimeoutError:
+                    yield b": keepalive\n\n"
+                    continue
+                events = self.take(subscription)
+                if events:
+                    yield b"".join(events)
+        finally:
+            self.unsubscribe(subscription)
+
+
+broker = ChangeBroker()
+
+
+def publish_annotations(action: str, ids: Optional[List[int]], count: Optional[int] = None,
+                        delta: Optional[StatsDelta] = None, stale: bool = False):
+    """
+    发布标注变化及其统计增量。
+
+    Args:
+        action: created / updated / deleted
+        ids: 变化的标注 ID（未知时为 None）
+        count: 变化的标注数（默认为 len(ids)）
+        delta: 统计增量
+        stale: 统计无法增量更新，客户端需重新请求
+    """
+    if count is None:
+        count = len(ids) if ids is not None else 0
+    if not count:
+        return
+    if ids is not None and len(ids) > EVENTS_MAX_IDS:
+        ids = None
+    broker.publish("annotations", action=action, ids=ids, count=count)
+    if stale:
+        broker.publish("stats", stale=True)
+    elif delta is not None and not delta.is_empty():
+        broker.publish("stats", **delta.to_dict())
+
+
+def publish_label(action: str, label_id: int):
+    """发布标签目录变化（新增和删除标签同时改变统计中的 total_labels）"""
+    broker.publish("labels", action=action, id=label_id)
+    if action != "updated":
+        delta = StatsDelta()
+        delta.total_labels = 1 if action == "created" else -1
+        broker.publish("stats", **delta.to_dict())
+
+
+def publish_resync(reason: str):
+    """通知所有客户端重新加载（无法描述具体变化的写入）"""
+    broker.publish("resync", reason=reason)
@@ -0,0 +1,223 @@
+"""
+响应压缩模块
+
+本模块提供以下功能：
+- 按 Accept-Encoding 协商编码（安装 brotli 时优先 br，否则使用 gzip）
+- 动态响应压缩中间件：整块响应超过阈值才压缩，流式响应逐块压缩并立即 flush
+- 供静态资源预压缩使用的一次性压缩函数
+
+SSE（text/event-stream）、已带 Content-Encoding 的响应（如预压缩的静态文件）、
+部分内容（206）及非文本类型不做处理。
+"""
+
+import gzip
+import zlib
+from typing import List, Optional, Tuple
+
+from starlette.datastructures import Headers, MutableHeaders
+
+from .config import COMPRESSION_BROTLI_QUALITY, COMPRESSION_GZIP_LEVEL, COMPRESSION_MIN_SIZE
+
+try:
+    import brotli
+except ImportError:  # 可选依赖
+    brotli = None
+
+# 服务端偏好顺序：客户端权重相同时靠前的优先
+SUPPORTED_ENCODINGS: Tuple[str, ...] = ("br", "gzip") if brotli is not None else ("gzip",)
+
+_COMPRESSIBLE_TYPES = {
+    "application/json",
+    "application/javascript",
+    "application/x-ndjson",
+    "application/xml",
+    "image/svg+xml",
+}
+
+
+def accepted_encodings(accept_encoding: str, available: Tuple[str, ...] = SUPPORTED_ENCODINGS) -> List[str]:
+    """
+    解析 Accept-Encoding，返回客户端可接受的编码（按权重从高到低，权重相同按服务端偏好）。
+
+    Args:
+        accept_encoding: 请求头 Accept-Encoding 的值
+        available: 服务端支持的编码
+
+    Returns:
+        可用编码列表，客户端不接受任何压缩时为空列表
+    """
+    weights = {}
+    for part in accept_encoding.split(","):
+        token, _, params = part.partition(";")
+        token = token.strip().lower()
+        if not token:
+            continue
+        weight = 1.0
+        for param in params.split(";"):
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    weight = float(value)
+                except ValueError:
+                    weight = 0.0
+        weights[token] = weight
+
+    candidates = []
+    for order, encoding in enumerate(available):
+        weight = weights.get(encoding, weights.get("*", 0.0))
+        if weight > 0:
+            candidates.append((-weight, order, encoding))
+    return [encoding for _, _, encoding in sorted(candidates)]
+
+
+def is_compressible_type(content_type: str) -> bool:
+    """是否为值得压缩的文本类型（SSE 除外）"""
+    media_type = content_type.split(";", 1)[0].strip().lower()
+    if media_type == "text/event-stream":
+        return False
+    return (
+        media_type.startswith("text/")
+        or media_type in _COMPRESSIBLE_TYPES
+        or media_type.endswith("+json")
+        or media_type.endswith("+xml")
+    )
+
+
+def compress(data: bytes, encoding: str, level: Optional[int] = None) -> bytes:
+    """
+    一次性压缩整块数据。
+
+    Args:
+        data: 原始字节串
+        encoding: "br" 或 "gzip"
+        level: 压缩级别，默认使用动态响应的配置
+    """
+    if encoding == "br":
+        return brotli.compress(data, quality=COMPRESSION_BROTLI_QUALITY if level is None else level)
+    # mtime=0 保证相同内容的输出一致
+    return gzip.compress(data, compresslevel=COMPRESSION_GZIP_LEVEL if level is None else level, mtime=0)
+
+
+class StreamCompressor:
+    """流式压缩器：每块数据压缩后立即 flush，保证下游能及时收到已产生的内容"""
+
+    def __init__(self, encoding: str):
+        self.encoding = encoding
+        if encoding == "br":
+            self._compressor = brotli.Compressor(quality=COMPRESSION_BROTLI_QUALITY)
+        else:
+            self._compressor = zlib.compressobj(COMPRESSION_GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def compress(self, chunk: bytes) -> bytes:
+        if self.encoding == "br":
+            return self._compressor.process(chunk) + self._compressor.flush()
+        return self._compressor.compress(chunk) + self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        if self.encoding == "br":
+            return self._compressor.finish()
+        return self._compressor.flush()
+
+
+def _add_vary(headers: MutableHeaders):
+    vary = [token.strip().lower() for token in headers.get("vary", "").split(",")]
+    if "accept-encoding" not in vary:
+        headers.add_vary_header("Accept-Encoding")
+
+
+def _should_compress(status: int, headers: Headers) -> bool:
+    if status < 200 or status in (204, 206, 304):
+        return False
+    if "content-encoding" in headers or "content-range" in headers:
+        return False
+    return is_compressible_type(headers.get("content-type", ""))
+
+
+class CompressionMiddleware:
+    """
+    动态响应压缩中间件（纯 ASGI，不缓冲流式响应）。
+
+    响应头和第一块响应体到达后再决定是否压缩：
+    - 单块响应：不小于 minimum_size 时整体压缩并改写 Content-Length
+    - 流式响应：逐块压缩，去掉 Content-Length
+    压缩后的 ETag 改为弱 ETag，并添加 Vary: Accept-Encoding。
+    """
+
+    def __init__(self, app, minimum_size: int = COMPRESSION_MIN_SIZE):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] == "HEAD":
+            await self.app(scope, receive, send)
+            return
+        encodings = accepted_encodings(Headers(scope=scope).get("accept-encoding", ""))
+        if not encodings:
+            await self.app(scope, receive, send)
+            return
+
+        encoding = encodings[0]
+        state = {"start": None, "compressor": None, "passthrough": False}
+
+        def mark_encoded(headers: MutableHeaders):
+            headers["content-encoding"] = encoding
+            _add_vary(headers)
+            etag = headers.get("etag")
+            if etag and not etag.startswith("W/"):
+                headers["etag"] = f"W/{etag}"
+
+        async def send_compressed(message):
+            if state["passthrough"]:
+                await send(message)
+                return
+
+            if message["type"] == "http.response.start":
+                state["start"] = message
+                return
+
+            start = state["start"]
+            if start is not None and message["type"] != "http.response.body":
+                # 非常规消息（如 pathsend），放弃压缩
+                state["passthrough"] = True
+                state["start"] = None
+                await send(start)
+                await send(message)
+                return
+
+            compressor = state["compressor"]
+            if compressor is not None:
+                body = compressor.compress(message.get("body", b""))
+                more_body = message.get("more_body", False)
+                if not more_body:
+                    body += compressor.finish()
+                await send({"type": "http.response.body", "body": body, "more_body": more_body})
+                return
+
+            # 第一块响应体：决定是否压缩
+            state["start"] = None
+            headers = MutableHeaders(raw=list(start["headers"]))
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            if not _should_compress(start["status"], headers) or (not more_body and len(body) < self.minimum_size):
+                if is_compressible_type(headers.get("content-type", "")):
+                    _add_vary(headers)
+                state["passthrough"] = True
+                await send({**start, "headers": headers.raw})
+                await send(message)
+                return
+
+            mark_encoded(headers)
+            if not more_body:
+                compressed = compress(body, encoding)
+                headers["content-length"] = str(len(compressed))
+                await send({**start, "headers": headers.raw})
+                await send({"type": "http.response.body", "body": compressed})
+                return
+
+            if "content-length" in headers:
+                del headers["content-length"]
+            compressor = state["compressor"] = StreamCompressor(encoding)
+            await send({**start, "headers": headers.raw})
+            await send({"type": "http.response.body", "body": compressor.compress(body), "more_body": True})
+
+        await self.app(scope, receive, send_compressed)
@@ -10,6 +10,7 @@ DATABASE_URL = "sqlite:///./annotation.db"
 # 服务器配置
 HOST = "0.0.0.0"
 PORT = 8000
+WORKERS = 1  # uvicorn 工作进程数，大于 1 时各进程共享数据库文件（需 WAL 模式）
 
 # 日志配置
 LOG_DIR = PROJECT_ROOT / "logs"
@@ -17,4 +18,93 @@ LOG_DIR.mkdir(exist_ok=True)
 
 # 分页配置
 DEFAULT_PAGE_SIZE = 50
-MAX_PAGE_SIZE = 1000 
\ No newline at end of file
+MAX_PAGE_SIZE = 1000 
+
+# 数据生成去重配置
+GENERATION_DEDUP_MAX_RETRIES = 3  # 每条数据因重复而自动重试的最大次数
+GENERATION_CORPUS_INDEX_TTL = 300  # 语料哈希索引的最长复用时间（秒）
+
+# 数据生成响应缓存配置
+GENERATION_CACHE_PATH = PROJECT_ROOT / "cache" / "generation_cache.db"
+GENERATION_CACHE_MAX_BYTES = 256 * 1024 * 1024  # 缓存总大小上限，超出后按 LRU 淘汰
+
+# 数据生成 token 流式转发配置
+GENERATION_DELTA_FLUSH_MS = 50  # token 增量合并的最长间隔（毫秒）
+GENERATION_DELTA_FLUSH_CHARS = 256  # token 增量合并的最大字符数
+
+# 监控指标配置
+METRICS_ENABLED = True  # 是否启用 /metrics 端点及请求、查询耗时统计
+
+# 慢查询日志配置
+SLOW_QUERY_LOG_ENABLED = True  # 是否记录慢查询（写入 LOG_DIR/slow_queries.log）
+SLOW_QUERY_THRESHOLD_MS = 200  # 超过该耗时（毫秒）的查询视为慢查询
+SLOW_QUERY_LOG_MAX_BYTES = 10 * 1024 * 1024  # 单个日志文件大小上限
+SLOW_QUERY_LOG_BACKUPS = 5  # 保留的滚动日志文件数
+SLOW_QUERY_MAX_SHAPES = 500  # 聚合统计保留的查询形态数上限
+
+# 按需请求分析配置
+PROFILING_ENABLED = False  # 是否挂载分析中间件（请求头 X-Profile: 1 或 ?profile=1 触发），关闭时无开销
+PROFILE_SAMPLE_INTERVAL_MS = 5  # 采样间隔（毫秒）
+PROFILE_DIR = LOG_DIR / "profiles"  # 折叠栈文件输出目录
+
+# 响应压缩配置
+COMPRESSION_ENABLED = True  # 是否按 Accept-Encoding 压缩动态响应（gzip，安装 brotli 时优先 br）
+COMPRESSION_MIN_SIZE = 1024  # 小于该字节数的响应不压缩
+COMPRESSION_GZIP_LEVEL = 6  # 动态响应的 gzip 压缩级别（1-9）
+COMPRESSION_BROTLI_QUALITY = 5  # 动态响应的 brotli 压缩质量（0-11，越高越慢）
+STATIC_PRECOMPRESS_ENABLED = True  # 启动时在后台为 web/dist 下的文本资源生成 .gz/.br 文件
+
+# 多进程共享数据库与查询缓存配置
+SQLITE_WAL_ENABLED = True  # 文件数据库使用 WAL 日志模式：读写互不阻塞，多个工作进程可同时读取
+DB_POOL_SIZE = 10  # 文件数据库连接池常驻连接数（每个会话独占一个连接）
+DB_POOL_MAX_OVERFLOW = 30  # 连接池可临时增加的连接数（与线程池默认 40 个线程相当）
+DATA_VERSION_POLL_INTERVAL_MS = 0  # 两次读取 PRAGMA data_version 的最短间隔（毫秒），0 表示每次读缓存前都检查
+QUERY_CACHE_ENABLED = True  # 是否缓存标签列表、系统统计和搜索结果（数据变化后自动失效）
+SEARCH_CACHE_MAX_ENTRIES = 256  # 搜索结果缓存的条目数上限
+SEARCH_CACHE_MAX_BYTES = 32 * 1024 * 1024  # 搜索结果缓存的总大小上限
+SEARCH_IDS_MAX_RESULTS = 100000  # ids_only 搜索最多返回的 ID 数，匹配记录更多时返回 400
+SINGLE_FLIGHT_ENABLED = True  # 同一数据版本下并发的相同搜索、统计请求只执行一次并共享结果
+
+# 准入控制配置
+ADMISSION_CONTROL_ENABLED = True  # 按路由类别限制加权并发，超限时排队，排队已满或超时返回 503 + Retry-After
+# capacity: 同时持有的权重上限；max_queue: 最多排队请求数；queue_timeout: 最长排队时间（秒）
+# 各类别容量之和（36）小于线程池默认线程数（40），重查询占满自己的容量时单条标注操作仍有空闲线程
+ADMISSION_LIMITS = {
+    "interactive": {"capacity": 16, "max_queue": 256, "queue_timeout": 5.0},  # 单条标注和标签的增删改查
+    "search": {"capacity": 12, "max_queue": 64, "queue_timeout": 3.0},  # 搜索，按估计代价加权
+    "stats": {"capacity": 4, "max_queue": 32, "queue_timeout": 5.0},  # 系统统计
+    "bulk": {"capacity": 4, "max_queue": 8, "queue_timeout": 10.0},  # 批量标注、批量更新和导入
+}
+
+# 查询时间预算与取消配置
+QUERY_CANCELLATION_ENABLED = True  # 客户端断开或超出时间预算时中断正在执行的读语句
+QUERY_TIME_BUDGET_MS = None  # 每个请求的默认查询时间预算（毫秒），超出后返回 504；None 表示不限时（客户端断开时仍中断读语句）
+QUERY_TIME_BUDGET_MAX_MS = 60000  # 请求头 X-Query-Budget-Ms 可指定的最大预算
+QUERY_BUDGET_EXEMPT_PREFIXES = ("/import/", "/generate/", "/annotations/import-texts", "/annotations/bulk-")  # 不限时间（仍在断开时中断读语句）
+QUERY_PROGRESS_INTERVAL = 1000  # SQLite 每执行多少条虚拟机指令检查一次是否需要中断
+
+# 单条标注写入合并配置
+WRITE_COALESCE_ENABLED = False  # PUT /annotations/{id} 的标签更新交给后台写线程，按批次在一个事务中提交
+WRITE_COALESCE_MAX_DELAY_MS = 5  # 批次中第一条更新最多等待多久（毫秒）后提交
+WRITE_COALESCE_MAX_BATCH = 256  # 待提交的不同标注数达到该值时立即提交
+WRITE_COALESCE_SYNCHRONOUS = "FULL"  # 写线程连接的 synchronous：FULL 每批落盘后才确认，NORMAL 断电时可能丢失最近的提交
+
+# 异步数据库层配置
+ASYNC_DB_ENABLED = False  # 单条标注、搜索和标签端点经 aiosqlite 异步执行查询（需 pip install text-annotation[async]）
+
+# WebSocket 标注通道配置
+ANNOTATION_WS_ENABLED = True  # 是否提供 /ws/annotations（批量标签操作、预取待标注条目、推送统计增量）
+ANNOTATION_WS_MAX_OPS = 500  # 单条消息最多包含的标签操作数
+ANNOTATION_WS_DEFAULT_PREFETCH = 20  # 默认预取的待标注条目数
+ANNOTATION_WS_MAX_PREFETCH = 200  # 单次预取条目数上限
+
+# 数据变化通知（SSE）配置
+EVENTS_ENABLED = True  # 是否提供 /events 并在写入后推送标注、标签和统计的变化
+EVENTS_SUBSCRIBER_BUFFER = 256  # 每个订阅者最多积压的事件数，超出后丢弃积压并发送 resync
+EVENTS_HISTORY = 1024  # 保留最近多少条事件供断线重连（Last-Event-ID）补发
+EVENTS_MAX_IDS = 500  # 单个事件最多列出的标注 ID 数，超出时只给出数量
+EVENTS_MAX_SUBSCRIBERS = 1000  # 同时连接的订阅者上限，超出返回 503
+EVENTS_KEEPALIVE_SECONDS = 15  # 空闲时发送保活注释行的间隔（秒）
+
+# 批量读取 / 更新标注配置
+ANNOTATION_BATCH_MAX_ITEMS = 900  # POST /annotations/batch 单次最多涉及的不同标注数（一条 SELECT ... IN 不超过 SQLite 绑定参数上限）
@@ -0,0 +1,161 @@
+"""
+数据版本与查询缓存模块
+
+本模块提供以下功能：
+- 数据版本：本进程写入计数 + SQLite PRAGMA data_version（感知其他进程的提交）
+- 按数据版本失效的进程内缓存（标签列表、系统统计、搜索结果）
+
+多个 uvicorn 工作进程共享同一个数据库文件时，每个进程各自缓存；任一进程写入后，
+其他进程下一次读缓存前通过独立的监视连接读取 PRAGMA data_version 即可发现变化
+（WAL 模式下只读取共享内存中的 WAL 索引头，单次约数微秒）。
+"""
+
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+
+from sqlalchemy import event
+
+from .config import DATA_VERSION_POLL_INTERVAL_MS
+
+_WRITE_PREFIXES = ("INSERT", "UPDATE", "DELETE", "REPLACE", "CREATE", "DROP", "ALTER")
+
+_caches: List["VersionedCache"] = []
+
+
+def is_write_statement(statement: str) -> bool:
+    """是否为修改数据或表结构的语句"""
+    return statement.lstrip()[:7].upper().startswith(_WRITE_PREFIXES)
+
+
+class DataVersion:
+    """
+    数据库的数据版本。
+
+    版本为 (本进程写入次数, data_version)：
+    - 本进程经由该引擎执行的写语句在执行后立即计数，保证写后读一致
+    - data_version 由独立的监视连接读取，其他连接（包括其他进程）提交后该值会变化
+    内存数据库没有可供其他进程访问的文件，只使用本进程写入计数。
+    """
+
+    def __init__(self, engine, poll_interval: float = DATA_VERSION_POLL_INTERVAL_MS / 1000):
+        database = engine.url.database
+        self.path = database if database and database != ":memory:" and not database.startswith("file:") else None
+        self.poll_interval = poll_interval
+        self._writes = 0
+        self._external = 0
+        self._polled_at = 0.0
+        self._monitor: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        self.track(engine)
+
+    def track(self, engine):
+        """统计另一个连接同一数据库的引擎（如异步引擎底层的同步引擎）的写入"""
+        event.listen(engine, "after_cursor_execute", self._after_cursor_execute)
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        if is_write_statement(statement):
+            self.bump()
+
+    def bump(self):
+        """记录一次本进程写入"""
+        with self._lock:
+            self._writes += 1
+
+    def _poll(self) -> int:
+        if self.path is None:
+            return 0
+        if self.poll_interval and time.monotonic() - self._polled_at < self.poll_interval:
+            return self._external
+        with self._lock:
+            try:
+                if self._monitor is None:
+                    # 不创建数据库文件：文件尚不存在时下次再试
+                    self._monitor = sqlite3.connect(
+                        f"file:{self.path}?mode=rw", uri=True, check_same_thread=False, isolation_level=None
+                    )
+                self._external = self._monitor.execute("PRAGMA data_version").fetchone()[0]
+            except sqlite3.Error:
+                self._monitor = None
+            self._polled_at = time.monotonic()
+            return self._external
+
+    def current(self) -> Tuple[int, int]:
+        """当前数据版本，任一分量变化即表示数据可能已改变"""
+        external = self._poll()
+        return self._writes, external
+
+
+class VersionedCache:
+    """
+    按数据版本失效的 LRU 缓存。
+
+    读取时先取当前数据版本，版本变化则清空全部条目；计算期间版本发生变化的结果不写入，
+    避免把旧数据存到新版本下。
+    """
+
+    def __init__(self, name: str, version: DataVersion, max_entries: int = 128,
+                 max_bytes: Optional[int] = None, sizeof: Callable[[Any], int] = len):
+        self.name = name
+        self.version = version
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._bytes = 0
+        self._entries_version: Optional[Tuple[int, int]] = None
+        self._lock = threading.Lock()
+        _caches.append(self)
+
+    def _sync_version(self, version: Tuple[int, int]):
+        if version != self._entries_version:
+            self._entries.clear()
+            self._bytes = 0
+            self._entries_version = version
+
+    def get_or_compute(self, key: Hashable, compute: Callable[[], Any]) -> Any:
+        """
+        返回缓存值，未命中或数据已变化时调用 compute 计算并缓存。
+
+        Args:
+            key: 缓存键（需包含影响结果的全部参数）
+            compute: 计算函数
+        """
+        version = self.version.current()
+        with self._lock:
+            self._sync_version(version)
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+            self.misses += 1
+
+        value = compute()
+
+        size = self.sizeof(value) if self.max_bytes is not None else 0
+        if self.max_bytes is not None and size > self.max_bytes:
+            return value
+        with self._lock:
+            if version != self._entries_version or key in self._entries:
+                return value
+            self._entries[key] = value
+            self._bytes += size
+            while len(self._entries) > self.max_entries or (self.max_bytes is not None and self._bytes > self.max_bytes):
+                _, evicted = self._entries.popitem(last=False)
+                if self.max_bytes is not None:
+                    self._bytes -= self.sizeof(evicted)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+
+def cache_stats() -> Dict[str, Tuple[int, int]]:
+    """各查询缓存的 (命中次数, 未命中次数)"""
+    return {cache.name: (cache.hits, cache.misses) for cache in _caches}
@@ -0,0 +1,39 @@
+"""
+JSON 快速序列化模块
+
+本模块提供以下功能：
+- 安装 orjson（pip install text-annotation[perf]）时使用 orjson 序列化
+- 未安装或遇到 orjson 不支持的数据（如孤立代理字符）时回退到标准库 json
+
+输出与 FastAPI 默认 JSONResponse 的字节完全一致（紧凑分隔符、不转义非 ASCII 字符）。
+"""
+
+import json
+from typing import Any
+
+try:
+    import orjson
+except ImportError:  # 可选依赖
+    orjson = None
+
+JSON_MEDIA_TYPE = "application/json"
+
+
+def _stdlib_dumps(obj: Any) -> bytes:
+    # 与 starlette.responses.JSONResponse.render 保持一致
+    return json.dumps(obj, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode("utf-8")
+
+
+def dumps(obj: Any) -> bytes:
+    """
+    将由 dict / list / str / int / None 组成的对象序列化为 UTF-8 JSON 字节串。
+    
+    Returns:
+        JSON 字节串
+    """
+    if orjson is not None:
+        try:
+            return orjson.dumps(obj)
+        except TypeError:
+            pass
+    return _stdlib_dumps(obj)
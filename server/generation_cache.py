@@ -0,0 +1,145 @@
+"""
+数据生成响应缓存模块
+
+本模块提供以下功能：
+- 以 (base_url, model, system_prompt, user_prompt, temperature, max_tokens, sample_index) 为键缓存模型原始输出
+- 基于 SQLite 文件的持久化存储
+- 总大小上限与 LRU 淘汰
+"""
+
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Optional
+
+from .config import GENERATION_CACHE_PATH, GENERATION_CACHE_MAX_BYTES
+
+logger = logging.getLogger(__name__)
+
+
+def make_cache_key(
+    base_url: str,
+    model: str,
+    system_prompt: str,
+    user_prompt: str,
+    temperature: float,
+    max_tokens: Optional[int],
+    sample_index: int
+) -> str:
+    """
+    构建缓存键。
+
+    Returns:
+        键元组 JSON 的 SHA-256 十六进制摘要
+    """
+    payload = json.dumps(
+        [base_url.rstrip('/'), model, system_prompt, user_prompt, temperature, max_tokens, sample_index],
+        ensure_ascii=False
+    )
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class GenerationCache:
+    """
+    基于 SQLite 的生成响应缓存。
+
+    读写均为同步操作，在异步代码中应通过工作线程调用。
+    """
+
+    def __init__(self, path: Path = GENERATION_CACHE_PATH, max_bytes: int = GENERATION_CACHE_MAX_BYTES):
+        self.path = Path(path)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._conn: Optional[sqlite3.Connection] = None
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        """按需打开缓存数据库"""
+        if self._conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(str(self.path), check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, size INTEGER NOT NULL, last_access REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS ix_entries_last_access ON entries (last_access)")
+            self._total_bytes = conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+            self._conn = conn
+        return self._conn
+
+    def get(self, key: str) -> Optional[str]:
+        """
+        读取缓存并更新访问时间。
+
+        Args:
+            key: 缓存键
+
+        Returns:
+            缓存的原始输出，未命中时返回 None
+        """
+        with self._lock:
+            conn = self._connect()
+            row = conn.execute("SELECT value FROM entries WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            conn.execute("UPDATE entries SET last_access = ? WHERE key = ?", (time.time(), key))
+            conn.commit()
+            self.hits += 1
+            return row[0]
+
+    def put(self, key: str, value: str):
+        """
+        写入缓存，超出大小上限时按最近访问时间淘汰。
+
+        Args:
+            key: 缓存键
+            value: 模型原始输出
+        """
+        size = len(value.encode('utf-8'))
+        if size > self.max_bytes:
+            return
+
+        with self._lock:
+            conn = self._connect()
+            old = conn.execute("SELECT size FROM entries WHERE key = ?", (key,)).fetchone()
+            conn.execute(
+                "INSERT OR REPLACE INTO entries (key, value, size, last_access) VALUES (?, ?, ?, ?)",
+                (key, value, size, time.time())
+            )
+            self._total_bytes += size - (old[0] if old else 0)
+            if self._total_bytes > self.max_bytes:
+                self._evict(conn)
+            conn.commit()
+
+    def _evict(self, conn: sqlite3.Connection):
+        """淘汰最久未访问的条目，直到总大小降到上限的 90% 以下"""
+        target = int(self.max_bytes * 0.9)
+        evicted = 0
+        rows = conn.execute("SELECT key, size FROM entries ORDER BY last_access").fetchall()
+        for key, size in rows:
+            if self._total_bytes <= target:
+                break
+            conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+            self._total_bytes -= size
+            evicted += 1
+        logger.info(f"生成缓存淘汰 {evicted} 条, 当前大小 {self._total_bytes} bytes")
+
+    def clear(self):
+        """清空缓存"""
+        with self._lock:
+            conn = self._connect()
+            conn.execute("DELETE FROM entries")
+            conn.commit()
+            self._total_bytes = 0
+
+
+# 全局生成缓存实例
+generation_cache = GenerationCache()
@@ -9,9 +9,17 @@
 """
 
 import asyncio
+import hashlib
+import heapq
 import json
+import re
+import threading
+import time
 import uuid
-from typing import AsyncGenerator, Dict, List, Optional, Any
+from array import array
+from bisect import bisect_left
+from concurrent.futures import ThreadPoolExecutor
+from typing import AsyncGenerator, Callable, Dict, List, Optional, Any, Pattern, Sequence
 from datetime import datetime
 import logging
 
@@ -19,10 +27,249 @@ from openai import AsyncOpenAI
 import httpx
 from pydantic import ValidationError
 
+from .config import (
+    GENERATION_DEDUP_MAX_RETRIES, GENERATION_CORPUS_INDEX_TTL,
+    GENERATION_DELTA_FLUSH_MS, GENERATION_DELTA_FLUSH_CHARS,
+)
+from .generation_cache import generation_cache, make_cache_key
+from .models import SessionLocal, AnnotationData, ensure_tables
 from .schemas import GenerateRequest, GeneratedText, GenerateStatus
+from .services import parse_labels, format_labels
 
 logger = logging.getLogger(__name__)
 
+# 解析工作线程池（批量解析时避免阻塞事件循环）
+_parse_executor: Optional[ThreadPoolExecutor] = None
+
+
+def _get_parse_executor() -> ThreadPoolExecutor:
+    """获取（按需创建）解析工作线程池"""
+    global _parse_executor
+    if _parse_executor is None:
+        _parse_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="generation-parse")
+    return _parse_executor
+
+
+def compile_parse_regex(parse_regex: Optional[str]) -> Optional[Pattern[str]]:
+    """
+    编译解析正则表达式（按原样编译，不附加标志；需要 . 匹配换行时在正则中写 (?s)）。
+    
+    Args:
+        parse_regex: 正则表达式字符串
+        
+    Returns:
+        编译后的正则对象，未提供时返回 None
+        
+    Raises:
+        ValueError: 如果正则表达式无效
+    """
+    if not parse_regex:
+        return None
+    try:
+        return re.compile(parse_regex)
+    except re.error as e:
+        raise ValueError(f"解析正则表达式无效: {e}")
+
+
+def parse_generated_output(raw_output: str, pattern: Optional[Pattern[str]]) -> GeneratedText:
+    """
+    使用正则表达式将原始输出解析为文本和标签。
+    
+    优先使用命名分组 text / labels；没有命名分组时依次取第1、2个分组；
+    没有分组时使用整个匹配作为文本。未匹配时原始输出作为文本。
+    
+    Args:
+        raw_output: 模型原始输出
+        pattern: 编译后的解析正则，为 None 时不解析
+        
+    Returns:
+        解析后的生成文本
+    """
+    text = raw_output.strip()
+    labels = None
+    
+    match = pattern.search(raw_output) if pattern else None
+    if match:
+        groups = match.groupdict()
+        if 'text' in groups or 'labels' in groups:
+            text = groups.get('text') or ''
+            labels = groups.get('labels')
+        elif match.re.groups >= 1:
+            text = match.group(1) or ''
+            labels = match.group(2) if match.re.groups >= 2 else None
+        else:
+            text = match.group(0)
+        text = text.strip()
+        labels = format_labels(parse_labels(labels))
+    
+    return GeneratedText(text=text, labels=labels, raw_output=raw_output)
+
+
+def parse_generated_outputs(raw_outputs: Sequence[str], pattern: Optional[Pattern[str]]) -> List[GeneratedText]:
+    """批量解析原始输出"""
+    return [parse_generated_output(raw_output, pattern) for raw_output in raw_outputs]
+
+
+async def parse_outputs_in_pool(raw_outputs: Sequence[str], pattern: Optional[Pattern[str]]) -> List[GeneratedText]:
+    """在工作线程池中批量解析原始输出，保持事件循环响应"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        _get_parse_executor(), parse_generated_outputs, list(raw_outputs), pattern
+    )
+
+
+def text_hash(text: str) -> int:
+    """计算文本的 64 位哈希（与导入时的 strip 规则一致）"""
+    digest = hashlib.blake2b(text.strip().encode('utf-8'), digest_size=8).digest()
+    return int.from_bytes(digest, 'big', signed=True)
+
+
+class CorpusHashIndex:
+    """
+    annotation_data 文本的内存哈希索引。
+    
+    全量哈希以有序 array 存储（每条 8 字节），新导入的文本记录在增量集合中，
+    避免在大语料上为每条生成结果查询数据库。过期后在后台线程中重建，重建期间继续使用旧索引。
+    """
+    
+    def __init__(self, ttl_seconds: float = GENERATION_CORPUS_INDEX_TTL):
+        self.ttl_seconds = ttl_seconds
+        # (有序全量哈希, 增量集合)，整体替换，读取时无需加锁
+        self._state = (array('q'), set())
+        self._built_at: Optional[float] = None
+        # 重建期间导入的文本（可能不在扫描结果中，重建完成后保留在增量集合里）
+        self._added_during_build: Optional[set] = None
+        self._rebuilding = False
+        self._lock = threading.Lock()
+        self._build_lock = threading.Lock()
+    
+    @property
+    def is_fresh(self) -> bool:
+        """索引是否在有效期内"""
+        return self._built_at is not None and time.monotonic() - self._built_at < self.ttl_seconds
+    
+    @staticmethod
+    def _scan(batch_size: int, run_size: int) -> array:
+        """
+        扫描全部文本，返回有序哈希数组。
+        
+        哈希逐批写入 array，每 run_size 条排序为一段，最后归并各段，
+        不在内存中构建全量的 Python 整数列表。
+        """
+        ensure_tables()
+        hashes = array('q')
+        bounds = [0]
+        run: List[int] = []
+        db = SessionLocal()
+        try:
+            for row in db.query(AnnotationData.text).yield_per(batch_size):
+                run.append(text_hash(row.text))
+                if len(run) >= run_size:
+                    run.sort()
+                    hashes.extend(run)
+                    bounds.append(len(hashes))
+                    run = []
+        finally:
+            db.close()
+        if run:
+            run.sort()
+            hashes.extend(run)
+            bounds.append(len(hashes))
+        if len(bounds) <= 2:
+            return hashes
+        view = memoryview(hashes)
+        runs = [view[lo:hi] for lo, hi in zip(bounds, bounds[1:])]
+        merged = array('q', heapq.merge(*runs))
+        runs.clear()
+        view.release()
+        return merged
+    
+    def build(self, batch_size: int = 10000, run_size: int = 100000) -> int:
+        """
+        从数据库全量构建索引（同步方法，应在工作线程中调用）。
+        
+        扫描期间不持有读写锁，contains 和 add_texts 照常使用旧索引。
+        
+        Returns:
+            索引中的文本数量
+        """
+        with self._build_lock:
+            if self.is_fresh:
+                return len(self._state[0])
+            
+            start = time.perf_counter()
+            with self._lock:
+                self._added_during_build = set()
+            try:
+                hashes = self._scan(batch_size, run_size)
+            finally:
+                with self._lock:
+                    added, self._added_during_build = self._added_during_build, None
+            
+            with self._lock:
+                self._state = (hashes, added)
+                self._built_at = time.monotonic()
+            logger.info(f"语料哈希索引构建完成: {len(hashes)} 条, 耗时 {time.perf_counter() - start:.2f}秒")
+            return len(hashes)
+    
+    def _rebuild_in_background(self):
+        try:
+            self.build()
+        except Exception as e:
+            logger.warning(f"语料哈希索引重建失败，继续使用旧索引: {e}")
+        finally:
+            self._rebuilding = False
+    
+    async def ensure_fresh(self):
+        """
+        确保索引可用：首次使用时在工作线程中构建并等待，
+        之后过期时在后台线程中重建，不阻塞调用方。
+        """
+        if self._built_at is None:
+            await asyncio.to_thread(self.build)
+            return
+        if self.is_fresh:
+            return
+        with self._lock:
+            if self._rebuilding:
+                return
+            self._rebuilding = True
+        threading.Thread(target=self._rebuild_in_background, name="corpus-index-rebuild", daemon=True).start()
+    
+    def contains(self, value: int) -> bool:
+        """检查哈希是否已在语料中"""
+        hashes, recent = self._state
+        if value in recent:
+            return True
+        pos = bisect_left(hashes, value)
+        return pos < len(hashes) and hashes[pos] == value
+    
+    def add_texts(self, texts: Sequence[str]):
+        """记录新导入的文本"""
+        values = {text_hash(text) for text in texts}
+        with self._lock:
+            self._state[1].update(values)
+            if self._added_during_build is not None:
+                self._added_during_build.update(values)
+
+
+# 全局语料哈希索引
+corpus_index = CorpusHashIndex()
+
+
+def _cache_readable(request: GenerateRequest) -> bool:
+    """请求是否读取响应缓存"""
+    if request.cache_policy == "auto":
+        return request.temperature == 0
+    return request.cache_policy == "use"
+
+
+def _cache_writable(request: GenerateRequest) -> bool:
+    """请求是否写入响应缓存"""
+    if request.cache_policy == "auto":
+        return request.temperature == 0
+    return request.cache_policy in ("use", "refresh")
+
 
 class GenerationTask:
     """生成任务类，用于管理单个生成任务的状态"""
@@ -40,6 +287,18 @@ class GenerationTask:
         self.cancelled = False
         self.client: Optional[AsyncOpenAI] = None
         self.current_generation_task: Optional[asyncio.Task] = None
+        # 每个任务只编译一次解析正则
+        self.parse_pattern = compile_parse_regex(request.parse_regex)
+        # 去重状态
+        self.seen_hashes: set = set()
+        self.dedup_checks = 0
+        self.task_duplicate_count = 0
+        self.corpus_duplicate_count = 0
+        self.retry_count = 0
+        # 缓存状态（每次API调用分配一个样本序号，作为缓存键的一部分）
+        self.sample_counter = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
     
     def cancel(self):
         """取消任务和清理资源"""
@@ -64,15 +323,48 @@ class GenerationTask:
         except Exception as e:
             logger.error(f"清理客户端资源时出错: {str(e)}")
     
+    def check_duplicate(self, text: str) -> Optional[str]:
+        """
+        检查生成文本是否重复，并记录命中统计。
+        
+        Args:
+            text: 解析后的文本
+            
+        Returns:
+            重复来源 "task" / "corpus"，不重复时返回 None
+        """
+        if self.request.dedup_mode == "off" or not text.strip():
+            return None
+        
+        self.dedup_checks += 1
+        value = text_hash(text)
+        if value in self.seen_hashes:
+            self.task_duplicate_count += 1
+            return "task"
+        if corpus_index.contains(value):
+            self.corpus_duplicate_count += 1
+            return "corpus"
+        
+        self.seen_hashes.add(value)
+        return None
+    
     def get_status(self) -> GenerateStatus:
         """获取任务状态"""
+        duplicate_count = self.task_duplicate_count + self.corpus_duplicate_count
         return GenerateStatus(
             status=self.status,
             progress=self.progress,
             current_count=self.current_count,
             total_count=self.total_count,
             message=f"已生成 {self.current_count}/{self.total_count} 条数据",
-            error=self.error
+            error=self.error,
+            duplicate_count=duplicate_count,
+            task_duplicate_count=self.task_duplicate_count,
+            corpus_duplicate_count=self.corpus_duplicate_count,
+            retry_count=self.retry_count,
+            dedup_hit_rate=round(duplicate_count / self.dedup_checks, 4) if self.dedup_checks else 0.0,
+            cache_hits=self.cache_hits,
+            cache_misses=self.cache_misses
         )
 
 
@@ -127,6 +419,9 @@ class GenerationService:
                 timeout=httpx.Timeout(60.0)
             )
             
+            if task.request.dedup_mode != "off":
+                await corpus_index.ensure_fresh()
+            
             # 批量生成数据
             for i in range(task.request.count):
                 if task.cancelled:
@@ -135,12 +430,43 @@ class GenerationService:
                     break
                 
                 try:
-                    # 创建可取消的生成任务
-                    generation_coro = self._generate_single_text(task.client, task.request)
-                    task.current_generation_task = asyncio.create_task(generation_coro)
-                    
-                    # 等待生成完成或被取消
-                    generated_text = await task.current_generation_task
+                    attempt = 0
+                    while True:
+                        # token 增量通过队列转发，由本生成器合并后推送
+                        delta_queue: Optional[asyncio.Queue] = None
+                        if task.request.stream_tokens:
+                            delta_queue = asyncio.Queue()
+                        
+                        # 创建可取消的生成任务
+                        generation_coro = self._generate_single_text(
+                            task.client, task.request, task.parse_pattern, task.sample_counter,
+                            on_delta=delta_queue.put_nowait if delta_queue else None
+                        )
+                        task.sample_counter += 1
+                        task.current_generation_task = asyncio.create_task(generation_coro)
+                        
+                        if delta_queue:
+                            task.current_generation_task.add_done_callback(lambda _, q=delta_queue: q.put_nowait(None))
+                            async for delta in self._coalesce_deltas(delta_queue):
+                                delta_event = {"type": "delta", "index": i, "attempt": attempt, "delta": delta}
+                                yield f"data: {json.dumps(delta_event)}\n\n"
+                        
+                        # 等待生成完成或被取消
+                        generated_text = await task.current_generation_task
+                        if generated_text.cached:
+                            task.cache_hits += 1
+                        elif _cache_readable(task.request):
+                            task.cache_misses += 1
+                        
+                        # 到达即去重，重复时按模式重试或标记
+                        duplicate_of = task.check_duplicate(generated_text.text)
+                        if (duplicate_of and task.request.dedup_mode == "retry"
+                                and attempt < GENERATION_DEDUP_MAX_RETRIES and not task.cancelled):
+                            attempt += 1
+                            task.retry_count += 1
+                            continue
+                        generated_text.duplicate_of = duplicate_of
+                        break
                     
                     task.generated_texts.append(generated_text)
                     task.current_count += 1
@@ -183,8 +509,39 @@ class GenerationService:
             # 延迟清理任务（给前端时间获取最终状态）
             asyncio.create_task(self._delayed_cleanup(task_id, 60))
     
-    async def _generate_single_text(self, client: AsyncOpenAI, request: GenerateRequest) -> GeneratedText:
-        """生成单条文本数据（仅负责API调用，不做解析）"""
+    async def _generate_single_text(
+        self,
+        client: AsyncOpenAI,
+        request: GenerateRequest,
+        pattern: Optional[Pattern[str]] = None,
+        sample_index: int = 0,
+        on_delta: Optional[Callable[[str], None]] = None
+    ) -> GeneratedText:
+        """
+        生成单条文本数据，并按任务的解析正则提取文本和标签。
+        
+        提供 on_delta 时以 stream=True 调用模型，每个 token 增量到达即回调，
+        最终仍拼接出完整输出用于解析和缓存。
+        """
+        cache_key = None
+        if _cache_readable(request) or _cache_writable(request):
+            cache_key = make_cache_key(
+                request.base_url, request.model, request.system_prompt, request.user_prompt,
+                request.temperature, request.max_tokens, sample_index
+            )
+        
+        if cache_key and _cache_readable(request):
+            try:
+                cached_output = await asyncio.to_thread(generation_cache.get, cache_key)
+            except Exception as e:
+                # 缓存不可用（如数据库文件损坏或被锁）时按未命中处理
+                logger.warning(f"读取生成缓存失败，按未命中处理: {e}")
+                cached_output = None
+            if cached_output is not None:
+                generated_text = self._parse_output(cached_output, pattern)
+                generated_text.cached = True
+                return generated_text
+        
         try:
             # 构建请求参数
             messages = [
@@ -196,7 +553,7 @@ class GenerationService:
                 "model": request.model,
                 "messages": messages,
                 "temperature": request.temperature,
-                "stream": False
+                "stream": on_delta is not None
             }
             
             if request.max_tokens:
@@ -206,20 +563,87 @@ class GenerationService:
             response = await client.chat.completions.create(**kwargs)
             
             # 提取生成内容
-            raw_output = response.choices[0].message.content or ""
-            
-            # 只返回原始输出，不进行解析（解析工作交给前端）
-            return GeneratedText(
-                text=raw_output,  # 原始输出作为text
-                labels=None,      # 不在后端解析标签
-                raw_output=raw_output
-            )
+            if on_delta is None:
+                raw_output = response.choices[0].message.content or ""
+            else:
+                parts = []
+                async for chunk in response:
+                    delta = chunk.choices[0].delta.content if chunk.choices else None
+                    if delta:
+                        parts.append(delta)
+                        on_delta(delta)
+                raw_output = "".join(parts)
             
         except Exception as e:
             logger.error(f"调用大模型API失败: {str(e)}")
             raise
+        
+        if cache_key and _cache_writable(request):
+            try:
+                await asyncio.to_thread(generation_cache.put, cache_key, raw_output)
+            except Exception as e:
+                # 写入缓存失败不影响本次生成结果
+                logger.warning(f"写入生成缓存失败: {e}")
+        
+        return self._parse_output(raw_output, pattern)
     
-    # 移除解析相关方法，解析工作交给前端处理
+    async def _coalesce_deltas(self, queue: asyncio.Queue) -> AsyncGenerator[str, None]:
+        """
+        合并 token 增量，避免每个 token 推送一个事件。
+        
+        第一个增量立即推送以缩短首字节时间，之后按时间间隔或字符数合并；
+        队列中收到 None 表示生成结束。
+        """
+        loop = asyncio.get_running_loop()
+        interval = GENERATION_DELTA_FLUSH_MS / 1000
+        buffer: List[str] = []
+        buffered_chars = 0
+        last_flush = float('-inf')
+        
+        while True:
+            timeout = max(0.0, last_flush + interval - loop.time()) if buffer else None
+            try:
+                item = await asyncio.wait_for(queue.get(), timeout)
+            except asyncio.TimeoutError:
+                item = ""
+            
+            if item is None:
+                if buffer:
+                    yield "".join(buffer)
+                return
+            
+            if item:
+                buffer.append(item)
+                buffered_chars += len(item)
+            if buffer and (buffered_chars >= GENERATION_DELTA_FLUSH_CHARS or loop.time() - last_flush >= interval):
+                yield "".join(buffer)
+                buffer = []
+                buffered_chars = 0
+                last_flush = loop.time()
+    
+    def _parse_output(self, raw_output: str, pattern: Optional[Pattern[str]]) -> GeneratedText:
+        """解析单条原始输出（单次匹配开销很小，直接执行；批量重新解析才使用线程池）"""
+        if pattern is None:
+            return GeneratedText(text=raw_output, labels=None, raw_output=raw_output)
+        return parse_generated_output(raw_output, pattern)
+    
+    async def reparse_results(self, task: GenerationTask, parse_regex: str) -> List[GeneratedText]:
+        """
+        使用新的解析正则重新解析任务的全部原始输出。
+        
+        Args:
+            task: 生成任务
+            parse_regex: 新的解析正则表达式
+            
+        Returns:
+            重新解析后的生成文本列表
+            
+        Raises:
+            ValueError: 如果正则表达式无效
+        """
+        pattern = compile_parse_regex(parse_regex)
+        raw_outputs = [text.raw_output for text in task.generated_texts]
+        return await parse_outputs_in_pool(raw_outputs, pattern)
     
     async def _delayed_cleanup(self, task_id: str, delay_seconds: int):
         """延迟清理任务"""
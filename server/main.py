@@ -9,21 +9,46 @@
 - 统计和分析
 """
 
-from fastapi import FastAPI, Depends, HTTPException, status, BackgroundTasks
+from .startup import PROCESS_START, record_phase, lazy_import, log_startup_report, startup_report
+
+from fastapi import FastAPI, Depends, HTTPException, Query, Request, WebSocket, status, BackgroundTasks
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse, Response, StreamingResponse
+from fastapi.responses import FileResponse, JSONResponse, Response, StreamingResponse
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Literal, Optional
+import asyncio
 import os
+import time
 import logging
 
-from .models import get_db, create_tables
-from .services import AnnotationService, LabelService, StatisticsService
-from .generation_service import generation_service
-from scripts.data_import import DataImporter
+from .config import (
+    ANNOTATION_WS_ENABLED, COMPRESSION_ENABLED, EVENTS_ENABLED, EVENTS_MAX_SUBSCRIBERS, METRICS_ENABLED,
+    PROFILING_ENABLED, QUERY_CANCELLATION_ENABLED, SLOW_QUERY_MAX_SHAPES, STATIC_PRECOMPRESS_ENABLED,
+    WRITE_COALESCE_ENABLED
+)
+from .async_db import DatabaseRunner, dispose_async_engine, get_db_runner
+from .annotation_channel import serve_annotation_channel
+from .change_events import broker, publish_resync
+from .admission import (
+    admit, admit_annotation_batch, admit_bulk_label, admit_bulk_update, admit_import_texts, admit_search
+)
+from .compression import CompressionMiddleware
+from .metrics import MetricsMiddleware, render_metrics
+from .query_budget import QueryBudgetMiddleware, QueryInterrupted
+from .slow_query import slow_query_log
+from .static_assets import (
+    IMMUTABLE_CACHE_CONTROL, CachedIndexHtml, PrecompressedStaticFiles, precompress_in_background
+)
+from .fast_json import JSON_MEDIA_TYPE
+from .models import get_db
+from .services import AnnotationService, LabelService, StatisticsService, annotation_writer
 from . import schemas
 
+# 数据生成（openai、httpx）和旧数据导入（yaml、tqdm）较重，首次使用时才加载
+record_phase("导入依赖", time.perf_counter() - PROCESS_START)
+_app_setup_start = time.perf_counter()
+
 # 配置日志
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -44,40 +69,106 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# 按 Accept-Encoding 压缩较大的动态响应（SSE 不压缩）
+if COMPRESSION_ENABLED:
+    app.add_middleware(CompressionMiddleware)
+
+# 客户端断开或超出查询时间预算时中断正在执行的读语句
+if QUERY_CANCELLATION_ENABLED:
+    app.add_middleware(QueryBudgetMiddleware)
+
+# 添加请求耗时统计中间件
+if METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
+
+# 按需请求分析中间件（默认不挂载）
+if PROFILING_ENABLED:
+    from .profiler import ProfilingMiddleware
+    app.add_middleware(ProfilingMiddleware)
+
 # 挂载静态文件目录
 static_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), "web", "dist")
 if os.path.exists(static_dir):
-    # 挂载静态资源目录
-    app.mount("/assets", StaticFiles(directory=os.path.join(static_dir, "assets")), name="assets")
+    # 挂载静态资源目录（文件名带内容哈希，可长期缓存）
+    app.mount(
+        "/assets",
+        PrecompressedStaticFiles(directory=os.path.join(static_dir, "assets"), cache_control=IMMUTABLE_CACHE_CONTROL),
+        name="assets",
+    )
     # 挂载其他静态文件（如 vite.svg）
-    app.mount("/static", StaticFiles(directory=static_dir), name="static")
+    app.mount("/static", PrecompressedStaticFiles(directory=static_dir), name="static")
     logger.info(f"静态文件目录已挂载: {static_dir}")
 else:
     logger.warning(f"静态文件目录不存在: {static_dir}")
 
+# index.html 常驻内存，文件更新后自动重新加载
+index_html = CachedIndexHtml(os.path.join(static_dir, "index.html"))
+
+
+# 准入控制：按路由类别限制加权并发（搜索和批量操作的权重由请求体估计，见 admission.py）
+interactive_admission = [Depends(admit("interactive"))]
+stats_admission = [Depends(admit("stats"))]
+import_admission = [Depends(admit("bulk", exclusive=True))]
+
+
+def get_data_importer():
+    """按需加载旧数据导入模块（依赖 yaml、tqdm）并创建导入器。"""
+    return lazy_import("scripts.data_import", "加载数据导入模块").DataImporter()
+
+
+async def get_generation_module():
+    """
+    按需加载数据生成模块（依赖 openai、httpx）。
+    
+    首次加载在线程池中完成，避免阻塞事件循环。
+    """
+    return await run_in_threadpool(lazy_import, "server.generation_service", "加载数据生成模块")
+
 
 @app.on_event("startup")
 async def startup_event():
-    """启动时初始化数据库表。"""
-    create_tables()
+    """
+    启动时输出各阶段耗时。
+    
+    数据库表在首次访问数据库时创建（见 models.ensure_tables），不占用启动时间；
+    静态资源预压缩在后台线程中进行。
+    """
+    if STATIC_PRECOMPRESS_ENABLED and os.path.exists(static_dir):
+        precompress_in_background(static_dir)
+    log_startup_report()
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """提交合并写入中尚未提交的标签更新，关闭异步引擎的连接"""
+    await run_in_threadpool(annotation_writer.close)
+    await dispose_async_engine()
+
+
+@app.exception_handler(QueryInterrupted)
+async def query_interrupted_handler(request: Request, exc: QueryInterrupted):
+    """被中断的查询：超出时间预算返回 504，客户端已断开时返回 499（不会被读取）"""
+    if exc.reason == "timeout":
+        return JSONResponse(
+            status_code=504,
+            content={"detail": f"查询超出时间预算（{exc.budget_ms:g}ms）已中断，请缩小查询范围或通过请求头 X-Query-Budget-Ms 调整预算"},
+        )
+    return JSONResponse(status_code=499, content={"detail": "客户端已断开，查询已取消"})
 
 
 # 前端页面路由
 @app.get("/")
-async def serve_frontend():
+async def serve_frontend(request: Request):
     """
     提供前端页面。
     
     Returns:
-        前端 index.html 文件
+        前端 index.html（内存缓存，带 ETag，未修改时返回 304）
     """
-    static_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), "web", "dist")
-    index_file = os.path.join(static_dir, "index.html")
-    
-    if os.path.exists(index_file):
-        return FileResponse(index_file)
-    else:
+    response = index_html.response(request.headers)
+    if response is None:
         raise HTTPException(status_code=404, detail="前端文件未找到，请先构建前端项目")
+    return response
 
 
 @app.get("/vite.svg")
@@ -122,7 +213,7 @@ async def serve_favicon():
 
 
 @app.get("/pages/{path:path}")
-async def serve_spa_pages(path: str):
+async def serve_spa_pages(path: str, request: Request):
     """
     将所有 /pages/* 路径转发给 SPA 前端处理。
     
@@ -133,29 +224,29 @@ async def serve_spa_pages(path: str):
         path: 页面路径（将被前端路由器处理）
         
     Returns:
-        前端 index.html 文件，让 SPA 处理路由
+        前端 index.html（与 / 共用内存缓存），让 SPA 处理路由
     """
-    static_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), "web", "dist")
-    index_file = os.path.join(static_dir, "index.html")
-    
-    if os.path.exists(index_file):
-        return FileResponse(index_file)
-    else:
+    response = index_html.response(request.headers)
+    if response is None:
         raise HTTPException(status_code=404, detail="前端文件未找到，请先构建前端项目")
+    return response
 
 
 # 标注数据端点
-@app.post("/annotations/", response_model=schemas.AnnotationDataResponse, status_code=status.HTTP_201_CREATED)
-def create_annotation(
+@app.post(
+    "/annotations/", response_model=schemas.AnnotationDataResponse, status_code=status.HTTP_201_CREATED,
+    dependencies=interactive_admission,
+)
+async def create_annotation(
     annotation: schemas.AnnotationDataCreate,
-    db: Session = Depends(get_db)
+    db: DatabaseRunner = Depends(get_db_runner)
 ):
     """
     创建新的标注数据。
     
     Args:
         annotation: 要创建的标注数据
-        db: 数据库会话
+        db: 数据库执行器
         
     Returns:
         创建的标注数据
@@ -163,25 +254,56 @@ def create_annotation(
     Raises:
         HTTPException: 如果文本已存在
     """
-    service = AnnotationService(db)
     try:
-        result = service.create_annotation(annotation)
+        result = await db.run(lambda session: AnnotationService(session).create_annotation(annotation))
         return result
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 
-@app.get("/annotations/{annotation_id}", response_model=schemas.AnnotationDataResponse)
-def get_annotation(
+@app.post(
+    "/annotations/batch", response_model=schemas.AnnotationBatchResponse,
+    dependencies=[Depends(admit_annotation_batch)],
+)
+async def batch_annotations(
+    batch_request: schemas.AnnotationBatchRequest,
+    db: DatabaseRunner = Depends(get_db_runner)
+):
+    """
+    批量读取和更新标注（代替逐条的 GET / PUT /annotations/{id}）。
+    
+    全部读取和更新在一个事务中完成，返回每个读取和每条更新的结果；不存在的标注 ok 为 false。
+    
+    Args:
+        batch_request: 要读取的 ID 列表和标签更新列表
+        db: 数据库执行器
+        
+    Returns:
+        与请求一一对应的读取结果和更新结果
+        
+    Raises:
+        HTTPException: 如果涉及的标注数超过上限
+    """
+    try:
+        return await db.run(lambda session: AnnotationService(session).batch_annotations(batch_request))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@app.get(
+    "/annotations/{annotation_id}", response_model=schemas.AnnotationDataResponse,
+    dependencies=interactive_admission,
+)
+async def get_annotation(
     annotation_id: int,
-    db: Session = Depends(get_db)
+    db: DatabaseRunner = Depends(get_db_runner)
 ):
     """
     根据 ID 获取标注数据。
     
     Args:
         annotation_id: 标注的 ID
-        db: 数据库会话
+        db: 数据库执行器
         
     Returns:
         标注数据
@@ -189,26 +311,30 @@ def get_annotation(
     Raises:
         HTTPException: 如果标注未找到
     """
-    service = AnnotationService(db)
-    annotation = service.get_annotation(annotation_id)
+    annotation = await db.run(lambda session: AnnotationService(session).get_annotation(annotation_id))
     if not annotation:
         raise HTTPException(status_code=404, detail="标注未找到")
     return annotation
 
 
-@app.put("/annotations/{annotation_id}", response_model=schemas.AnnotationDataResponse)
-def update_annotation(
+@app.put(
+    "/annotations/{annotation_id}", response_model=schemas.AnnotationDataResponse,
+    dependencies=interactive_admission,
+)
+async def update_annotation(
     annotation_id: int,
     update_data: schemas.AnnotationDataUpdate,
-    db: Session = Depends(get_db)
+    db: DatabaseRunner = Depends(get_db_runner)
 ):
     """
     更新标注数据。
     
+    启用 WRITE_COALESCE_ENABLED 时，标签更新与其他并发更新合并为一个事务提交，提交后才返回。
+    
     Args:
         annotation_id: 要更新的标注 ID
         update_data: 要更新的数据
-        db: 数据库会话
+        db: 数据库执行器（合并写入时不使用）
         
     Returns:
         更新后的标注数据
@@ -216,53 +342,75 @@ def update_annotation(
     Raises:
         HTTPException: 如果标注未找到
     """
-    service = AnnotationService(db)
-    annotation = service.update_annotation(annotation_id, update_data)
+    if WRITE_COALESCE_ENABLED and update_data.labels is not None:
+        annotation = await asyncio.wrap_future(annotation_writer.submit(annotation_id, update_data.labels))
+    else:
+        annotation = await db.run(
+            lambda session: AnnotationService(session).update_annotation(annotation_id, update_data)
+        )
     if not annotation:
         raise HTTPException(status_code=404, detail="标注未找到")
     return annotation
 
 
-@app.delete("/annotations/{annotation_id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_annotation(
+@app.delete("/annotations/{annotation_id}", status_code=status.HTTP_204_NO_CONTENT, dependencies=interactive_admission)
+async def delete_annotation(
     annotation_id: int,
-    db: Session = Depends(get_db)
+    db: DatabaseRunner = Depends(get_db_runner)
 ):
     """
     删除标注数据。
     
     Args:
         annotation_id: 要删除的标注 ID
-        db: 数据库会话
+        db: 数据库执行器
         
     Raises:
         HTTPException: 如果标注未找到
     """
-    service = AnnotationService(db)
-    if not service.delete_annotation(annotation_id):
+    if not await db.run(lambda session: AnnotationService(session).delete_annotation(annotation_id)):
         raise HTTPException(status_code=404, detail="标注未找到")
 
 
-@app.post("/annotations/search", response_model=schemas.AnnotationDataList)
-def search_annotations(
+@app.post("/annotations/search", response_model=schemas.SearchResponse, dependencies=[Depends(admit_search)])
+async def search_annotations(
     search_request: schemas.SearchRequest,
-    db: Session = Depends(get_db)
+    db: DatabaseRunner = Depends(get_db_runner)
 ):
     """
     搜索和过滤标注数据。
     
     Args:
         search_request: 搜索参数
-        db: 数据库会话
+        db: 数据库执行器
         
     Returns:
-        分页的标注数据列表
+        分页的标注数据列表（快速路径直接返回序列化好的 JSON）：默认为 AnnotationDataList，
+        选择 fields 或截断 text 时为 AnnotationDataProjectionList，ids_only 时为 AnnotationIdList
+        
+    Raises:
+        HTTPException: ids_only 时匹配记录超过 SEARCH_IDS_MAX_RESULTS
     """
-    service = AnnotationService(db)
-    return service.search_annotations(search_request)
+    try:
+        content = await db.run(lambda session: AnnotationService(session).search_annotations_json(search_request))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return Response(content=content, media_type=JSON_MEDIA_TYPE)
+
+
+if ANNOTATION_WS_ENABLED:
+    @app.websocket("/ws/annotations")
+    async def annotation_channel(websocket: WebSocket):
+        """
+        WebSocket 标注通道：批量标签操作及确认、待标注条目预取、统计增量推送（协议见 annotation_channel.py）。
+        
+        Args:
+            websocket: WebSocket 连接
+        """
+        await serve_annotation_channel(websocket)
 
 
-@app.post("/annotations/bulk-label")
+@app.post("/annotations/bulk-label", dependencies=[Depends(admit_bulk_label)])
 def bulk_label_annotations(
     bulk_request: schemas.BulkLabelRequest,
     db: Session = Depends(get_db)
@@ -282,7 +430,10 @@ def bulk_label_annotations(
     return {"updated_count": updated_count}
 
 
-@app.post("/annotations/bulk-update-labels", response_model=schemas.BulkLabelUpdateResponse)
+@app.post(
+    "/annotations/bulk-update-labels", response_model=schemas.BulkLabelUpdateResponse,
+    dependencies=[Depends(admit_bulk_update)],
+)
 def bulk_update_labels(
     update_request: schemas.BulkLabelUpdateRequest,
     db: Session = Depends(get_db)
@@ -319,7 +470,7 @@ def bulk_update_labels(
         raise HTTPException(status_code=500, detail=f"批量更新失败: {str(e)}")
 
 
-@app.post("/annotations/import-texts")
+@app.post("/annotations/import-texts", dependencies=[Depends(admit_import_texts)])
 def import_texts(
     import_request: schemas.TextImportRequest,
     db: Session = Depends(get_db)
@@ -340,17 +491,20 @@ def import_texts(
 
 
 # 标签端点
-@app.post("/labels/", response_model=schemas.LabelResponse, status_code=status.HTTP_201_CREATED)
-def create_label(
+@app.post(
+    "/labels/", response_model=schemas.LabelResponse, status_code=status.HTTP_201_CREATED,
+    dependencies=interactive_admission,
+)
+async def create_label(
     label: schemas.LabelCreate,
-    db: Session = Depends(get_db)
+    db: DatabaseRunner = Depends(get_db_runner)
 ):
     """
     创建新标签。
     
     Args:
         label: 要创建的标签
-        db: 数据库会话
+        db: 数据库执行器
         
     Returns:
         创建的标签
@@ -358,40 +512,38 @@ def create_label(
     Raises:
         HTTPException: 如果标签已存在
     """
-    service = LabelService(db)
     try:
-        result = service.create_label(label)
+        result = await db.run(lambda session: LabelService(session).create_label(label))
         return result
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 
-@app.get("/labels/", response_model=List[schemas.LabelResponse])
-def get_all_labels(db: Session = Depends(get_db)):
+@app.get("/labels/", response_model=List[schemas.LabelResponse], dependencies=interactive_admission)
+async def get_all_labels(db: DatabaseRunner = Depends(get_db_runner)):
     """
     获取所有标签。
     
     Args:
-        db: 数据库会话
+        db: 数据库执行器
         
     Returns:
         标签列表
     """
-    service = LabelService(db)
-    return service.get_all_labels()
+    return await db.run(lambda session: LabelService(session).get_all_labels())
 
 
-@app.get("/labels/{label_id}", response_model=schemas.LabelResponse)
-def get_label(
+@app.get("/labels/{label_id}", response_model=schemas.LabelResponse, dependencies=interactive_admission)
+async def get_label(
     label_id: int,
-    db: Session = Depends(get_db)
+    db: DatabaseRunner = Depends(get_db_runner)
 ):
     """
     根据 ID 获取标签。
     
     Args:
         label_id: 标签 ID
-        db: 数据库会话
+        db: 数据库执行器
         
     Returns:
         标签数据
@@ -399,18 +551,17 @@ def get_label(
     Raises:
         HTTPException: 如果标签未找到
     """
-    service = LabelService(db)
-    label = service.get_label(label_id)
+    label = await db.run(lambda session: LabelService(session).get_label(label_id))
     if not label:
         raise HTTPException(status_code=404, detail="标签未找到")
     return label
 
 
-@app.put("/labels/{label_id}", response_model=schemas.LabelResponse)
-def update_label(
+@app.put("/labels/{label_id}", response_model=schemas.LabelResponse, dependencies=interactive_admission)
+async def update_label(
     label_id: int,
     label_data: schemas.LabelUpdate,
-    db: Session = Depends(get_db)
+    db: DatabaseRunner = Depends(get_db_runner)
 ):
     """
     更新标签。
@@ -418,7 +569,7 @@ def update_label(
     Args:
         label_id: 要更新的标签 ID
         label_data: 更新的标签数据
-        db: 数据库会话
+        db: 数据库执行器
         
     Returns:
         更新后的标签数据
@@ -426,9 +577,8 @@ def update_label(
     Raises:
         HTTPException: 如果标签未找到或标签字符串重复
     """
-    service = LabelService(db)
     try:
-        label = service.update_label(label_id, label_data)
+        label = await db.run(lambda session: LabelService(session).update_label(label_id, label_data))
         if not label:
             raise HTTPException(status_code=404, detail="标签未找到")
         return label
@@ -436,28 +586,27 @@ def update_label(
         raise HTTPException(status_code=400, detail=str(e))
 
 
-@app.delete("/labels/{label_id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_label(
+@app.delete("/labels/{label_id}", status_code=status.HTTP_204_NO_CONTENT, dependencies=interactive_admission)
+async def delete_label(
     label_id: int,
-    db: Session = Depends(get_db)
+    db: DatabaseRunner = Depends(get_db_runner)
 ):
     """
     删除标签。
     
     Args:
         label_id: 要删除的标签 ID
-        db: 数据库会话
+        db: 数据库执行器
         
     Raises:
         HTTPException: 如果标签未找到
     """
-    service = LabelService(db)
-    if not service.delete_label(label_id):
+    if not await db.run(lambda session: LabelService(session).delete_label(label_id)):
         raise HTTPException(status_code=404, detail="标签未找到")
 
 
 # 数据导入端点
-@app.post("/import/old-data", response_model=schemas.ImportStats)
+@app.post("/import/old-data", response_model=schemas.ImportStats, dependencies=import_admission)
 def import_old_data(
     old_data_path: str = "../old-data",
     db: Session = Depends(get_db)
@@ -479,14 +628,16 @@ def import_old_data(
         raise HTTPException(status_code=404, detail=f"路径 {old_data_path} 未找到")
     
     try:
-        importer = DataImporter()
+        importer = get_data_importer()
         stats = importer.import_old_data(old_data_path, db)
+        if EVENTS_ENABLED:
+            publish_resync("import")
         return stats
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"导入失败: {str(e)}")
 
 
-@app.post("/import/label-config")
+@app.post("/import/label-config", dependencies=import_admission)
 def import_label_config(
     config_path: str = "../old-data/label_config.yaml",
     db: Session = Depends(get_db)
@@ -508,14 +659,16 @@ def import_label_config(
         raise HTTPException(status_code=404, detail=f"配置文件 {config_path} 未找到")
     
     try:
-        importer = DataImporter()
+        importer = get_data_importer()
         labels_count = importer.import_label_config(config_path, db)
+        if EVENTS_ENABLED:
+            publish_resync("import")
         return {"imported_labels": labels_count}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"导入失败: {str(e)}")
 
 
-@app.post("/import/text-file")
+@app.post("/import/text-file", dependencies=import_admission)
 def import_text_file(
     import_request: schemas.ImportRequest,
     db: Session = Depends(get_db)
@@ -591,7 +744,7 @@ def import_text_file(
 
 
 # 统计端点
-@app.get("/stats", response_model=schemas.SystemStats)
+@app.get("/stats", response_model=schemas.SystemStats, dependencies=stats_admission)
 def get_stats_alias(db: Session = Depends(get_db)):
     """
     获取系统统计信息（别名）。
@@ -606,7 +759,7 @@ def get_stats_alias(db: Session = Depends(get_db)):
     return service.get_system_stats()
 
 
-@app.get("/stats/system", response_model=schemas.SystemStats)
+@app.get("/stats/system", response_model=schemas.SystemStats, dependencies=stats_admission)
 def get_system_stats(db: Session = Depends(get_db)):
     """
     获取系统统计信息。
@@ -636,6 +789,7 @@ async def start_generation(request: schemas.GenerateRequest):
     Raises:
         HTTPException: 如果请求参数无效
     """
+    generation_service = (await get_generation_module()).generation_service
     try:
         # 创建生成任务
         task_id = generation_service.create_task(request)
@@ -665,6 +819,7 @@ async def stream_generation(task_id: str):
     Raises:
         HTTPException: 如果任务不存在
     """
+    generation_service = (await get_generation_module()).generation_service
     task = generation_service.get_task(task_id)
     if not task:
         raise HTTPException(status_code=404, detail="任务不存在")
@@ -695,6 +850,7 @@ async def cancel_generation(task_id: str):
     Raises:
         HTTPException: 如果任务不存在
     """
+    generation_service = (await get_generation_module()).generation_service
     success = generation_service.cancel_task(task_id)
     if not success:
         raise HTTPException(status_code=404, detail="任务不存在")
@@ -716,6 +872,7 @@ async def get_generation_status(task_id: str):
     Raises:
         HTTPException: 如果任务不存在
     """
+    generation_service = (await get_generation_module()).generation_service
     task = generation_service.get_task(task_id)
     if not task:
         raise HTTPException(status_code=404, detail="任务不存在")
@@ -737,6 +894,7 @@ async def get_generation_results(task_id: str):
     Raises:
         HTTPException: 如果任务不存在
     """
+    generation_service = (await get_generation_module()).generation_service
     task = generation_service.get_task(task_id)
     if not task:
         raise HTTPException(status_code=404, detail="任务不存在")
@@ -749,6 +907,96 @@ async def get_generation_results(task_id: str):
     }
 
 
+@app.post("/generate/import/{task_id}", response_model=schemas.GenerateImportResponse, dependencies=import_admission)
+async def import_generation_results(
+    task_id: str,
+    import_request: Optional[schemas.GenerateImportRequest] = None,
+    db: DatabaseRunner = Depends(get_db_runner)
+):
+    """
+    将生成任务的结果一次性导入为标注数据。
+    
+    解析后的文本和标签通过批量插入路径写入数据库，已存在的文本会被跳过。
+    
+    Args:
+        task_id: 任务ID
+        import_request: 导入参数（可选的解析正则覆盖和结果序号）
+        db: 数据库执行器
+        
+    Returns:
+        导入统计信息
+        
+    Raises:
+        HTTPException: 如果任务不存在或参数无效
+    """
+    generation = await get_generation_module()
+    generation_service, corpus_index = generation.generation_service, generation.corpus_index
+    task = generation_service.get_task(task_id)
+    if not task:
+        raise HTTPException(status_code=404, detail="任务不存在")
+    
+    import_request = import_request or schemas.GenerateImportRequest()
+    
+    texts = task.generated_texts
+    if import_request.parse_regex:
+        try:
+            texts = await generation_service.reparse_results(task, import_request.parse_regex)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    
+    if import_request.indices is not None:
+        invalid = [i for i in import_request.indices if i < 0 or i >= len(texts)]
+        if invalid:
+            raise HTTPException(status_code=400, detail=f"结果序号超出范围: {invalid}")
+        texts = [texts[i] for i in import_request.indices]
+    
+    annotations = [
+        schemas.AnnotationDataCreate(text=item.text, labels=item.labels)
+        for item in texts if item.text.strip()
+    ]
+    
+    imported_count = await db.run(lambda session: AnnotationService(session).batch_create_annotations(annotations))
+    # 导入后的文本都已存在于语料中，后续生成任务可直接命中去重索引
+    corpus_index.add_texts([annotation.text for annotation in annotations])
+    
+    return schemas.GenerateImportResponse(
+        task_id=task_id,
+        imported_count=imported_count,
+        skipped_count=len(texts) - imported_count
+    )
+
+
+# 数据变化通知端点
+if EVENTS_ENABLED:
+    @app.get("/events")
+    async def change_events(request: Request):
+        """
+        数据变化通知（SSE）：标注变化、标签目录变化、统计增量，事件格式见 change_events.py。
+        
+        断线重连时 EventSource 自动带上 Last-Event-ID 请求头，从断点补发。
+        
+        Args:
+            request: 请求（读取 Last-Event-ID）
+            
+        Returns:
+            Server-Sent Events流
+            
+        Raises:
+            HTTPException: 如果订阅者已达上限
+        """
+        if broker.subscriber_count >= EVENTS_MAX_SUBSCRIBERS:
+            raise HTTPException(status_code=503, detail="订阅者过多，请稍后重试", headers={"Retry-After": "5"})
+        return StreamingResponse(
+            broker.stream(request.headers.get("last-event-id")),
+            media_type="text/event-stream",
+            headers={
+                "Cache-Control": "no-cache",
+                "Connection": "keep-alive",
+                "X-Accel-Buffering": "no",
+            }
+        )
+
+
 # 健康检查端点
 @app.get("/health")
 def health_check():
@@ -756,15 +1004,78 @@ def health_check():
     return {"status": "healthy", "message": "文本标注 API 正在运行"}
 
 
-def main():
-    """启动服务器的主函数。"""
+# 监控指标端点
+@app.get("/metrics")
+async def get_metrics():
+    """
+    Prometheus 文本格式的监控指标。
+    
+    包含按路由和状态码的请求耗时、数据库查询耗时、连接等待时间、
+    线程池占用与排队、生成缓存命中率和生成任务数。
+    """
+    if not METRICS_ENABLED:
+        raise HTTPException(status_code=404, detail="监控指标未启用")
+    return Response(content=render_metrics(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+@app.get("/debug/startup")
+def get_startup_report():
+    """
+    启动报告。
+    
+    Returns:
+        各启动阶段耗时，以及首次使用时延迟加载的子系统（数据生成、数据导入、建表检查）及其耗时
+    """
+    return startup_report()
+
+
+@app.get("/debug/slow-queries", response_model=List[schemas.SlowQueryShape])
+def get_slow_queries(
+    limit: int = Query(20, ge=1, le=SLOW_QUERY_MAX_SHAPES),
+    order_by: Literal["total_ms", "max_ms", "count"] = "total_ms"
+):
+    """
+    列出最慢的查询形态。
+    
+    Args:
+        limit: 返回数量
+        order_by: 排序字段（累计耗时、最大耗时或次数）
+        
+    Returns:
+        按形态聚合的慢查询统计，包含 EXPLAIN QUERY PLAN 和是否全表扫描
+    """
+    return slow_query_log.top(limit, order_by)
+
+
+record_phase("构建应用", time.perf_counter() - _app_setup_start)
+
+
+def main(argv: Optional[List[str]] = None):
+    """
+    启动服务器的主函数。
+    
+    --workers 大于 1 时启动多个工作进程共享同一个数据库文件（WAL 模式），
+    各进程的查询缓存通过数据版本感知其他进程的写入。
+    数据生成任务保存在处理请求的进程内，多进程部署时需要粘性会话才能查询任务进度。
+    """
+    import argparse
     import uvicorn
-    from .config import HOST, PORT
-    print(f"访问: http://localhost:{PORT}")
+    from .config import HOST, PORT, WORKERS, SQLITE_WAL_ENABLED
+
+    parser = argparse.ArgumentParser(description="文本标注 API 服务器")
+    parser.add_argument("--host", default=HOST)
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--workers", type=int, default=WORKERS, help="工作进程数")
+    args = parser.parse_args(argv)
+
+    if args.workers > 1 and not SQLITE_WAL_ENABLED:
+        logger.warning("多进程部署建议启用 SQLITE_WAL_ENABLED，否则写入会阻塞所有读取")
+    print(f"访问: http://localhost:{args.port}（{args.workers} 个工作进程）")
     uvicorn.run(
         "server.main:app",
-        host=HOST,
-        port=PORT,
+        host=args.host,
+        port=args.port,
+        workers=args.workers,
         # reload=True,
         log_level="info"
     )
@@ -0,0 +1,372 @@
+"""
+Prometheus 指标模块
+
+本模块提供以下功能：
+- 纯 Python 实现的 Counter / Histogram / 回调 Gauge 与文本格式输出（无需 prometheus_client）
+- 按路由和状态码统计请求延迟的 ASGI 中间件
+- 基于 SQLAlchemy 游标事件的查询耗时统计
+- 数据库连接等待时间、线程池队列深度、缓存命中率和生成任务数
+
+记录开销为一次加锁和一次二分查找，可在压测和生产环境下常开。
+"""
+
+import re
+import threading
+import time
+from bisect import bisect_left
+from typing import Callable, Dict, List, Sequence, Tuple
+
+from sqlalchemy import event
+
+from .startup import loaded_module
+
+# 默认延迟分桶（秒）
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _format_labels(labelnames: Sequence[str], labelvalues: Sequence[str], extra: str = "") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(labelnames, labelvalues)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class Counter:
+    """单调递增计数器"""
+
+    type = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labelvalues: str, amount: float = 1.0):
+        with self._lock:
+            self._values[labelvalues] = self._values.get(labelvalues, 0.0) + amount
+
+    def collect(self) -> List[str]:
+        with self._lock:
+            items = list(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, lv)} {_format_value(v)}" for lv, v in items]
+
+
+class Histogram:
+    """累积分桶直方图"""
+
+    type = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # 标签值 -> [各桶计数..., +Inf 计数, 总和]
+        self._values: Dict[Tuple[str, ...], List[float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labelvalues: str):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(labelvalues)
+            if state is None:
+                state = self._values[labelvalues] = [0] * (len(self.buckets) + 1) + [0.0]
+            state[index] += 1
+            state[-1] += value
+
+    def collect(self) -> List[str]:
+        with self._lock:
+            items = [(lv, list(state)) for lv, state in self._values.items()]
+        lines = []
+        for labelvalues, state in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), state[:-1]):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, labelvalues, le)} {cumulative}")
+            labels = _format_labels(self.labelnames, labelvalues)
+            lines.append(f"{self.name}_sum{labels} {_format_value(state[-1])}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class CallbackMetric:
+    """在输出时通过回调取值的指标，回调返回 {标签值元组: 数值}"""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str],
+                 callback: Callable[[], Dict[Tuple[str, ...], float]], metric_type: str = "gauge"):
+        self.type = metric_type
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.callback = callback
+
+    def collect(self) -> List[str]:
+        return [f"{self.name}{_format_labels(self.labelnames, lv)} {_format_value(v)}"
+                for lv, v in self.callback().items()]
+
+
+class MetricsRegistry:
+    """指标注册表"""
+
+    def __init__(self):
+        self._metrics: Dict[str, object] = {}
+
+    def register(self, metric):
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def callback(self, name: str, documentation: str, labelnames: Sequence[str],
+                 callback: Callable[[], Dict[Tuple[str, ...], float]], metric_type: str = "gauge") -> CallbackMetric:
+        """注册回调指标（已有计数的对象用 metric_type="counter" 暴露）"""
+        return self.register(CallbackMetric(name, documentation, labelnames, callback, metric_type))
+
+    def render(self) -> str:
+        """输出 Prometheus 文本格式（0.0.4）"""
+        lines = []
+        for metric in self._metrics.values():
+            samples = metric.collect()
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            lines.extend(samples)
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+http_request_duration = registry.histogram(
+    "http_request_duration_seconds", "HTTP 请求耗时（秒）", ("method", "route", "status")
+)
+db_query_duration = registry.histogram(
+    "db_query_duration_seconds", "数据库查询耗时（秒）", ("operation", "table")
+)
+db_query_errors = registry.counter(
+    "db_query_errors_total", "数据库查询错误数", ("operation", "table")
+)
+db_connection_wait = registry.histogram(
+    "db_connection_wait_seconds", "获取数据库连接的等待时间（秒）"
+)
+query_interrupted = registry.counter(
+    "query_interrupted_total", "被中断的查询数（disconnect: 客户端断开，timeout: 超出时间预算）", ("reason",)
+)
+admission_wait = registry.histogram(
+    "admission_wait_seconds", "准入控制排队时间（秒）", ("route_class",)
+)
+admission_rejected = registry.counter(
+    "admission_rejected_total", "准入控制拒绝的请求数（queue_full / timeout）", ("route_class", "reason")
+)
+annotation_channel_messages = registry.counter(
+    "annotation_channel_messages_total", "WebSocket 标注通道收到的消息数", ("type",)
+)
+change_events = registry.counter("change_events_total", "/events 发布的变化事件数", ("type",))
+change_event_resyncs = registry.counter(
+    "change_event_resyncs_total", "/events 订阅者因缓冲区溢出（overflow）或无法补发（expired）收到 resync 的次数", ("reason",)
+)
+write_coalesce_updates = registry.counter(
+    "write_coalesce_updates_total", "合并写入收到的标签更新数（coalesced: 提交前被同一标注的后续更新覆盖）", ("result",)
+)
+write_coalesce_batch_size = registry.histogram(
+    "write_coalesce_batch_size", "合并写入每批提交的标注数", buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256, 512)
+)
+write_coalesce_commit = registry.histogram(
+    "write_coalesce_commit_seconds", "合并写入每批事务的耗时（秒，含落盘）"
+)
+
+_in_progress = {"value": 0}
+_in_progress_lock = threading.Lock()
+registry.callback("http_requests_in_progress", "正在处理的 HTTP 请求数", (), lambda: {(): _in_progress["value"]})
+
+
+def requests_in_progress() -> int:
+    """正在处理的 HTTP 请求数（未启用指标中间件时恒为 0）"""
+    return _in_progress["value"]
+
+
+class MetricsMiddleware:
+    """
+    记录每个请求耗时的 ASGI 中间件。
+
+    路由标签取匹配到的路由模板（如 /annotations/{annotation_id}），未匹配的请求归为 unmatched，
+    避免标签基数随路径参数增长。流式响应的耗时包含整个流的传输时间。
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status_holder = {"status": 500}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status_holder["status"] = message["status"]
+            await send(message)
+
+        with _in_progress_lock:
+            _in_progress["value"] += 1
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            with _in_progress_lock:
+                _in_progress["value"] -= 1
+            route = scope.get("route")
+            route_path = getattr(route, "path", None) or "unmatched"
+            http_request_duration.observe(elapsed, scope["method"], route_path, str(status_holder["status"]))
+
+
+_STATEMENT_TABLE = re.compile(r"\b(?:FROM|INTO|UPDATE|TABLE)\s+[\"`\[]?(\w+)", re.IGNORECASE)
+
+
+def statement_labels(statement: str) -> Tuple[str, str]:
+    """从 SQL 语句中提取 (操作类型, 主表名) 作为指标标签"""
+    stripped = statement.lstrip()
+    operation = stripped.split(None, 1)[0].upper() if stripped else "UNKNOWN"
+    match = _STATEMENT_TABLE.search(stripped)
+    return operation, (match.group(1).lower() if match else "")
+
+
+def instrument_engine(engine):
+    """
+    为引擎挂载查询耗时统计。
+
+    开始时间记录在每次执行独立的 ExecutionContext 上：StaticPool 下多个线程共享同一连接，
+    放在 conn.info 上会互相覆盖。
+    """
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if context is not None:
+            context._metrics_start = time.perf_counter()
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        start = getattr(context, "_metrics_start", None)
+        if start is not None:
+            db_query_duration.observe(time.perf_counter() - start, *statement_labels(statement))
+
+    @event.listens_for(engine, "handle_error")
+    def _handle_error(exception_context):
+        db_query_errors.inc(*statement_labels(exception_context.statement or ""))
+
+    return engine
+
+
+def observe_connection_wait(seconds: float):
+    """记录一次数据库连接等待时间"""
+    db_connection_wait.observe(seconds)
+
+
+def _threadpool_stats() -> Dict[Tuple[str, ...], float]:
+    """AnyIO 默认线程池的占用和排队情况（需在事件循环线程中调用）"""
+    from anyio import to_thread
+
+    try:
+        stats = to_thread.current_default_thread_limiter().statistics()
+    except RuntimeError:
+        return {}
+    return {
+        ("borrowed",): stats.borrowed_tokens,
+        ("total",): stats.total_tokens,
+        ("waiting",): stats.tasks_waiting,
+    }
+
+
+def _generation_cache_stats() -> Dict[Tuple[str, ...], float]:
+    from .generation_cache import generation_cache
+
+    return {("hits",): generation_cache.hits, ("misses",): generation_cache.misses}
+
+
+def _generation_cache_ratio() -> Dict[Tuple[str, ...], float]:
+    from .generation_cache import generation_cache
+
+    total = generation_cache.hits + generation_cache.misses
+    return {(): generation_cache.hits / total if total else 0.0}
+
+
+def _query_cache_stats() -> Dict[Tuple[str, ...], float]:
+    from .data_version import cache_stats
+
+    counts: Dict[Tuple[str, ...], float] = {}
+    for name, (hits, misses) in cache_stats().items():
+        counts[(name, "hits")] = hits
+        counts[(name, "misses")] = misses
+    return counts
+
+
+def _single_flight_stats() -> Dict[Tuple[str, ...], float]:
+    from .single_flight import flight_stats
+
+    counts: Dict[Tuple[str, ...], float] = {}
+    for name, (executions, shared) in flight_stats().items():
+        counts[(name, "executed")] = executions
+        counts[(name, "shared")] = shared
+    return counts
+
+
+def _admission_stats() -> Dict[Tuple[str, ...], float]:
+    from .admission import admission_stats
+
+    samples: Dict[Tuple[str, ...], float] = {}
+    for route_class, stats in admission_stats().items():
+        for state, value in stats.items():
+            samples[(route_class, state)] = value
+    return samples
+
+
+def _generation_task_counts() -> Dict[Tuple[str, ...], float]:
+    # 数据生成模块尚未加载时不会有任务，也不为输出指标而触发加载
+    generation = loaded_module("server.generation_service")
+    if generation is None:
+        return {}
+    generation_service = generation.generation_service
+    counts: Dict[Tuple[str, ...], float] = {}
+    for task in list(generation_service.active_tasks.values()):
+        counts[(task.status,)] = counts.get((task.status,), 0) + 1
+    return counts
+
+
+registry.callback("threadpool_tokens", "AnyIO 默认线程池：borrowed 为占用线程数，waiting 为排队任务数",
+                  ("state",), _threadpool_stats)
+registry.callback("generation_cache_requests_total", "生成响应缓存命中/未命中次数",
+                  ("result",), _generation_cache_stats, metric_type="counter")
+registry.callback("generation_cache_hit_ratio", "生成响应缓存命中率", (), _generation_cache_ratio)
+registry.callback("generation_tasks", "按状态统计的生成任务数", ("status",), _generation_task_counts)
+registry.callback("single_flight_requests_total", "单飞合并：实际执行（executed）与共享其他请求结果（shared）的次数",
+                  ("name", "result"), _single_flight_stats, metric_type="counter")
+registry.callback("admission_units", "准入控制各类别的容量（capacity）、占用权重（in_use）和排队请求数（queued）",
+                  ("route_class", "state"), _admission_stats)
+registry.callback("query_cache_requests_total", "按数据版本失效的查询缓存命中/未命中次数",
+                  ("cache", "result"), _query_cache_stats, metric_type="counter")
+
+
+def render_metrics() -> str:
+    """输出全部指标（线程池指标需要在事件循环线程中调用）"""
+    return registry.render()
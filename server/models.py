@@ -6,10 +6,10 @@
 - Label: 存储带有 id 和标签字符串的标签信息
 """
 
-from sqlalchemy import Column, Integer, String, Text, create_engine, Index
+from sqlalchemy import Column, Integer, String, Text, create_engine, event, make_url, Index
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
-from sqlalchemy.pool import StaticPool
+from sqlalchemy.pool import QueuePool, StaticPool
 
 Base = declarative_base()
 
@@ -52,20 +52,82 @@ class Label(Base):
     description = Column(Text, nullable=True)  # 标签描述
     groups = Column(Text, nullable=True)  # 标签分组 aaa/bbb/ccc
 
-from .config import DATABASE_URL
+import threading
+import time
+from contextlib import contextmanager
 
-# 优化后的数据库引擎配置
-engine = create_engine(
-    DATABASE_URL,
-    connect_args={
-        "check_same_thread": False,
-        "timeout": 20,  # 增加超时时间
-        "isolation_level": None,  # 启用自动提交模式以提高性能
-    },
-    poolclass=StaticPool,  # 使用静态连接池
-    pool_pre_ping=True,  # 连接前检查连接有效性
-    echo=False,  # 生产环境关闭SQL日志
+from .config import (
+    DATABASE_URL, DB_POOL_MAX_OVERFLOW, DB_POOL_SIZE, METRICS_ENABLED, QUERY_CANCELLATION_ENABLED,
+    SLOW_QUERY_LOG_ENABLED, SQLITE_WAL_ENABLED
 )
+from . import metrics, query_budget, slow_query
+from .data_version import DataVersion
+from .startup import phase
+
+
+def _enable_wal(dbapi_connection, connection_record):
+    """
+    以 WAL 模式打开数据库：读不阻塞写，多个工作进程可以共享同一个数据库文件。
+    
+    WAL 模式下 synchronous=NORMAL 仍能保证数据库一致，只是断电时可能丢失最近的提交。
+    """
+    cursor = dbapi_connection.cursor()
+    try:
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+    finally:
+        cursor.close()
+
+
+def create_db_engine(database_url: str = DATABASE_URL):
+    """
+    创建数据库引擎（应用和基准测试共用同一套配置）。
+    
+    Args:
+        database_url: 数据库连接 URL
+        
+    Returns:
+        SQLAlchemy 引擎
+    """
+    database = make_url(database_url).database
+    in_memory = database in (None, "", ":memory:")
+    if in_memory:
+        # 内存数据库只存在于单个连接中，所有线程共用
+        pool_options = {"poolclass": StaticPool}
+    else:
+        # 文件数据库每个会话使用独立连接：共用连接时，一个线程未结束的读取会让另一线程的写入
+        # 沿用旧快照，其他进程提交后立即返回 database is locked（不经过 timeout 等待）
+        pool_options = {"poolclass": QueuePool, "pool_size": DB_POOL_SIZE, "max_overflow": DB_POOL_MAX_OVERFLOW}
+    engine = create_engine(
+        database_url,
+        connect_args={
+            "check_same_thread": False,
+            "timeout": 20,  # 增加超时时间
+            "isolation_level": None,  # 启用自动提交模式以提高性能
+        },
+        pool_pre_ping=True,  # 连接前检查连接有效性
+        echo=False,  # 生产环境关闭SQL日志
+        **pool_options,
+    )
+    if SQLITE_WAL_ENABLED and not in_memory:
+        event.listen(engine, "connect", _enable_wal)
+    if QUERY_CANCELLATION_ENABLED:
+        query_budget.instrument_engine(engine)
+    if METRICS_ENABLED:
+        metrics.instrument_engine(engine)
+    if SLOW_QUERY_LOG_ENABLED:
+        slow_query.instrument_engine(engine)
+    return engine
+
+
+# 优化后的数据库引擎配置
+engine = create_db_engine()
+
+# 应用数据库的数据版本（本进程写入 + 其他进程提交），查询缓存据此失效
+data_version = DataVersion(engine)
+
+# 连接应用数据库的引擎（启用异步数据库层时还包括异步引擎底层的同步引擎），查询缓存只用于这些引擎上的会话
+app_engines = [engine]
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
@@ -75,10 +137,66 @@ def create_tables():
     Base.metadata.create_all(bind=engine)
 
 
+_tables_ready = False
+_tables_lock = threading.Lock()
+
+
+def ensure_tables():
+    """首次访问数据库时建表（每个进程只执行一次），不占用服务器启动时间。"""
+    global _tables_ready
+    if _tables_ready:
+        return
+    with _tables_lock:
+        if not _tables_ready:
+            with phase("建表检查", lazy=True):
+                create_tables()
+            _tables_ready = True
+
+
+# 单条语句的绑定参数上限（SQLite 3.32 之前为 999）
+SQLITE_MAX_VARIABLES = 900
+
+
+@contextmanager
+def immediate_transaction(conn):
+    """
+    在连接上执行显式事务：BEGIN IMMEDIATE ... COMMIT，出错时回滚。
+    
+    引擎以自动提交模式连接（每条语句各自提交），多条语句需要原子执行、只提交一次时使用。
+    结束后调用者仍需结束 SQLAlchemy 的连接或会话状态（conn.commit() / session.commit()）。
+    """
+    conn.exec_driver_sql("BEGIN IMMEDIATE")
+    try:
+        yield conn
+        conn.exec_driver_sql("COMMIT")
+    except BaseException:
+        try:
+            conn.exec_driver_sql("ROLLBACK")
+        except Exception:
+            pass
+        raise
+
+
+def open_session():
+    """创建应用数据库会话（首次访问时建表）。"""
+    ensure_tables()
+    db = SessionLocal()
+    if METRICS_ENABLED:
+        # 提前取得连接，记录连接等待时间
+        start = time.perf_counter()
+        try:
+            db.connection()
+        except BaseException:
+            db.close()
+            raise
+        metrics.observe_connection_wait(time.perf_counter() - start)
+    return db
+
+
 def get_db():
     """获取 FastAPI 的数据库会话依赖。"""
-    db = SessionLocal()
+    db = open_session()
     try:
         yield db
     finally:
-        db.close() 
\ No newline at end of file
+        db.close()
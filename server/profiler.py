@@ -0,0 +1,205 @@
+"""
+按需请求采样分析模块
+
+本模块提供以下功能：
+- 基于 sys._current_frames 的低开销采样分析器（独立线程定时采样）
+- 请求头 X-Profile 或查询参数 profile 触发的 ASGI 中间件
+- 输出火焰图兼容的折叠栈格式（flamegraph.pl / speedscope 可直接读取）
+
+采样对象为事件循环线程（异步端点）和正在执行任务的 AnyIO 工作线程（同步端点）。
+并发请求较多时工作线程的样本可能混入其他请求，元数据中会记录采样期间的并发请求数
+（文件模式写入同名 .json 旁路文件，inline 模式放在 X-Profile-* 响应头中，折叠栈本身不含注释行）。
+中间件只在 PROFILING_ENABLED 时挂载，默认无任何开销。
+"""
+
+import json
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+from urllib.parse import parse_qs
+
+from .config import PROFILE_DIR, PROFILE_SAMPLE_INTERVAL_MS
+from .metrics import requests_in_progress
+
+_WORKER_THREAD_PREFIX = "AnyIO worker thread"
+
+
+def _frame_label(code) -> str:
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+def _is_idle_worker(frame) -> bool:
+    """工作线程是否在等待任务队列（空闲线程不计入样本）"""
+    depth = 0
+    while frame is not None and depth < 4:
+        code = frame.f_code
+        if code.co_name == "get" and code.co_filename.endswith("queue.py"):
+            return True
+        frame = frame.f_back
+        depth += 1
+    return False
+
+
+class SamplingProfiler:
+    """
+    采样分析器。
+
+    在后台线程中每隔 interval 秒读取目标线程的调用栈，按折叠栈计数。
+    """
+
+    def __init__(self, loop_thread_id: int, interval: float = PROFILE_SAMPLE_INTERVAL_MS / 1000):
+        self.loop_thread_id = loop_thread_id
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self.started_at = 0.0
+        self.elapsed = 0.0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _target_threads(self) -> Dict[int, str]:
+        """事件循环线程和所有 AnyIO 工作线程"""
+        targets = {self.loop_thread_id: "event-loop"}
+        for thread in threading.enumerate():
+            if thread.name.startswith(_WORKER_THREAD_PREFIX) and thread.ident is not None:
+                targets[thread.ident] = "worker"
+        return targets
+
+    def _sample(self):
+        frames = sys._current_frames()
+        for thread_id, role in self._target_threads().items():
+            frame = frames.get(thread_id)
+            if frame is None or (role == "worker" and _is_idle_worker(frame)):
+                continue
+            stack: List[str] = []
+            while frame is not None:
+                stack.append(_frame_label(frame.f_code))
+                frame = frame.f_back
+            stack.append(role)
+            self.stacks[";".join(reversed(stack))] += 1
+        self.samples += 1
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self._sample()
+
+    def start(self):
+        self.started_at = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, daemon=True, name="request-profiler")
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+        self.elapsed = time.perf_counter() - self.started_at
+
+    def collapsed(self) -> str:
+        """折叠栈文本：每行为 "帧;帧;帧 次数"（标准格式，不含元数据）"""
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+    def metadata(self, extra: Optional[Dict[str, object]] = None) -> Dict[str, object]:
+        """采样元数据（请求信息、样本数、间隔和耗时）"""
+        return {
+            **(extra or {}),
+            "samples": self.samples,
+            "interval_ms": round(self.interval * 1000, 3),
+            "elapsed_ms": round(self.elapsed * 1000, 1),
+        }
+
+
+def _profile_mode(scope) -> Optional[str]:
+    """返回 "file"、"inline" 或 None（不分析）"""
+    value = None
+    for name, header_value in scope.get("headers", []):
+        if name == b"x-profile":
+            value = header_value.decode("latin-1").strip().lower()
+            break
+    if value is None and scope.get("query_string"):
+        values = parse_qs(scope["query_string"].decode("latin-1")).get("profile")
+        value = values[0].strip().lower() if values else None
+    if value in ("1", "true", "file"):
+        return "file"
+    if value == "inline":
+        return "inline"
+    return None
+
+
+class ProfilingMiddleware:
+    """
+    请求分析中间件。
+
+    X-Profile: 1（或 ?profile=1）将折叠栈写入 PROFILE_DIR，文件名通过响应头 X-Profile-File 返回，
+    元数据写入同名的 .json 文件；
+    X-Profile: inline（或 ?profile=inline）用折叠栈文本替换响应体，原状态码放在 X-Profile-Status 中，
+    样本数、耗时等放在 X-Profile-Samples / X-Profile-Interval-Ms / X-Profile-Elapsed-Ms /
+    X-Profile-Concurrent-Requests 中。
+    """
+
+    def __init__(self, app, profile_dir: Path = PROFILE_DIR):
+        self.app = app
+        self.profile_dir = Path(profile_dir)
+
+    async def __call__(self, scope, receive, send):
+        mode = _profile_mode(scope) if scope["type"] == "http" else None
+        if mode is None:
+            await self.app(scope, receive, send)
+            return
+
+        profiler = SamplingProfiler(threading.get_ident())
+        header = {
+            "request": f"{scope['method']} {scope['path']}",
+            "started": datetime.now().isoformat(timespec="seconds"),
+            "concurrent_requests": requests_in_progress(),
+        }
+        stamp = datetime.now().strftime("%Y%m%d-%H%M%S-%f")
+        safe_path = scope["path"].strip("/").replace("/", "_").replace("\\", "_") or "root"
+        filename = f"{stamp}_{scope['method']}_{safe_path}.collapsed"
+        response_status = {"status": 500}
+
+        async def send_file_mode(message):
+            if message["type"] == "http.response.start":
+                message = dict(message)
+                message["headers"] = list(message.get("headers", [])) + [(b"x-profile-file", filename.encode())]
+            await send(message)
+
+        async def send_inline_mode(message):
+            # 丢弃原响应，结束后发送分析结果
+            if message["type"] == "http.response.start":
+                response_status["status"] = message["status"]
+
+        profiler.start()
+        try:
+            await self.app(scope, receive, send_file_mode if mode == "file" else send_inline_mode)
+        finally:
+            profiler.stop()
+
+        if mode == "file":
+            self.profile_dir.mkdir(parents=True, exist_ok=True)
+            (self.profile_dir / filename).write_text(profiler.collapsed(), encoding="utf-8")
+            (self.profile_dir / f"{filename}.json").write_text(
+                json.dumps(profiler.metadata(header), ensure_ascii=False, indent=2), encoding="utf-8"
+            )
+            return
+
+        metadata = profiler.metadata(header)
+        body = profiler.collapsed().encode("utf-8")
+        await send({
+            "type": "http.response.start",
+            "status": 200,
+            "headers": [
+                (b"content-type", b"text/plain; charset=utf-8"),
+                (b"content-length", str(len(body)).encode()),
+                (b"x-profile-status", str(response_status["status"]).encode()),
+                (b"x-profile-samples", str(metadata["samples"]).encode()),
+                (b"x-profile-interval-ms", f"{metadata['interval_ms']:g}".encode()),
+                (b"x-profile-elapsed-ms", f"{metadata['elapsed_ms']:.1f}".encode()),
+                (b"x-profile-concurrent-requests", str(metadata["concurrent_requests"]).encode()),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
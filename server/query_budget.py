@@ -0,0 +1,168 @@
+"""
+查询时间预算与取消模块
+
+本模块提供以下功能：
+- 每个请求的查询时间预算（默认 QUERY_TIME_BUDGET_MS，为 None 时不限时；可通过请求头 X-Query-Budget-Ms 指定）
+- 检测客户端断开连接（浏览器丢弃了旧的搜索请求）
+- 通过 SQLite 进度回调中断正在执行的读语句，释放连接和 CPU
+- 将中断转换为 QueryInterrupted，由应用返回明确的超时错误
+
+预算对象保存在 contextvar 中：中间件在事件循环中设置，同步端点在线程池中执行时继承同一个对象，
+断开检测对它的修改在执行语句的线程中立即可见。写语句不会被中断，避免批量操作只写入一部分。
+"""
+
+import asyncio
+import contextvars
+import time
+from typing import Optional
+
+from sqlalchemy import event
+
+from .config import (
+    QUERY_BUDGET_EXEMPT_PREFIXES, QUERY_PROGRESS_INTERVAL, QUERY_TIME_BUDGET_MAX_MS, QUERY_TIME_BUDGET_MS
+)
+from .data_version import is_write_statement
+from . import metrics
+
+BUDGET_HEADER = b"x-query-budget-ms"
+
+
+class QueryBudget:
+    """单个请求的查询预算：截止时间和取消标记"""
+
+    def __init__(self, budget_ms: Optional[float]):
+        self.budget_ms = budget_ms
+        self.deadline = time.perf_counter() + budget_ms / 1000 if budget_ms else None
+        self.cancelled = False
+        self.writing = False
+        self.released = False
+        self.interrupted: Optional[str] = None
+
+    def cancel(self):
+        """客户端已断开：中断之后的读语句"""
+        self.cancelled = True
+
+    def release(self):
+        """响应已发送完毕：之后的后台任务不再受预算和断开的影响"""
+        self.deadline = None
+        self.cancelled = False
+        self.released = True
+
+    def should_interrupt(self) -> Optional[str]:
+        """返回中断原因（"disconnect" / "timeout"），无需中断时返回 None"""
+        if self.writing:
+            return None
+        if self.cancelled:
+            return "disconnect"
+        if self.deadline is not None and time.perf_counter() > self.deadline:
+            return "timeout"
+        return None
+
+
+current_budget: contextvars.ContextVar[Optional[QueryBudget]] = contextvars.ContextVar(
+    "current_budget", default=None
+)
+
+
+class QueryInterrupted(Exception):
+    """查询因超出时间预算或客户端断开而被中断"""
+
+    def __init__(self, reason: str, budget_ms: Optional[float]):
+        super().__init__(f"查询已中断: {reason}")
+        self.reason = reason
+        self.budget_ms = budget_ms
+
+
+def _progress_handler() -> int:
+    budget = current_budget.get()
+    if budget is None:
+        return 0
+    reason = budget.should_interrupt()
+    if reason is None:
+        return 0
+    budget.interrupted = reason
+    return 1
+
+
+def instrument_engine(engine):
+    """为引擎的每个连接安装进度回调，并将被中断的语句转换为 QueryInterrupted"""
+
+    @event.listens_for(engine, "connect")
+    def _connect(dbapi_connection, connection_record):
+        dbapi_connection.set_progress_handler(_progress_handler, QUERY_PROGRESS_INTERVAL)
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        budget = current_budget.get()
+        if budget is not None:
+            budget.writing = is_write_statement(statement)
+
+    @event.listens_for(engine, "handle_error")
+    def _handle_error(exception_context):
+        budget = current_budget.get()
+        if budget is None or budget.interrupted is None:
+            return
+        # sqlite3.OperationalError: interrupted
+        if "interrupted" in str(exception_context.original_exception):
+            metrics.query_interrupted.inc(budget.interrupted)
+            raise QueryInterrupted(budget.interrupted, budget.budget_ms) from exception_context.sqlalchemy_exception
+
+
+def _requested_budget(scope) -> Optional[float]:
+    """请求头 X-Query-Budget-Ms 指定的预算（毫秒），限制在 QUERY_TIME_BUDGET_MAX_MS 以内"""
+    for name, value in scope.get("headers", []):
+        if name == BUDGET_HEADER:
+            try:
+                requested = float(value)
+            except ValueError:
+                return None
+            if requested > 0:
+                return min(requested, QUERY_TIME_BUDGET_MAX_MS)
+            return None
+    return None
+
+
+class QueryBudgetMiddleware:
+    """
+    查询预算中间件（纯 ASGI）。
+
+    为每个 HTTP 请求创建 QueryBudget，并在后台读取 receive：请求体照常转交给应用，
+    收到 http.disconnect 时标记取消，正在执行的读语句在下一次进度回调时被中断。
+    QUERY_BUDGET_EXEMPT_PREFIXES 中的路径（导入、批量操作、数据生成）只在断开时中断，不限时间。
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        exempt = scope["path"].startswith(QUERY_BUDGET_EXEMPT_PREFIXES)
+        budget_ms = None if exempt else (_requested_budget(scope) or QUERY_TIME_BUDGET_MS)
+        budget = QueryBudget(budget_ms)
+        token = current_budget.set(budget)
+
+        messages: asyncio.Queue = asyncio.Queue()
+
+        async def watch_receive():
+            while True:
+                message = await receive()
+                await messages.put(message)
+                if message["type"] == "http.disconnect":
+                    if not budget.released:
+                        budget.cancel()
+                    return
+
+        async def send_tracking(message):
+            await send(message)
+            if message["type"] == "http.response.body" and not message.get("more_body", False):
+                budget.release()
+
+        watcher = asyncio.create_task(watch_receive())
+        try:
+            await self.app(scope, messages.get, send_tracking)
+        finally:
+            watcher.cancel()
+            current_budget.reset(token)
@@ -7,10 +7,29 @@
 - 数据导入操作
 """
 
-from typing import List, Optional, Union
+from functools import lru_cache
+from typing import Any, List, Literal, Optional, Union
 from pydantic import BaseModel, Field, validator, model_validator
 
 
+@lru_cache(maxsize=8192)
+def normalize_labels(v: Optional[str]) -> Optional[str]:
+    """
+    规范化逗号分隔的标签字符串：去除空白，过滤空标签，去重并保持顺序。
+    
+    标签组合的种类远少于数据行数，结果按输入缓存，校验器和搜索快速路径共用。
+    
+    Returns:
+        以 ", " 连接的标签，没有有效标签时返回 None
+    """
+    if v is None or v == '':
+        return None
+    labels = [label.strip() for label in v.split(',')]
+    labels = [label for label in labels if label]  # 移除空标签
+    labels = list(dict.fromkeys(labels))  # 去重并保持顺序
+    return ', '.join(labels) if labels else None
+
+
 class AnnotationDataBase(BaseModel):
     """标注数据的基础 schema。"""
     text: str = Field(..., description="文本内容")
@@ -19,13 +38,7 @@ class AnnotationDataBase(BaseModel):
     @validator('labels')
     def validate_labels(cls, v):
         """验证标签格式，确保逗号分隔的标签格式正确"""
-        if v is None or v == '':
-            return None
-        # 清理标签：去除空白，过滤空标签，去重
-        labels = [label.strip() for label in v.split(',')]
-        labels = [label for label in labels if label]  # 移除空标签
-        labels = list(dict.fromkeys(labels))  # 去重并保持顺序
-        return ', '.join(labels) if labels else None
+        return normalize_labels(v)
 
 
 class AnnotationDataCreate(AnnotationDataBase):
@@ -126,6 +139,62 @@ class SearchRequest(BaseModel):
     unlabeled_only: bool = Field(False, description="仅返回未标注文本")
     page: int = Field(1, description="页码", ge=1)
     per_page: int = Field(50, description="每页记录数", ge=1, le=1000)
+    fields: Optional[List[Literal["id", "text", "labels"]]] = Field(
+        None, description="每条记录返回的字段（默认全部）", min_length=1
+    )
+    text_max_chars: Optional[int] = Field(None, description="text 最多返回的字符数（在 SQL 中截断）", ge=1)
+    ids_only: bool = Field(False, description="只返回全部匹配记录的 ID（忽略分页和字段选择，用于全选）")
+
+
+class AnnotationIdList(BaseModel):
+    """ids_only 搜索结果的 schema。"""
+    ids: List[int] = Field(..., description="全部匹配记录的 ID（升序，超过 SEARCH_IDS_MAX_RESULTS 条时返回 400）")
+    total: int = Field(..., description="匹配记录总数")
+
+
+class AnnotationDataProjection(BaseModel):
+    """按 fields 选择字段后的单条搜索结果（只包含所选的字段）。"""
+    id: Optional[int] = Field(None, description="唯一标识符")
+    text: Optional[str] = Field(None, description="文本内容（可能按 text_max_chars 截断）")
+    labels: Optional[str] = Field(None, description="多标签，存储为逗号分隔字符串")
+
+
+class AnnotationDataProjectionList(BaseModel):
+    """指定 fields 或 text_max_chars 时的分页搜索结果。"""
+    items: List[AnnotationDataProjection]
+    total: int = Field(..., description="记录总数")
+    page: int = Field(..., description="当前页码")
+    per_page: int = Field(..., description="每页记录数")
+
+
+# POST /annotations/search 的响应：默认 AnnotationDataList，选择字段时为投影列表，ids_only 时为 ID 列表
+SearchResponse = Union[AnnotationDataList, AnnotationDataProjectionList, AnnotationIdList]
+
+
+class AnnotationLabelOp(BaseModel):
+    """单条标签操作（WebSocket 标注通道和批量端点使用，与 PUT /annotations/{id} 相同）。"""
+    id: int = Field(..., description="标注 ID")
+    labels: Optional[str] = Field(None, description="新的逗号分隔标签")
+
+
+class AnnotationBatchRequest(BaseModel):
+    """批量读取和更新标注的 schema。"""
+    ids: List[int] = Field(default_factory=list, description="要读取的标注 ID 列表")
+    updates: List[AnnotationLabelOp] = Field(default_factory=list, description="标签更新列表（同一 ID 多次出现时以最后一次为准）")
+
+
+class AnnotationBatchResult(BaseModel):
+    """批量请求中单条读取或更新的结果。"""
+    id: int = Field(..., description="标注 ID")
+    ok: bool = Field(..., description="标注是否存在")
+    item: Optional[AnnotationDataResponse] = Field(None, description="标注数据（更新后）")
+    error: Optional[str] = Field(None, description="错误信息")
+
+
+class AnnotationBatchResponse(BaseModel):
+    """批量读取和更新标注的响应 schema。"""
+    items: List[AnnotationBatchResult] = Field(..., description="与 ids 一一对应的读取结果")
+    updates: List[AnnotationBatchResult] = Field(..., description="与 updates 一一对应的更新结果")
 
 
 class LabelStats(BaseModel):
@@ -153,28 +222,12 @@ class BulkLabelUpdateRequest(BaseModel):
     @validator('labels_to_add')
     def validate_labels_to_add(cls, v):
         """验证要添加的标签格式"""
-        if v is None or v == '':
-            return None
-        # 清理标签
-        labels = [label.strip() for label in v.split(',')]
-        labels = [label for label in labels if label]
-        if not labels:
-            return None
-        labels = list(dict.fromkeys(labels))  # 去重
-        return ', '.join(labels)
+        return normalize_labels(v)
     
     @validator('labels_to_remove')
     def validate_labels_to_remove(cls, v):
         """验证要删除的标签格式"""
-        if v is None or v == '':
-            return None
-        # 清理标签
-        labels = [label.strip() for label in v.split(',')]
-        labels = [label for label in labels if label]
-        if not labels:
-            return None
-        labels = list(dict.fromkeys(labels))  # 去重
-        return ', '.join(labels)
+        return normalize_labels(v)
     
     @model_validator(mode='after')
     def validate_operation(self):
@@ -209,9 +262,18 @@ class GenerateRequest(BaseModel):
     system_prompt: str = Field(..., description="系统提示词")
     user_prompt: str = Field(..., description="用户提示词")
     count: int = Field(default=10, ge=1, le=100, description="生成数量")
-    parse_regex: Optional[str] = Field(None, description="解析正则表达式")
+    parse_regex: Optional[str] = Field(None, description="解析正则表达式，支持命名分组 text/labels，未命名时依次取第1、2个分组；按原样编译，. 默认不匹配换行（可在正则中使用 (?s)）")
     temperature: float = Field(default=0.7, ge=0.0, le=2.0, description="生成温度")
     max_tokens: Optional[int] = Field(None, ge=1, le=4096, description="最大token数")
+    dedup_mode: Literal["off", "flag", "retry"] = Field(
+        default="flag",
+        description="去重模式: off 不检查, flag 标记重复, retry 重复时自动重试"
+    )
+    cache_policy: Literal["auto", "use", "refresh", "off"] = Field(
+        default="auto",
+        description="响应缓存策略: auto 仅 temperature=0 时使用, use 读写缓存, refresh 跳过读取但写入, off 不使用"
+    )
+    stream_tokens: bool = Field(default=False, description="是否以流式方式调用模型并转发 token 增量事件")
 
 
 class GeneratedText(BaseModel):
@@ -219,6 +281,10 @@ class GeneratedText(BaseModel):
     text: str = Field(..., description="生成的文本内容")
     labels: Optional[str] = Field(None, description="解析出的标签")
     raw_output: str = Field(..., description="原始模型输出")
+    duplicate_of: Optional[Literal["task", "corpus"]] = Field(
+        None, description="重复来源: task 与本任务已生成文本重复, corpus 与已有标注数据重复"
+    )
+    cached: bool = Field(False, description="是否来自响应缓存")
 
 
 class GenerateResponse(BaseModel):
@@ -236,4 +302,39 @@ class GenerateStatus(BaseModel):
     current_count: int = Field(..., description="当前已生成数量")
     total_count: int = Field(..., description="目标总数量")
     message: Optional[str] = Field(None, description="状态消息")
-    error: Optional[str] = Field(None, description="错误信息") 
\ No newline at end of file
+    error: Optional[str] = Field(None, description="错误信息")
+    duplicate_count: int = Field(0, description="去重命中次数（含重试前的命中）")
+    task_duplicate_count: int = Field(0, description="与本任务已生成文本重复的次数")
+    corpus_duplicate_count: int = Field(0, description="与已有标注数据重复的次数")
+    retry_count: int = Field(0, description="因重复而自动重试的次数")
+    dedup_hit_rate: float = Field(0.0, description="去重命中率 (0-1)")
+    cache_hits: int = Field(0, description="响应缓存命中次数")
+    cache_misses: int = Field(0, description="响应缓存未命中次数")
+
+
+class GenerateImportRequest(BaseModel):
+    """生成结果导入请求的 schema。"""
+    parse_regex: Optional[str] = Field(None, description="覆盖任务的解析正则表达式，提供时会重新解析全部原始输出")
+    indices: Optional[List[int]] = Field(None, description="要导入的结果序号列表，为空时导入全部结果")
+
+
+class GenerateImportResponse(BaseModel):
+    """生成结果导入响应的 schema。"""
+    task_id: str = Field(..., description="任务ID")
+    imported_count: int = Field(..., description="成功导入的数量")
+    skipped_count: int = Field(..., description="跳过的数量（空文本或重复文本）")
+
+
+class SlowQueryShape(BaseModel):
+    """慢查询形态统计 schema。"""
+    shape: str = Field(..., description="归一化后的 SQL（字面量替换为 ?，IN 列表折叠）")
+    count: int = Field(..., description="超过阈值的次数")
+    total_ms: float = Field(..., description="累计耗时（毫秒）")
+    avg_ms: float = Field(..., description="平均耗时（毫秒）")
+    max_ms: float = Field(..., description="最大耗时（毫秒）")
+    first_seen: str = Field(..., description="首次记录时间")
+    last_seen: str = Field(..., description="最近记录时间")
+    last_parameters: Any = Field(None, description="最近一次的绑定参数（文本已脱敏）")
+    plan: Optional[List[str]] = Field(None, description="EXPLAIN QUERY PLAN 输出")
+    full_scan: bool = Field(False, description="查询计划中是否包含全表扫描（SCAN）")
+
@@ -10,10 +10,62 @@
 
 from typing import List, Optional, Dict, Tuple
 from sqlalchemy.orm import Session
-from sqlalchemy import func, or_, and_
-from tqdm import tqdm
+from sqlalchemy import bindparam, func, or_, and_, select, update
+from .change_events import StatsDelta, publish_annotations, publish_label
+from .config import (
+    ANNOTATION_BATCH_MAX_ITEMS, EVENTS_ENABLED, QUERY_CACHE_ENABLED, SEARCH_CACHE_MAX_BYTES, SEARCH_CACHE_MAX_ENTRIES,
+    SEARCH_IDS_MAX_RESULTS, SINGLE_FLIGHT_ENABLED
+)
+from .data_version import VersionedCache
 from .models import AnnotationData, Label
-from . import schemas
+from .query_budget import QueryInterrupted
+from .single_flight import SingleFlight
+from .write_coalescer import WriteCoalescer
+from . import models, schemas, fast_json
+
+# 进程内查询缓存，按数据版本失效（多进程部署时也能感知其他进程的写入）
+label_cache = VersionedCache("labels", models.data_version, max_entries=1)
+stats_cache = VersionedCache("stats", models.data_version, max_entries=1)
+search_cache = VersionedCache("search", models.data_version, SEARCH_CACHE_MAX_ENTRIES, SEARCH_CACHE_MAX_BYTES)
+
+# 相同数据版本下的相同搜索 / 统计并发到达时只执行一次；
+# 执行者的查询因其客户端断开或其自身的时间预算被中断时，等待者各自重新执行
+search_flight = SingleFlight("search", retry_on=(QueryInterrupted,))
+stats_flight = SingleFlight("stats", retry_on=(QueryInterrupted,))
+
+
+def _publish_coalesced(changes: Dict[int, Tuple[Optional[str], Optional[str]]]):
+    """发布合并写入提交的标签变化及统计增量（在写线程中调用）"""
+    if EVENTS_ENABLED:
+        delta = StatsDelta()
+        for old_labels, new_labels in changes.values():
+            delta.record(old_labels, new_labels)
+        publish_annotations("updated", list(changes), delta=delta)
+
+
+# 单条标签更新的合并写入（WRITE_COALESCE_ENABLED 时由 PUT /annotations/{id} 使用）
+annotation_writer = WriteCoalescer(models.engine, models.data_version, on_commit=_publish_coalesced)
+
+
+def use_query_cache(db: Session) -> bool:
+    """只缓存应用数据库上的查询（基准测试等使用独立引擎的会话始终直接查询）"""
+    return QUERY_CACHE_ENABLED and db.get_bind() in models.app_engines
+
+
+def notify_changes(db: Session) -> bool:
+    """是否在 /events 上通知该会话的写入（只通知应用数据库上的写入）"""
+    return EVENTS_ENABLED and db.get_bind() in models.app_engines
+
+
+def run_single_flight(db: Session, flight: SingleFlight, key, compute):
+    """
+    在应用数据库上按 (键, 数据版本) 合并并发的相同查询，其他会话直接执行。
+    
+    等待者阻塞在线程事件上，只能用于线程池中的同步会话（异步会话在事件循环中执行，会互相阻塞）。
+    """
+    if not SINGLE_FLIGHT_ENABLED or db.get_bind() is not models.engine:
+        return compute()
+    return flight.do((key, models.data_version.current()), compute)
 
 
 def parse_labels(labels_str: Optional[str]) -> List[str]:
@@ -90,6 +142,11 @@ class AnnotationService:
         self.db.commit()
         self.db.refresh(db_annotation)
         
+        if notify_changes(self.db):
+            delta = StatsDelta()
+            delta.record_created(db_annotation.labels)
+            publish_annotations("created", [db_annotation.id], delta=delta)
+        
         return db_annotation
     
     def get_annotation(self, annotation_id: int) -> Optional[AnnotationData]:
@@ -121,12 +178,18 @@ class AnnotationService:
         if not annotation:
             return None
         
+        old_labels = annotation.labels
         if update_data.labels is not None:
             annotation.labels = update_data.labels
         
         self.db.commit()
         self.db.refresh(annotation)
         
+        if notify_changes(self.db):
+            delta = StatsDelta()
+            delta.record(old_labels, annotation.labels)
+            publish_annotations("updated", [annotation_id], delta=delta)
+        
         return annotation
     
     def delete_annotation(self, annotation_id: int) -> bool:
@@ -143,15 +206,88 @@ class AnnotationService:
         if not annotation:
             return False
         
+        old_labels = annotation.labels
         self.db.delete(annotation)
         self.db.commit()
         
+        if notify_changes(self.db):
+            delta = StatsDelta()
+            delta.record_deleted(old_labels)
+            publish_annotations("deleted", [annotation_id], delta=delta)
+        
         return True
     
+    def batch_annotations(self, batch_request: schemas.AnnotationBatchRequest) -> schemas.AnnotationBatchResponse:
+        """
+        在一个事务中批量读取和更新标注（一条 SELECT ... IN，一次 executemany 更新）。
+        
+        labels 为 None 的更新与 PUT /annotations/{id} 一样不修改标签。
+        
+        Args:
+            batch_request: 要读取的 ID 和标签更新
+            
+        Returns:
+            每个读取和每条更新的结果（更新结果为提交后的标注）
+            
+        Raises:
+            ValueError: 如果涉及的不同标注数超过 ANNOTATION_BATCH_MAX_ITEMS
+        """
+        updates = {op.id: op.labels for op in batch_request.updates if op.labels is not None}
+        ids = list(dict.fromkeys([*batch_request.ids, *(op.id for op in batch_request.updates)]))
+        if len(ids) > ANNOTATION_BATCH_MAX_ITEMS:
+            raise ValueError(f"单次最多涉及 {ANNOTATION_BATCH_MAX_ITEMS} 个不同的标注，当前为 {len(ids)} 个")
+        
+        rows: Dict[int, Tuple[str, Optional[str]]] = {}
+        changed: Dict[int, Tuple[Optional[str], Optional[str]]] = {}
+        if ids:
+            conn = self.db.connection()
+            with models.immediate_transaction(conn):
+                for annotation_id, text, labels in conn.execute(
+                    select(AnnotationData.id, AnnotationData.text, AnnotationData.labels)
+                    .where(AnnotationData.id.in_(ids))
+                ):
+                    rows[annotation_id] = (text, labels)
+                changed = {
+                    annotation_id: (rows[annotation_id][1], labels)
+                    for annotation_id, labels in updates.items()
+                    if annotation_id in rows and rows[annotation_id][1] != labels
+                }
+                if changed:
+                    conn.execute(
+                        update(AnnotationData).where(AnnotationData.id == bindparam("b_id"))
+                        .values(labels=bindparam("b_labels")),
+                        [{"b_id": annotation_id, "b_labels": labels} for annotation_id, (_, labels) in changed.items()],
+                    )
+            self.db.commit()
+        
+        if changed:
+            # 提交之后再递增一次：事务执行期间开始的读取可能以新版本号缓存了旧数据
+            models.data_version.bump()
+            if notify_changes(self.db):
+                delta = StatsDelta()
+                for old_labels, new_labels in changed.values():
+                    delta.record(old_labels, new_labels)
+                publish_annotations("updated", list(changed), delta=delta)
+        
+        def result(annotation_id: int) -> schemas.AnnotationBatchResult:
+            row = rows.get(annotation_id)
+            if row is None:
+                return schemas.AnnotationBatchResult(id=annotation_id, ok=False, error="标注未找到")
+            labels = changed[annotation_id][1] if annotation_id in changed else row[1]
+            item = schemas.AnnotationDataResponse(id=annotation_id, text=row[0], labels=labels)
+            return schemas.AnnotationBatchResult(id=annotation_id, ok=True, item=item)
+        
+        return schemas.AnnotationBatchResponse(
+            items=[result(annotation_id) for annotation_id in batch_request.ids],
+            updates=[result(op.id) for op in batch_request.updates],
+        )
+    
     def search_annotations(self, search_request: schemas.SearchRequest) -> schemas.AnnotationDataList:
         """
         搜索和过滤标注数据。
         
+        始终返回完整字段（fields、text_max_chars 和 ids_only 只作用于 search_annotations_json）。
+        
         Args:
             search_request: 搜索参数
             
@@ -160,10 +296,7 @@ class AnnotationService:
         """
         # 使用复用的查询构建方法
         query = self._build_search_query(search_request)
-        
-        # 优化总数查询 - 使用 count() 子查询而非直接 count()
-        total_subquery = query.statement.with_only_columns(func.count()).order_by(None)
-        total = self.db.execute(total_subquery).scalar()
+        total = self._count_query(query)
         
         # 应用分页
         offset = (search_request.page - 1) * search_request.per_page
@@ -176,6 +309,124 @@ class AnnotationService:
             per_page=search_request.per_page
         )
     
+    def search_annotations_json(self, search_request: schemas.SearchRequest) -> bytes:
+        """
+        搜索标注数据并直接序列化为 JSON（快速路径）。
+        
+        只查询 (id, text, labels) 元组，跳过 ORM 对象构建和逐行的 Pydantic 校验，
+        标签按 validate_labels 的同一规则规范化。未选择字段时输出与 search_annotations 经
+        response_model 序列化的结果逐字节一致。
+        
+        - fields: 只查询并返回所选的列
+        - text_max_chars: 在 SQL 中用 substr 截断 text，长文本不会整段读入 Python
+        - ids_only: 返回 AnnotationIdList，全部匹配记录的 ID（最多 SEARCH_IDS_MAX_RESULTS 个）
+        
+        Args:
+            search_request: 搜索参数
+            
+        Returns:
+            AnnotationDataList（或 AnnotationIdList）格式的 JSON 字节串
+            
+        Raises:
+            ValueError: ids_only 时匹配记录超过 SEARCH_IDS_MAX_RESULTS
+        """
+        key = search_request.model_dump_json()
+        
+        def compute():
+            return run_single_flight(self.db, search_flight, ("json", key), lambda: self._search_json(search_request))
+        
+        if use_query_cache(self.db):
+            return search_cache.get_or_compute(key, compute)
+        return compute()
+    
+    def _search_json(self, search_request: schemas.SearchRequest) -> bytes:
+        query = self._build_search_query(search_request)
+        if search_request.ids_only:
+            return self._search_ids_json(query)
+        total = self._count_query(query)
+        
+        offset = (search_request.page - 1) * search_request.per_page
+        names, columns = self._search_columns(search_request)
+        query = query.with_entities(*columns)
+        if search_request.fields:
+            # 不查询 text 时 SQLite 可能改用 labels 上的覆盖索引，行序随之改变；按 ID 排序与完整查询的分页保持一致
+            query = query.order_by(AnnotationData.id)
+        rows = query.offset(offset).limit(search_request.per_page).all()
+        
+        normalize = schemas.normalize_labels
+        if names == ("text", "labels", "id"):
+            items = [{"text": text, "labels": normalize(labels), "id": id_} for text, labels, id_ in rows]
+        else:
+            items = [dict(zip(names, row)) for row in rows]
+            if "labels" in names:
+                for item in items:
+                    item["labels"] = normalize(item["labels"])
+        return fast_json.dumps({
+            "items": items,
+            "total": total,
+            "page": search_request.page,
+            "per_page": search_request.per_page,
+        })
+    
+    @staticmethod
+    def _search_columns(search_request: schemas.SearchRequest) -> Tuple[Tuple[str, ...], list]:
+        """搜索结果的字段名和对应的列，字段顺序与 AnnotationDataResponse 一致: text, labels, id"""
+        fields = search_request.fields or ("text", "labels", "id")
+        names, columns = [], []
+        if "text" in fields:
+            text = AnnotationData.text
+            if search_request.text_max_chars is not None:
+                # SQLite 的 substr 按字符截断，Python 只收到截断后的字符串
+                text = func.substr(AnnotationData.text, 1, search_request.text_max_chars)
+            names.append("text")
+            columns.append(text)
+        if "labels" in fields:
+            names.append("labels")
+            columns.append(AnnotationData.labels)
+        if "id" in fields:
+            names.append("id")
+            columns.append(AnnotationData.id)
+        return tuple(names), columns
+    
+    def _search_ids_json(self, query) -> bytes:
+        """全部匹配记录的 ID（升序），超过 SEARCH_IDS_MAX_RESULTS 时拒绝（不返回任意的部分结果）"""
+        # 不在 SQL 中排序：只查询 id 时 SQLite 可以扫描较小的覆盖索引，ORDER BY id 会迫使它扫描整张表；
+        # 多取一行即可判断是否超出上限
+        ids = [id_ for id_, in query.with_entities(AnnotationData.id).limit(SEARCH_IDS_MAX_RESULTS + 1)]
+        if len(ids) > SEARCH_IDS_MAX_RESULTS:
+            raise ValueError(f"匹配记录超过 {SEARCH_IDS_MAX_RESULTS} 条，请缩小筛选范围或改用按条件批量更新")
+        ids.sort()
+        return fast_json.dumps({"ids": ids, "total": len(ids)})
+    
+    def next_annotations(self, search_request: schemas.SearchRequest, after_id: int, limit: int) -> List[Dict]:
+        """
+        按 ID 顺序返回 after_id 之后符合搜索条件的标注（键集分页，忽略 page / per_page）。
+        
+        标注过程中条目不断离开“未标注”等筛选结果，按 OFFSET 翻页会跳过条目，按 ID 续取不受影响。
+        
+        Args:
+            search_request: 搜索条件
+            after_id: 上次返回的最大 ID
+            limit: 最多返回的条数
+            
+        Returns:
+            {"text", "labels", "id"} 字典列表，标签已规范化
+        """
+        rows = self._build_search_query(search_request).filter(
+            AnnotationData.id > after_id
+        ).order_by(AnnotationData.id).with_entities(
+            AnnotationData.id, AnnotationData.text, AnnotationData.labels
+        ).limit(limit).all()
+        normalize = schemas.normalize_labels
+        return [{"text": text, "labels": normalize(labels), "id": id_} for id_, text, labels in rows]
+    
+    def _count_query(self, query) -> int:
+        """统计查询的总行数：直接 SELECT count(*)，保留 FROM 子句避免子查询"""
+        total_statement = query.statement.with_only_columns(
+            func.count(), maintain_column_froms=True
+        ).order_by(None)
+        return self.db.execute(total_statement).scalar()
+    
     def bulk_label(self, bulk_request: schemas.BulkLabelRequest) -> int:
         """
         为多个文本应用标签（优化版本）。
@@ -195,6 +446,10 @@ class AnnotationService:
         )
         
         self.db.commit()
+        
+        # 没有读取旧标签，统计无法增量更新
+        if notify_changes(self.db):
+            publish_annotations("updated", list(bulk_request.text_ids), count=updated_count, stale=True)
         return updated_count
     
     def import_texts(self, import_request: schemas.TextImportRequest) -> int:
@@ -238,9 +493,17 @@ class AnnotationService:
         if new_annotations:
             self.db.bulk_insert_mappings(AnnotationData, new_annotations)
             self.db.commit()
+            self._publish_imported(len(new_annotations))
         
         return len(new_annotations)
 
+    def _publish_imported(self, count: int):
+        """批量插入的未标注文本（插入时不返回 ID）"""
+        if notify_changes(self.db):
+            delta = StatsDelta()
+            delta.total_texts = count
+            publish_annotations("created", None, count=count, delta=delta)
+
     def batch_create_annotations(self, annotations_data: List[schemas.AnnotationDataCreate]) -> int:
         """
         批量创建标注数据（新增方法）。
@@ -262,10 +525,11 @@ class AnnotationService:
             ).all()
             existing_texts = {record.text for record in existing_records}
         
-        # 准备新数据
+        # 准备新数据（同一批次内的重复文本只保留第一条）
         new_annotations = []
         for data in annotations_data:
             if data.text not in existing_texts:
+                existing_texts.add(data.text)
                 new_annotations.append({
                     'text': data.text,
                     'labels': data.labels or ''
@@ -275,6 +539,12 @@ class AnnotationService:
         if new_annotations:
             self.db.bulk_insert_mappings(AnnotationData, new_annotations)
             self.db.commit()
+            
+            if notify_changes(self.db):
+                delta = StatsDelta()
+                for annotation in new_annotations:
+                    delta.record_created(annotation['labels'])
+                publish_annotations("created", None, count=len(new_annotations), delta=delta)
         
         return len(new_annotations)
 
@@ -292,6 +562,8 @@ class AnnotationService:
         Returns:
             导入的新记录数量
         """
+        from tqdm import tqdm  # 仅文件导入需要进度条，避免拖慢服务启动
+
         # 第一次遍历：统计行数和读取文本
         print(f"正在分析文件: {file_path}")
         texts_to_import = []
@@ -347,6 +619,7 @@ class AnnotationService:
                 self.db.bulk_insert_mappings(AnnotationData, batch)
             
             self.db.commit()
+            self._publish_imported(len(new_annotations))
             print(f"成功导入 {len(new_annotations)} 条新记录")
         else:
             print("没有新记录需要导入")
@@ -460,6 +733,7 @@ class AnnotationService:
         
         # 3. 处理每条记录的标签更新
         updates = {}
+        delta = StatsDelta()
         for record in records:
             current_labels = parse_labels(record.labels)
             
@@ -477,6 +751,7 @@ class AnnotationService:
             # 只有当标签确实发生变化时才记录更新
             if record.labels != updated_labels:
                 updates[record.id] = updated_labels
+                delta.record(record.labels, updated_labels)
         
         # 4. 批量更新数据库
         if updates:
@@ -489,6 +764,9 @@ class AnnotationService:
                 )
             
             self.db.commit()
+            
+            if notify_changes(self.db):
+                publish_annotations("updated", list(updates), delta=delta)
         
         # 5. 构建响应消息
         operation_parts = []
@@ -556,16 +834,24 @@ class LabelService:
         self.db.commit()
         self.db.refresh(db_label)
         
+        if notify_changes(self.db):
+            publish_label("created", db_label.id)
+        
         return db_label
     
-    def get_all_labels(self) -> List[Label]:
+    def get_all_labels(self) -> List[schemas.LabelResponse]:
         """
-        获取所有标签。
+        获取所有标签（数据未变化时返回缓存）。
         
         Returns:
             所有标签的列表
         """
-        return self.db.query(Label).order_by(Label.id).all()
+        def load():
+            return [schemas.LabelResponse.model_validate(label) for label in self.db.query(Label).order_by(Label.id)]
+        
+        if use_query_cache(self.db):
+            return label_cache.get_or_compute("all", load)
+        return load()
     
     def get_label(self, label_id: int) -> Optional[Label]:
         """
@@ -614,6 +900,9 @@ class LabelService:
         self.db.commit()
         self.db.refresh(label)
         
+        if notify_changes(self.db):
+            publish_label("updated", label_id)
+        
         return label
     
     def delete_label(self, label_id: int) -> bool:
@@ -633,6 +922,9 @@ class LabelService:
         self.db.delete(label)
         self.db.commit()
         
+        if notify_changes(self.db):
+            publish_label("deleted", label_id)
+        
         return True
 
 
@@ -650,11 +942,19 @@ class StatisticsService:
     
     def get_system_stats(self) -> schemas.SystemStats:
         """
-        获取系统统计信息。
+        获取系统统计信息（数据未变化时返回缓存，并发的相同请求只统计一次）。
         
         Returns:
             系统统计数据
         """
+        def compute():
+            return run_single_flight(self.db, stats_flight, "system", self._compute_system_stats)
+        
+        if use_query_cache(self.db):
+            return stats_cache.get_or_compute("system", compute)
+        return compute()
+    
+    def _compute_system_stats(self) -> schemas.SystemStats:
         # 获取总文本数
         total_texts = self.db.query(AnnotationData).count()
         
@@ -0,0 +1,80 @@
+"""
+单飞（single-flight）执行模块
+
+相同键的并发调用只执行一次：第一个调用者执行，其余调用者等待并共享结果或异常。
+用于多人同时打开同一批数据时合并相同的搜索和统计查询（键包含数据版本，
+数据变化后到达的请求不会拿到旧结果）。
+"""
+
+import threading
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple, Type
+
+_flights: List["SingleFlight"] = []
+
+
+class _Call:
+    __slots__ = ("done", "value", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight:
+    """
+    按键合并并发调用（线程安全，供线程池中的同步端点使用）。
+
+    retry_on 中的异常只属于执行者本身（如执行者的客户端断开导致查询被中断），
+    等待者遇到这类异常时自己重新执行，而不是共享该异常。
+    """
+
+    def __init__(self, name: str, retry_on: Tuple[Type[BaseException], ...] = ()):
+        self.name = name
+        self.retry_on = retry_on
+        self.executions = 0
+        self.shared = 0
+        self._calls: Dict[Hashable, _Call] = {}
+        self._lock = threading.Lock()
+        _flights.append(self)
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        """
+        执行 fn，或等待正在执行的相同键调用并返回其结果。
+
+        Args:
+            key: 调用键（需包含影响结果的全部参数和数据版本）
+            fn: 无参数的执行函数
+        """
+        while True:
+            with self._lock:
+                call = self._calls.get(key)
+                leader = call is None
+                if leader:
+                    call = self._calls[key] = _Call()
+                    self.executions += 1
+                else:
+                    self.shared += 1
+
+            if leader:
+                try:
+                    call.value = fn()
+                    return call.value
+                except BaseException as e:
+                    call.error = e
+                    raise
+                finally:
+                    with self._lock:
+                        del self._calls[key]
+                    call.done.set()
+
+            call.done.wait()
+            if call.error is None:
+                return call.value
+            if not isinstance(call.error, self.retry_on):
+                raise call.error
+
+
+def flight_stats() -> Dict[str, Tuple[int, int]]:
+    """各单飞执行器的 (实际执行次数, 共享结果次数)"""
+    return {flight.name: (flight.executions, flight.shared) for flight in _flights}
@@ -0,0 +1,193 @@
+"""
+慢查询日志模块
+
+本模块提供以下功能：
+- 超过阈值的 SQL 记录到 LOG_DIR 下的滚动日志（参数中的文本已脱敏）
+- 每种查询形态首次变慢时自动捕获 EXPLAIN QUERY PLAN
+- 按查询形态聚合次数、总耗时和最大耗时，供 /debug/slow-queries 查询
+"""
+
+import json
+import logging
+import re
+import threading
+import time
+from datetime import datetime
+from logging.handlers import RotatingFileHandler
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import event
+
+from .config import (
+    LOG_DIR,
+    SLOW_QUERY_THRESHOLD_MS,
+    SLOW_QUERY_LOG_MAX_BYTES,
+    SLOW_QUERY_LOG_BACKUPS,
+    SLOW_QUERY_MAX_SHAPES,
+)
+
+logger = logging.getLogger(__name__)
+
+_IN_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_NUMBER = re.compile(r"(?<![\w.])\d+(?:\.\d+)?\b")
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_WHITESPACE = re.compile(r"\s+")
+_EXPLAINABLE = ("SELECT", "UPDATE", "DELETE", "INSERT", "WITH")
+
+
+def normalize_statement(statement: str) -> str:
+    """将 SQL 归一化为查询形态：合并空白，字面量替换为 ?，IN 列表折叠为 (?...)"""
+    shape = _WHITESPACE.sub(" ", statement).strip()
+    shape = _STRING.sub("?", shape)
+    shape = _NUMBER.sub("?", shape)
+    return _IN_LIST.sub("(?...)", shape)
+
+
+def redact_parameter(value: Any) -> Any:
+    """脱敏单个参数：文本只保留长度和 LIKE 通配符位置，数值和空值原样保留"""
+    if isinstance(value, str):
+        prefix = "%" if value.startswith("%") else ""
+        suffix = "%" if value.endswith("%") and len(value) > 1 else ""
+        return f"{prefix}<text:{len(value) - len(prefix) - len(suffix)}>{suffix}"
+    if isinstance(value, bytes):
+        return f"<bytes:{len(value)}>"
+    return value
+
+
+def redact_parameters(parameters: Any, executemany: bool = False) -> Any:
+    """脱敏绑定参数（executemany 只记录批次大小）"""
+    if executemany:
+        return f"<executemany:{len(parameters)}>"
+    if isinstance(parameters, dict):
+        return {key: redact_parameter(value) for key, value in parameters.items()}
+    if isinstance(parameters, (list, tuple)):
+        return [redact_parameter(value) for value in parameters]
+    return parameters
+
+
+class SlowQueryLog:
+    """
+    慢查询记录器。
+
+    记录在执行线程中同步完成：只有超过阈值的查询才会格式化和写日志，
+    EXPLAIN QUERY PLAN 每种形态只执行一次。
+    """
+
+    def __init__(self, threshold_ms: float = SLOW_QUERY_THRESHOLD_MS, max_shapes: int = SLOW_QUERY_MAX_SHAPES):
+        self.threshold_ms = threshold_ms
+        self.max_shapes = max_shapes
+        self._shapes: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self._file_logger: Optional[logging.Logger] = None
+
+    def _get_file_logger(self) -> logging.Logger:
+        """首次写入时创建滚动日志文件"""
+        if self._file_logger is None:
+            file_logger = logging.getLogger(f"{__name__}.file")
+            file_logger.propagate = False
+            file_logger.setLevel(logging.WARNING)
+            if not file_logger.handlers:
+                handler = RotatingFileHandler(
+                    LOG_DIR / "slow_queries.log",
+                    maxBytes=SLOW_QUERY_LOG_MAX_BYTES,
+                    backupCount=SLOW_QUERY_LOG_BACKUPS,
+                    encoding="utf-8",
+                )
+                handler.setFormatter(logging.Formatter("%(message)s"))
+                file_logger.addHandler(handler)
+            self._file_logger = file_logger
+        return self._file_logger
+
+    def _explain(self, cursor, statement: str, parameters: Any) -> Optional[List[str]]:
+        """在同一 DBAPI 连接上执行 EXPLAIN QUERY PLAN，失败时返回 None"""
+        if not statement.lstrip().upper().startswith(_EXPLAINABLE):
+            return None
+        try:
+            rows = cursor.connection.execute(f"EXPLAIN QUERY PLAN {statement}", parameters or ()).fetchall()
+        except Exception as e:
+            logger.debug(f"EXPLAIN QUERY PLAN 失败: {e}")
+            return None
+        # 行格式: (id, parent, notused, detail)
+        return [str(row[-1]) for row in rows]
+
+    def record(self, cursor, statement: str, parameters: Any, executemany: bool, elapsed_ms: float):
+        """记录一次慢查询"""
+        shape = normalize_statement(statement)
+        redacted = redact_parameters(parameters, executemany)
+
+        with self._lock:
+            need_plan = shape not in self._shapes
+        plan = self._explain(cursor, statement, parameters) if need_plan and not executemany else None
+
+        now = datetime.now().isoformat(timespec="seconds")
+        with self._lock:
+            entry = self._shapes.get(shape)
+            if entry is None:
+                if len(self._shapes) >= self.max_shapes:
+                    # 淘汰累计耗时最少的形态
+                    coldest = min(self._shapes, key=lambda key: self._shapes[key]["total_ms"])
+                    del self._shapes[coldest]
+                entry = self._shapes[shape] = {
+                    "shape": shape, "count": 0, "total_ms": 0.0, "max_ms": 0.0,
+                    "first_seen": now, "plan": None,
+                }
+            entry["count"] += 1
+            entry["total_ms"] += elapsed_ms
+            entry["last_seen"] = now
+            entry["last_parameters"] = redacted
+            if elapsed_ms > entry["max_ms"]:
+                entry["max_ms"] = elapsed_ms
+            if plan is not None:
+                entry["plan"] = plan
+            plan = entry["plan"]
+
+        self._get_file_logger().warning(json.dumps({
+            "time": now,
+            "elapsed_ms": round(elapsed_ms, 3),
+            "statement": _WHITESPACE.sub(" ", statement).strip(),
+            "parameters": redacted,
+            "plan": plan,
+        }, ensure_ascii=False, default=str))
+
+    def top(self, limit: int = 20, order_by: str = "total_ms") -> List[Dict[str, Any]]:
+        """按累计耗时（或 max_ms / count）返回前 N 个慢查询形态"""
+        with self._lock:
+            entries = [dict(entry) for entry in self._shapes.values()]
+        entries.sort(key=lambda entry: entry[order_by], reverse=True)
+        for entry in entries:
+            entry["total_ms"] = round(entry["total_ms"], 3)
+            entry["max_ms"] = round(entry["max_ms"], 3)
+            entry["avg_ms"] = round(entry["total_ms"] / entry["count"], 3)
+            entry["full_scan"] = any(line.startswith("SCAN") for line in entry["plan"] or [])
+        return entries[:limit]
+
+    def reset(self):
+        """清空聚合统计"""
+        with self._lock:
+            self._shapes.clear()
+
+
+slow_query_log = SlowQueryLog()
+
+
+def instrument_engine(engine, log: SlowQueryLog = slow_query_log):
+    """为引擎挂载慢查询记录"""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if context is not None:
+            context._slow_query_start = time.perf_counter()
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        start = getattr(context, "_slow_query_start", None)
+        if start is None:
+            return
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        if elapsed_ms >= log.threshold_ms:
+            try:
+                log.record(cursor, statement, parameters, executemany, elapsed_ms)
+            except Exception as e:
+                logger.warning(f"记录慢查询失败: {e}")
+
+    return engine
@@ -0,0 +1,101 @@
+"""
+启动耗时统计模块
+
+本模块提供以下功能：
+- 按阶段记录启动耗时（导入依赖、构建应用、首次使用时的延迟加载）
+- 按需导入较重的子系统并记录加载耗时
+
+本模块只依赖标准库，保证可以在任何服务端模块之前导入。
+"""
+
+import importlib
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from types import ModuleType
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# 近似为服务端代码开始加载的时间
+PROCESS_START = time.perf_counter()
+
+_phases: List[Dict[str, Any]] = []
+_phases_lock = threading.Lock()
+_loaded: Dict[str, ModuleType] = {}
+_import_lock = threading.Lock()
+
+
+def record_phase(name: str, seconds: float, lazy: bool = False):
+    """
+    记录一个阶段的耗时。
+
+    Args:
+        name: 阶段名称
+        seconds: 耗时（秒）
+        lazy: 是否为首次使用时的延迟加载
+    """
+    with _phases_lock:
+        _phases.append({
+            "phase": name,
+            "ms": round(seconds * 1000, 2),
+            "at_ms": round((time.perf_counter() - PROCESS_START) * 1000, 2),
+            "lazy": lazy,
+        })
+
+
+@contextmanager
+def phase(name: str, lazy: bool = False):
+    """计时上下文，退出时记录阶段耗时"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_phase(name, time.perf_counter() - start, lazy)
+
+
+def lazy_import(module_name: str, phase_name: str) -> ModuleType:
+    """
+    首次使用时导入模块并记录加载耗时，之后直接返回已加载的模块。
+
+    Args:
+        module_name: 模块全名
+        phase_name: 启动报告中的阶段名称
+
+    Returns:
+        已完成初始化的模块
+    """
+    module = _loaded.get(module_name)
+    if module is None:
+        with _import_lock:
+            module = _loaded.get(module_name)
+            if module is None:
+                with phase(phase_name, lazy=True):
+                    module = importlib.import_module(module_name)
+                _loaded[module_name] = module
+    return module
+
+
+def loaded_module(module_name: str) -> Optional[ModuleType]:
+    """返回已通过 lazy_import 加载完成的模块，尚未加载时返回 None（不会触发导入）"""
+    return _loaded.get(module_name)
+
+
+def startup_report() -> Dict[str, Any]:
+    """启动报告：各阶段耗时及延迟加载情况"""
+    with _phases_lock:
+        phases = [dict(p) for p in _phases]
+    eager = [p for p in phases if not p["lazy"]]
+    return {
+        "startup_ms": round(sum(p["ms"] for p in eager), 2),
+        "phases": phases,
+        "lazy_loaded": sorted(_loaded),
+    }
+
+
+def log_startup_report():
+    """将启动阶段耗时写入日志"""
+    report = startup_report()
+    details = ", ".join(f"{p['phase']} {p['ms']:.0f}ms" for p in report["phases"] if not p["lazy"])
+    logger.info(f"启动耗时 {report['startup_ms']:.0f}ms: {details}")
@@ -0,0 +1,197 @@
+"""
+前端静态资源模块
+
+本模块提供以下功能：
+- 启动时为 web/dist 下的文本资源生成 .gz / .br 预压缩文件（已是最新的跳过）
+- 优先返回预压缩文件的 StaticFiles，带 ETag 和 Cache-Control
+- 常驻内存的 index.html，支持 If-None-Match 返回 304
+
+/assets 下为 Vite 构建的带内容哈希的文件名，可以长期缓存（immutable）；
+index.html 和其他不带哈希的文件每次都需要用 ETag 重新验证。
+"""
+
+import hashlib
+import logging
+import mimetypes
+import os
+import threading
+from pathlib import Path
+from typing import Dict, Optional
+
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse, Response
+from starlette.staticfiles import NotModifiedResponse, StaticFiles
+
+from .compression import SUPPORTED_ENCODINGS, accepted_encodings, compress, is_compressible_type
+from .startup import phase
+
+logger = logging.getLogger(__name__)
+
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+REVALIDATE_CACHE_CONTROL = "no-cache"
+
+# 预压缩使用最高压缩级别，只在文件变化时执行一次
+_STATIC_LEVELS = {"br": 11, "gzip": 9}
+_SUFFIXES = {"br": ".br", "gzip": ".gz"}
+_PRECOMPRESS_MIN_SIZE = 256
+
+
+def _media_type(path: str) -> str:
+    return mimetypes.guess_type(path)[0] or "text/plain"
+
+
+def precompress_directory(directory: str, min_size: int = _PRECOMPRESS_MIN_SIZE) -> Dict[str, int]:
+    """
+    为目录下的文本资源生成预压缩文件。
+
+    预压缩文件与原文件同名加 .gz / .br 后缀，修改时间不早于原文件时视为最新；
+    压缩后反而更大的文件不生成。
+
+    Args:
+        directory: 静态资源目录
+        min_size: 小于该字节数的文件不压缩
+
+    Returns:
+        统计信息 {"written": 新生成数, "fresh": 已是最新数, "skipped": 压缩无收益数}
+    """
+    stats = {"written": 0, "fresh": 0, "skipped": 0}
+    for root, _, files in os.walk(directory):
+        for name in files:
+            if name.endswith((".gz", ".br", ".tmp")):
+                continue
+            path = os.path.join(root, name)
+            source_stat = os.stat(path)
+            if source_stat.st_size < min_size or not is_compressible_type(_media_type(name)):
+                continue
+            data = None
+            for encoding in SUPPORTED_ENCODINGS:
+                target = path + _SUFFIXES[encoding]
+                try:
+                    if os.stat(target).st_mtime >= source_stat.st_mtime:
+                        stats["fresh"] += 1
+                        continue
+                except FileNotFoundError:
+                    pass
+                if data is None:
+                    data = Path(path).read_bytes()
+                compressed = compress(data, encoding, _STATIC_LEVELS[encoding])
+                if len(compressed) >= len(data):
+                    stats["skipped"] += 1
+                    continue
+                temp = f"{target}.{os.getpid()}.tmp"
+                Path(temp).write_bytes(compressed)
+                os.replace(temp, target)
+                stats["written"] += 1
+    return stats
+
+
+def precompress_in_background(directory: str) -> threading.Thread:
+    """在后台线程中预压缩，不占用启动时间；完成前的请求由压缩中间件动态压缩"""
+
+    def run():
+        try:
+            with phase("预压缩静态资源", lazy=True):
+                stats = precompress_directory(directory)
+            logger.info(f"静态资源预压缩完成: 新生成 {stats['written']}，已是最新 {stats['fresh']}")
+        except OSError as e:
+            logger.warning(f"静态资源预压缩失败: {e}")
+
+    thread = threading.Thread(target=run, daemon=True, name="static-precompress")
+    thread.start()
+    return thread
+
+
+class PrecompressedStaticFiles(StaticFiles):
+    """
+    优先返回预压缩文件的静态文件服务。
+
+    客户端接受的编码有对应的最新预压缩文件时直接返回该文件（带 Content-Encoding），
+    否则返回原文件。
+    """
+
+    def __init__(self, *args, cache_control: str = REVALIDATE_CACHE_CONTROL, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.cache_control = cache_control
+
+    def file_response(self, full_path, stat_result: os.stat_result, scope, status_code: int = 200) -> Response:
+        request_headers = Headers(scope=scope)
+        full_path = str(full_path)
+        media_type = _media_type(full_path)
+        headers = {"cache-control": self.cache_control}
+        path, path_stat = full_path, stat_result
+
+        if is_compressible_type(media_type):
+            headers["vary"] = "Accept-Encoding"
+            for encoding in accepted_encodings(request_headers.get("accept-encoding", "")):
+                try:
+                    variant_stat = os.stat(full_path + _SUFFIXES[encoding])
+                except FileNotFoundError:
+                    continue
+                if variant_stat.st_mtime >= stat_result.st_mtime:
+                    path, path_stat = full_path + _SUFFIXES[encoding], variant_stat
+                    headers["content-encoding"] = encoding
+                    break
+
+        response = FileResponse(
+            path, status_code=status_code, stat_result=path_stat, media_type=media_type, headers=headers
+        )
+        if self.is_not_modified(response.headers, request_headers):
+            return NotModifiedResponse(response.headers)
+        return response
+
+
+class CachedIndexHtml:
+    """
+    常驻内存的 index.html。
+
+    首次请求时读取并生成各编码的压缩版本，之后只检查文件修改时间，
+    前端重新构建后自动重新加载。
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._mtime: Optional[float] = None
+        self._variants: Dict[Optional[str], bytes] = {}
+        self._etag = ""
+        self._lock = threading.Lock()
+
+    def _load(self, mtime: float):
+        data = Path(self.path).read_bytes()
+        variants = {None: data}
+        for encoding in SUPPORTED_ENCODINGS:
+            variants[encoding] = compress(data, encoding, _STATIC_LEVELS[encoding])
+        self._variants = variants
+        self._etag = hashlib.sha1(data).hexdigest()[:20]
+        self._mtime = mtime
+
+    def response(self, request_headers: Headers) -> Optional[Response]:
+        """
+        构建 index.html 响应。
+
+        Returns:
+            200 或 304 响应；文件不存在时返回 None
+        """
+        try:
+            mtime = os.stat(self.path).st_mtime
+        except FileNotFoundError:
+            return None
+        if mtime != self._mtime:
+            with self._lock:
+                if mtime != self._mtime:
+                    self._load(mtime)
+
+        encoding = next(iter(accepted_encodings(request_headers.get("accept-encoding", ""))), None)
+        etag = f'"{self._etag}-{encoding}"' if encoding else f'"{self._etag}"'
+        headers = {"etag": etag, "cache-control": REVALIDATE_CACHE_CONTROL, "vary": "Accept-Encoding"}
+
+        # 各编码版本内容相同，匹配任意一个即可返回 304
+        if_none_match = request_headers.get("if-none-match", "")
+        if if_none_match.strip() == "*" or any(
+            tag.strip().removeprefix("W/").strip('"').split("-")[0] == self._etag
+            for tag in if_none_match.split(",") if tag.strip()
+        ):
+            return Response(status_code=304, headers=headers)
+
+        if encoding:
+            headers["content-encoding"] = encoding
+        return Response(content=self._variants[encoding], media_type="text/html", headers=headers)
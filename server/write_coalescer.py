@@ -0,0 +1,230 @@
+"""
+单条标注写入合并模块
+
+多人快速点击标注时，每个 PUT /annotations/{id} 各自提交一次，提交时的日志同步占据了大部分耗时。
+本模块将标签更新交给后台写线程：
+- 同一标注的多次更新只保留最后一次（后写覆盖）
+- 第一条更新到达后最多等待 WRITE_COALESCE_MAX_DELAY_MS，或积累 WRITE_COALESCE_MAX_BATCH 个标注后，
+  在一个事务中提交
+- 调用者得到 Future，事务提交（按 WRITE_COALESCE_SYNCHRONOUS 落盘）之后才得到结果
+
+提交后递增数据版本，查询缓存和单飞合并随之使用新版本。
+"""
+
+import logging
+import threading
+import time
+from concurrent.futures import Future, InvalidStateError
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy import bindparam, select, update
+from sqlalchemy.pool import StaticPool
+
+from .config import WRITE_COALESCE_MAX_BATCH, WRITE_COALESCE_MAX_DELAY_MS, WRITE_COALESCE_SYNCHRONOUS
+from .data_version import DataVersion
+from .models import SQLITE_MAX_VARIABLES, AnnotationData, ensure_tables, immediate_transaction
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+_SYNCHRONOUS_MODES = ("OFF", "NORMAL", "FULL", "EXTRA")
+
+
+class WriterClosed(Exception):
+    """写入合并器已关闭，不再接受更新"""
+
+
+def _resolve(future: Future, result: Any = None, exception: Optional[BaseException] = None):
+    """设置 Future 的结果；调用者已取消（如客户端断开）或已得到结果时跳过"""
+    if future.done() or (not future.running() and not future.set_running_or_notify_cancel()):
+        return
+    try:
+        if exception is not None:
+            future.set_exception(exception)
+        else:
+            future.set_result(result)
+    except InvalidStateError:
+        pass
+
+
+class _Pending:
+    __slots__ = ("labels", "futures")
+
+    def __init__(self, labels: Optional[str]):
+        self.labels = labels
+        self.futures: List[Future] = []
+
+
+class WriteCoalescer:
+    """
+    标签更新的合并写入器（线程安全，写线程在第一次提交更新时启动）。
+
+    写线程独占一个连接，并在该连接上设置 synchronous；提交失败时本批次的所有 Future 都得到该异常，
+    写线程继续处理之后的批次。已取消的 Future（调用者不再等待）直接跳过。
+    每批提交后以 {标注 ID: (旧标签, 新标签)} 调用 on_commit（在写线程中）。
+    """
+
+    def __init__(self, engine, version: DataVersion, max_delay_ms: float = WRITE_COALESCE_MAX_DELAY_MS,
+                 max_batch: int = WRITE_COALESCE_MAX_BATCH, synchronous: str = WRITE_COALESCE_SYNCHRONOUS,
+                 on_commit: Optional[Callable[[Dict[int, Tuple[Optional[str], Optional[str]]]], None]] = None):
+        synchronous = synchronous.upper()
+        if synchronous not in _SYNCHRONOUS_MODES:
+            raise ValueError(f"不支持的 synchronous 设置: {synchronous}")
+        self.engine = engine
+        self.version = version
+        self.max_delay = max_delay_ms / 1000
+        self.max_batch = max(1, max_batch)
+        self.synchronous = synchronous
+        self.on_commit = on_commit
+        self._pending: Dict[int, _Pending] = {}
+        self._first_at = 0.0
+        self._cond = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._closed = False
+        self._conn = None
+
+    def submit(self, annotation_id: int, labels: Optional[str]) -> Future:
+        """
+        提交一次标签更新。
+
+        Args:
+            annotation_id: 标注 ID
+            labels: 新的标签字符串
+
+        Returns:
+            Future：提交后的标注 {"id", "text", "labels"}，标注不存在时为 None
+
+        Raises:
+            WriterClosed: 合并器已关闭
+        """
+        future: Future = Future()
+        with self._cond:
+            if self._closed:
+                raise WriterClosed("写入合并器已关闭")
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="write-coalescer", daemon=True)
+                self._thread.start()
+            metrics.write_coalesce_updates.inc("submitted")
+            pending = self._pending.get(annotation_id)
+            if pending is None:
+                pending = self._pending[annotation_id] = _Pending(labels)
+                if len(self._pending) == 1:
+                    self._first_at = time.monotonic()
+                    self._cond.notify()
+                elif len(self._pending) >= self.max_batch:
+                    self._cond.notify()
+            else:
+                # 尚未提交的旧值直接被覆盖，等待者都得到最终提交的结果
+                pending.labels = labels
+                metrics.write_coalesce_updates.inc("coalesced")
+            pending.futures.append(future)
+        return future
+
+    def close(self, timeout: Optional[float] = None):
+        """提交剩余的更新并停止写线程"""
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+            thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._pending and not self._closed:
+                    self._cond.wait()
+                if not self._pending:
+                    break
+                while not self._closed and len(self._pending) < self.max_batch:
+                    remaining = self._first_at + self.max_delay - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                batch, self._pending = self._pending, {}
+            try:
+                self._commit(batch)
+            except Exception as e:
+                # 单个批次出错不能终止写线程，否则之后的更新永远得不到结果
+                logger.exception("处理合并写入批次失败")
+                self._fail(batch, e)
+        self._discard_connection()
+
+    def _connection(self):
+        if self._conn is None:
+            ensure_tables()
+            self._conn = self.engine.connect()
+            self._conn.exec_driver_sql(f"PRAGMA synchronous={self.synchronous}")
+        return self._conn
+
+    def _discard_connection(self):
+        conn, self._conn = self._conn, None
+        if conn is None:
+            return
+        try:
+            # 连接带有本模块的 synchronous 设置，不放回连接池（内存数据库只有一个连接，不能丢弃）
+            if not isinstance(self.engine.pool, StaticPool):
+                conn.invalidate()
+            conn.close()
+        except Exception:
+            logger.exception("关闭写入合并连接失败")
+
+    def _commit(self, batch: Dict[int, _Pending]):
+        start = time.perf_counter()
+        try:
+            rows = self._write(batch)
+        except Exception as e:
+            logger.exception("合并写入 %d 条标注失败", len(batch))
+            self._discard_connection()
+            self._fail(batch, e)
+            return
+        # 提交之后再递增一次：事务执行期间开始的读取可能以新版本号缓存了旧数据
+        self.version.bump()
+        metrics.write_coalesce_batch_size.observe(len(batch))
+        metrics.write_coalesce_commit.observe(time.perf_counter() - start)
+
+        for annotation_id, pending in batch.items():
+            row = rows.get(annotation_id)
+            result = None if row is None else {"id": annotation_id, "text": row[0], "labels": pending.labels}
+            for future in pending.futures:
+                _resolve(future, result)
+
+        if self.on_commit is not None and rows:
+            try:
+                self.on_commit({annotation_id: (row[1], batch[annotation_id].labels) for annotation_id, row in rows.items()})
+            except Exception:
+                logger.exception("合并写入的提交回调失败")
+
+    @staticmethod
+    def _fail(batch: Dict[int, _Pending], exception: BaseException):
+        for pending in batch.values():
+            for future in pending.futures:
+                _resolve(future, exception=exception)
+
+    def _write(self, batch: Dict[int, _Pending]) -> Dict[int, Any]:
+        """在一个事务中更新本批次的标注，返回存在的标注 {id: (text, 更新前的 labels)}"""
+        conn = self._connection()
+        ids = list(batch)
+        rows: Dict[int, Any] = {}
+        try:
+            with immediate_transaction(conn):
+                for offset in range(0, len(ids), SQLITE_MAX_VARIABLES):
+                    chunk = ids[offset:offset + SQLITE_MAX_VARIABLES]
+                    for annotation_id, text, labels in conn.execute(
+                        select(AnnotationData.id, AnnotationData.text, AnnotationData.labels)
+                        .where(AnnotationData.id.in_(chunk))
+                    ):
+                        rows[annotation_id] = (text, labels)
+                params = [{"b_id": annotation_id, "b_labels": batch[annotation_id].labels}
+                          for annotation_id in ids if annotation_id in rows]
+                if params:
+                    conn.execute(
+                        update(AnnotationData).where(AnnotationData.id == bindparam("b_id"))
+                        .values(labels=bindparam("b_labels")),
+                        params,
+                    )
+        finally:
+            # 事务由上面的语句控制，这里只结束 SQLAlchemy 的连接状态
+            conn.commit()
+        return rows
+
@@ -0,0 +1,52 @@
+"""
+写入合并器测试
+
+运行:
+    uv run pytest tests/test_write_coalescer.py
+"""
+
+import asyncio
+
+import pytest
+
+from server import write_coalescer
+from server.data_version import DataVersion
+from server.models import AnnotationData, Base, create_db_engine
+from server.write_coalescer import WriteCoalescer
+
+
+@pytest.fixture
+def writer(monkeypatch):
+    """使用内存数据库的合并写入器（含一条标注）"""
+    engine = create_db_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    with engine.begin() as conn:
+        conn.execute(AnnotationData.__table__.insert(), [{"id": 1, "text": "示例文本", "labels": None}])
+    # 表已在内存数据库中创建，不访问应用数据库
+    monkeypatch.setattr(write_coalescer, "ensure_tables", lambda: None)
+    coalescer = WriteCoalescer(engine, DataVersion(engine), max_delay_ms=100)
+    yield coalescer
+    coalescer.close(timeout=5)
+
+
+def test_cancelled_waiter_does_not_stop_writer(writer):
+    """等待中的调用者被取消（如客户端断开）后，写线程继续处理之后的更新"""
+
+    async def scenario():
+        waiter = asyncio.ensure_future(asyncio.wrap_future(writer.submit(1, "a")))
+        await asyncio.sleep(0)
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        # 等待被取消的批次提交
+        await asyncio.sleep(0.3)
+        return await asyncio.wait_for(asyncio.wrap_future(writer.submit(1, "b")), timeout=5)
+
+    result = asyncio.run(scenario())
+    assert result == {"id": 1, "text": "示例文本", "labels": "b"}
+    assert writer._thread.is_alive()
+
+
+def test_missing_annotation_resolves_to_none(writer):
+    """不存在的标注得到 None"""
+    assert writer.submit(404, "a").result(timeout=5) is None
@@ -197,9 +197,26 @@ export function useBatchAnnotation() {
     return await updateLabelsBySelection({ removeLabels: labels })
   }
 
-  // 选择管理
-  const selectAll = () => {
-    state.selectedTextIds = state.filteredTexts.map(text => text.id)
+  // 选择管理：结果只有一页时直接选中当前页，否则获取全部匹配的 ID（跨页全选）
+  const selectAll = async () => {
+    if (state.totalCount <= state.filteredTexts.length) {
+      state.selectedTextIds = state.filteredTexts.map(text => text.id)
+      return
+    }
+
+    state.isLoading = true
+    try {
+      const result = await batchApi.filterIds(state.filterOptions)
+      state.selectedTextIds = result.ids
+      ElMessage.success(`已选择全部 ${result.total} 条匹配的文本`)
+    } catch (error: any) {
+      // 匹配记录过多时后端拒绝返回 ID，退回到选中当前页
+      state.selectedTextIds = state.filteredTexts.map(text => text.id)
+      ElMessage.warning(`无法选择全部匹配结果，已选择当前页: ${error.detail || error.message}`)
+      console.error('Select all error:', error)
+    } finally {
+      state.isLoading = false
+    }
   }
 
   const clearSelection = () => {
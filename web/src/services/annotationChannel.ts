@@ -0,0 +1,178 @@
+/**
+ * WebSocket 标注通道
+ * 在一个连接上批量提交标签修改、预取待标注条目、接收统计增量；未连接时标签修改回退到 HTTP
+ */
+
+import { apiService, annotationApi } from './api'
+import type { AnnotationDataResponse, ApiError, SearchRequest, SystemStats } from '@/types/api'
+
+export interface StatsDelta {
+  type: 'stats_delta'
+  labeled_texts: number
+  unlabeled_texts: number
+  labels: Record<string, number>
+}
+
+type OpResult =
+  | { id: number; ok: true; item: AnnotationDataResponse }
+  | { id: number; ok: false; error: string }
+
+interface PendingOp {
+  id: number
+  labels: string | null
+  resolve: (item: AnnotationDataResponse) => void
+  reject: (error: ApiError) => void
+}
+
+export class AnnotationChannel {
+  private socket: WebSocket | null = null
+  private seq = 0
+  private queued: PendingOp[] = []
+  private inflight = new Map<number, PendingOp[]>()
+  private flushTimer: ReturnType<typeof setTimeout> | null = null
+
+  onItems?: (items: AnnotationDataResponse[], done: boolean) => void
+  onStats?: (stats: SystemStats) => void
+  onStatsDelta?: (delta: StatsDelta) => void
+
+  /**
+   * @param batchDelayMs 标签修改合并发送的等待时间（毫秒）
+   */
+  constructor(private batchDelayMs = 20) {}
+
+  get connected(): boolean {
+    return this.socket?.readyState === WebSocket.OPEN
+  }
+
+  connect(): Promise<void> {
+    if (this.socket && this.socket.readyState <= WebSocket.OPEN) {
+      return Promise.resolve()
+    }
+    return new Promise((resolve, reject) => {
+      const socket = apiService.createAnnotationSocket()
+      this.socket = socket
+      socket.onopen = () => resolve()
+      socket.onerror = () => reject({ detail: '标注通道连接失败', status_code: 0 } as ApiError)
+      socket.onmessage = (event) => this.handleMessage(JSON.parse(event.data))
+      socket.onclose = () => this.handleClose(socket)
+    })
+  }
+
+  close() {
+    this.socket?.close()
+  }
+
+  /**
+   * 修改标签：连接可用时与其他修改合并发送，收到确认后返回更新后的标注
+   */
+  updateLabels(id: number, labels: string | null): Promise<AnnotationDataResponse> {
+    if (!this.connected) {
+      return annotationApi.update(id, { labels })
+    }
+    return new Promise((resolve, reject) => {
+      this.queued.push({ id, labels, resolve, reject })
+      if (this.flushTimer === null) {
+        this.flushTimer = setTimeout(() => this.flush(), this.batchDelayMs)
+      }
+    })
+  }
+
+  /**
+   * 设置待标注队列，服务端按 ID 顺序推送条目并在标注后自动补足
+   */
+  setQueue(filter: Omit<SearchRequest, 'page' | 'per_page'>, prefetch = 20) {
+    this.send({ type: 'queue', filter, prefetch })
+  }
+
+  next(count?: number) {
+    this.send({ type: 'next', count })
+  }
+
+  requestStats() {
+    this.send({ type: 'stats' })
+  }
+
+  private send(message: Record<string, unknown>) {
+    if (!this.connected) {
+      throw { detail: '标注通道未连接', status_code: 0 } as ApiError
+    }
+    this.socket!.send(JSON.stringify(message))
+  }
+
+  private flush() {
+    this.flushTimer = null
+    const ops = this.queued
+    this.queued = []
+    if (ops.length === 0) {
+      return
+    }
+    if (!this.connected) {
+      // 连接在等待期间断开：合并为一次批量请求回退到 HTTP
+      annotationApi.batch({ updates: ops.map(op => ({ id: op.id, labels: op.labels })) }).then(
+        response => response.updates.forEach((result, index) => {
+          if (result.ok && result.item) {
+            ops[index].resolve(result.item)
+          } else {
+            ops[index].reject({ detail: result.error || '标注未找到', status_code: 404 })
+          }
+        }),
+        error => ops.forEach(op => op.reject(error))
+      )
+      return
+    }
+    const seq = ++this.seq
+    this.inflight.set(seq, ops)
+    this.send({ type: 'ops', seq, ops: ops.map(op => ({ id: op.id, labels: op.labels })) })
+  }
+
+  private handleMessage(message: any) {
+    switch (message.type) {
+      case 'ack': {
+        const ops = this.inflight.get(message.seq) || []
+        this.inflight.delete(message.seq)
+        ;(message.results as OpResult[]).forEach((result, index) => {
+          const op = ops[index]
+          if (!op) return
+          if (result.ok) {
+            op.resolve(result.item)
+          } else {
+            op.reject({ detail: result.error, status_code: 404 })
+          }
+        })
+        break
+      }
+      case 'items':
+        this.onItems?.(message.items, message.done)
+        break
+      case 'stats':
+        this.onStats?.(message.stats)
+        break
+      case 'stats_delta':
+        this.onStatsDelta?.(message as StatsDelta)
+        break
+      case 'error': {
+        const ops = this.inflight.get(message.seq)
+        if (ops) {
+          this.inflight.delete(message.seq)
+          const status = message.retry_after != null ? 503 : 400
+          ops.forEach(op => op.reject({ detail: message.detail, status_code: status }))
+        } else {
+          console.error('[标注通道]', message.detail)
+        }
+        break
+      }
+    }
+  }
+
+  private handleClose(socket: WebSocket) {
+    if (this.socket === socket) {
+      this.socket = null
+    }
+    // 已发送但未确认的修改结果未知，交给调用方处理
+    this.inflight.forEach(ops => ops.forEach(op => op.reject({ detail: '标注通道已断开', status_code: 0 })))
+    this.inflight.clear()
+  }
+}
+
+// 创建单例实例
+export const annotationChannel = new AnnotationChannel()
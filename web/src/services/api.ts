@@ -8,6 +8,9 @@ import type {
   AnnotationDataCreate,
   AnnotationDataUpdate,
   AnnotationDataResponse,
+  AnnotationBatchRequest,
+  AnnotationBatchResponse,
+  AnnotationIdList,
   AnnotationDataList,
   LabelCreate,
   LabelUpdate,
@@ -35,12 +38,25 @@ export interface GenerateRequest {
   parse_regex?: string
   temperature?: number
   max_tokens?: number
+  dedup_mode?: 'off' | 'flag' | 'retry'
+  cache_policy?: 'auto' | 'use' | 'refresh' | 'off'
+  stream_tokens?: boolean
 }
 
 export interface GeneratedText {
   text: string
   labels?: string
   raw_output: string
+  duplicate_of?: 'task' | 'corpus' | null
+  cached?: boolean
+}
+
+// stream_tokens 开启时流中穿插的 token 增量事件
+export interface GenerateDeltaEvent {
+  type: 'delta'
+  index: number
+  attempt: number
+  delta: string
 }
 
 export interface GenerateResponse {
@@ -50,6 +66,17 @@ export interface GenerateResponse {
   error?: string
 }
 
+export interface GenerateImportRequest {
+  parse_regex?: string
+  indices?: number[]
+}
+
+export interface GenerateImportResponse {
+  task_id: string
+  imported_count: number
+  skipped_count: number
+}
+
 export interface GenerateStatus {
   status: string
   progress: number
@@ -57,6 +84,13 @@ export interface GenerateStatus {
   total_count: number
   message?: string
   error?: string
+  duplicate_count?: number
+  task_duplicate_count?: number
+  corpus_duplicate_count?: number
+  retry_count?: number
+  dedup_hit_rate?: number
+  cache_hits?: number
+  cache_misses?: number
 }
 
 class ApiService {
@@ -125,6 +159,11 @@ class ApiService {
     return response.data
   }
 
+  async batchAnnotations(data: AnnotationBatchRequest): Promise<AnnotationBatchResponse> {
+    const response = await this.axiosInstance.post<AnnotationBatchResponse>('/annotations/batch', data)
+    return response.data
+  }
+
   async deleteAnnotation(id: number): Promise<void> {
     await this.axiosInstance.delete(`/annotations/${id}`)
   }
@@ -140,6 +179,12 @@ class ApiService {
     return response.data
   }
 
+  // 只返回全部匹配记录的 ID（忽略分页）
+  async searchAnnotationIds(searchParams: AdvancedSearchRequest): Promise<AnnotationIdList> {
+    const response = await this.axiosInstance.post<AnnotationIdList>('/annotations/search', { ...searchParams, ids_only: true })
+    return response.data
+  }
+
   async bulkLabelAnnotations(data: BulkLabelRequest): Promise<{ updated_count: number }> {
     const response = await this.axiosInstance.post<{ updated_count: number }>('/annotations/bulk-label', data)
     return response.data
@@ -239,9 +284,23 @@ class ApiService {
     return response.data
   }
 
+  async importGenerationResults(taskId: string, data: GenerateImportRequest = {}): Promise<GenerateImportResponse> {
+    const response = await this.axiosInstance.post<GenerateImportResponse>(`/generate/import/${taskId}`, data)
+    return response.data
+  }
+
   createGenerationEventSource(taskId: string): EventSource {
     return new EventSource(`${this.axiosInstance.defaults.baseURL}/generate/stream/${taskId}`)
   }
+
+  createChangeEventSource(): EventSource {
+    return new EventSource(`${this.axiosInstance.defaults.baseURL}/events`)
+  }
+
+  createAnnotationSocket(): WebSocket {
+    const baseURL = this.axiosInstance.defaults.baseURL || window.location.origin
+    return new WebSocket(`${baseURL.replace(/^http/, 'ws')}/ws/annotations`)
+  }
 }
 
 // 创建单例实例
@@ -253,8 +312,10 @@ export const annotationApi = {
   get: (id: number) => apiService.getAnnotation(id),
   update: (id: number, data: AnnotationDataUpdate) => apiService.updateAnnotation(id, data),
   delete: (id: number) => apiService.deleteAnnotation(id),
+  batch: (data: AnnotationBatchRequest) => apiService.batchAnnotations(data),
   search: (params: SearchRequest) => apiService.searchAnnotations(params),
   advancedSearch: (params: AdvancedSearchRequest) => apiService.advancedSearchAnnotations(params),
+  searchIds: (params: AdvancedSearchRequest) => apiService.searchAnnotationIds(params),
   bulkLabel: (data: BulkLabelRequest) => apiService.bulkLabelAnnotations(data),
   bulkUpdateLabels: (data: BulkUpdateLabelsRequest) => apiService.bulkUpdateLabels(data),
   importTexts: (data: TextImportRequest) => apiService.importTexts(data)
@@ -288,5 +349,6 @@ export const generateApi = {
   cancel: (taskId: string) => apiService.cancelGeneration(taskId),
   getStatus: (taskId: string) => apiService.getGenerationStatus(taskId),
   getResults: (taskId: string) => apiService.getGenerationResults(taskId),
+  importResults: (taskId: string, data?: GenerateImportRequest) => apiService.importGenerationResults(taskId, data),
   createEventSource: (taskId: string) => apiService.createGenerationEventSource(taskId)
 } 
\ No newline at end of file
@@ -9,7 +9,8 @@ import type {
   BulkUpdateLabelsRequest,
   BulkUpdateLabelsResponse,
   AnnotationDataList,
-  AnnotationDataResponse
+  AnnotationDataResponse,
+  AnnotationIdList
 } from '@/types/api'
 
 export interface BatchFilterOptions {
@@ -57,6 +58,21 @@ export class BatchAnnotationService {
     return await annotationApi.advancedSearch(searchParams)
   }
 
+  /**
+   * 获取全部符合筛选条件的文本 ID（用于跨页全选）
+   * @param options 筛选条件（忽略分页）
+   * @returns 文本 ID 列表和总数
+   */
+  async filterTextIds(options: BatchFilterOptions): Promise<AnnotationIdList> {
+    return await annotationApi.searchIds({
+      keywords: options.includeKeywords || undefined,
+      exclude_keywords: options.excludeKeywords || undefined,
+      labels: options.includeLabels?.join(',') || undefined,
+      exclude_labels: options.excludeLabels?.join(',') || undefined,
+      unlabeled_only: options.unlabeledOnly
+    })
+  }
+
   /**
    * 通过搜索条件批量更新标签
    * @param filterOptions 筛选条件
@@ -180,6 +196,7 @@ export const batchAnnotationService = new BatchAnnotationService()
 export const batchApi = {
   // 筛选相关
   filter: (options: BatchFilterOptions) => batchAnnotationService.filterTexts(options),
+  filterIds: (options: BatchFilterOptions) => batchAnnotationService.filterTextIds(options),
   preview: (options: BatchFilterOptions) => batchAnnotationService.previewFilter(options),
   
   // 批量更新相关
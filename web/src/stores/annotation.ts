@@ -5,6 +5,7 @@
 import { defineStore } from 'pinia'
 import { ref, computed } from 'vue'
 import { annotationApi } from '@/services/api'
+import { annotationChannel } from '@/services/annotationChannel'
 import type {
   AnnotationDataResponse,
   AnnotationDataList,
@@ -72,7 +73,10 @@ export const useAnnotationStore = defineStore('annotation', () => {
   const updateAnnotation = async (id: number, data: AnnotationDataUpdate) => {
     try {
       setLoading(true)
-      const updatedAnnotation = await annotationApi.update(id, data)
+      // 只修改标签时走标注通道（已连接时与其他修改合并发送），否则走 HTTP
+      const updatedAnnotation = data.labels !== undefined
+        ? await annotationChannel.updateLabels(id, data.labels)
+        : await annotationApi.update(id, data)
       const index = annotations.value.findIndex(a => a.id === id)
       if (index !== -1) {
         annotations.value[index] = updatedAnnotation
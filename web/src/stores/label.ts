@@ -4,8 +4,8 @@
 
 import { defineStore } from 'pinia'
 import { ref, computed } from 'vue'
-import { labelApi, statsApi } from '@/services/api'
-import type { LabelResponse, LabelCreate, LabelUpdate, SystemStats, LabelStats } from '@/types/api'
+import { apiService, labelApi, statsApi } from '@/services/api'
+import type { LabelResponse, LabelCreate, LabelUpdate, SystemStats, LabelStats, StatsDeltaEvent } from '@/types/api'
 
 export const useLabelStore = defineStore('label', () => {
   // 状态
@@ -13,6 +13,8 @@ export const useLabelStore = defineStore('label', () => {
   const loading = ref(false)
   const systemStats = ref<SystemStats | null>(null)
   const searchQuery = ref('')
+  // /events 变化通知连接（连接期间统计随事件增量更新，不再在每次操作后重新请求）
+  let changeEvents: EventSource | null = null
 
   // 计算属性
   const hasLabels = computed(() => labels.value.length > 0)
@@ -112,7 +114,7 @@ export const useLabelStore = defineStore('label', () => {
       const newLabel = await labelApi.create(data)
       labels.value.push(newLabel)
       // 创建标签后刷新统计数据
-      await fetchSystemStats()
+      if (!changeEvents) await fetchSystemStats()
       return newLabel
     } catch (error) {
       console.error('创建标签失败:', error)
@@ -131,7 +133,7 @@ export const useLabelStore = defineStore('label', () => {
         labels.value[index] = updatedLabel
       }
       // 更新标签后刷新统计数据
-      await fetchSystemStats()
+      if (!changeEvents) await fetchSystemStats()
       return updatedLabel
     } catch (error) {
       console.error('更新标签失败:', error)
@@ -147,7 +149,7 @@ export const useLabelStore = defineStore('label', () => {
       await labelApi.delete(id)
       labels.value = labels.value.filter(label => label.id !== id)
       // 删除标签后刷新统计数据
-      await fetchSystemStats()
+      if (!changeEvents) await fetchSystemStats()
     } catch (error) {
       console.error('删除标签失败:', error)
       throw error
@@ -168,6 +170,52 @@ export const useLabelStore = defineStore('label', () => {
     return labelStatsMap.value.get(labelName) || null
   }
 
+  // 将统计增量应用到已加载的系统统计
+  const applyStatsDelta = (delta: StatsDeltaEvent) => {
+    const stats = systemStats.value
+    if (!stats) return
+    stats.total_texts += delta.total_texts
+    stats.labeled_texts += delta.labeled_texts
+    stats.unlabeled_texts += delta.unlabeled_texts
+    stats.total_labels += delta.total_labels
+    Object.entries(delta.labels).forEach(([label, change]) => {
+      const item = stats.label_statistics.find(stat => stat.label === label)
+      if (item) {
+        item.count += change
+      } else if (change > 0) {
+        stats.label_statistics.push({ label, count: change })
+      }
+    })
+    stats.label_statistics = stats.label_statistics
+      .filter(stat => stat.count > 0)
+      .sort((a, b) => b.count - a.count)
+  }
+
+  // 订阅数据变化通知：统计增量直接应用，标签目录变化或需要重新同步时重新请求
+  const watchChanges = () => {
+    if (changeEvents) return
+    changeEvents = apiService.createChangeEventSource()
+    changeEvents.addEventListener('stats', (event) => {
+      const data = JSON.parse((event as MessageEvent).data)
+      if (data.stale) {
+        fetchSystemStats().catch(() => {})
+      } else {
+        applyStatsDelta(data)
+      }
+    })
+    changeEvents.addEventListener('labels', () => {
+      fetchLabels().catch(() => {})
+    })
+    changeEvents.addEventListener('resync', () => {
+      Promise.all([fetchLabels(), fetchSystemStats()]).catch(() => {})
+    })
+  }
+
+  const stopWatchingChanges = () => {
+    changeEvents?.close()
+    changeEvents = null
+  }
+
   // 初始化数据
   const initializeData = async () => {
     await Promise.all([
@@ -201,6 +249,8 @@ export const useLabelStore = defineStore('label', () => {
     getLabelStats,
     setLoading,
     setSearchQuery,
-    initializeData
+    initializeData,
+    watchChanges,
+    stopWatchingChanges
   }
 }) 
\ No newline at end of file
@@ -15,6 +15,28 @@ export interface AnnotationDataUpdate {
   labels?: string | null
 }
 
+export interface AnnotationLabelOp {
+  id: number
+  labels: string | null
+}
+
+export interface AnnotationBatchRequest {
+  ids?: number[]
+  updates?: AnnotationLabelOp[]
+}
+
+export interface AnnotationBatchResult {
+  id: number
+  ok: boolean
+  item: AnnotationDataResponse | null
+  error: string | null
+}
+
+export interface AnnotationBatchResponse {
+  items: AnnotationBatchResult[]
+  updates: AnnotationBatchResult[]
+}
+
 export interface AnnotationDataResponse extends AnnotationDataBase {
   id: number
 }
@@ -74,6 +96,14 @@ export interface AdvancedSearchRequest {
   unlabeled_only?: boolean
   page?: number
   per_page?: number
+  fields?: Array<'id' | 'text' | 'labels'> | null  // 只返回所选字段（默认全部）
+  text_max_chars?: number | null     // text 最多返回的字符数（服务端截断）
+}
+
+// 只返回 ID 的搜索结果（全选）
+export interface AnnotationIdList {
+  ids: number[]
+  total: number
 }
 
 // 批量标签更新相关类型
@@ -124,6 +154,16 @@ export interface ApiResponse<T = any> {
 }
 
 // API错误类型
+// /events 推送的统计增量
+export interface StatsDeltaEvent {
+  version: number
+  total_texts: number
+  labeled_texts: number
+  unlabeled_texts: number
+  total_labels: number
+  labels: Record<string, number>
+}
+
 export interface ApiError {
   detail: string
   status_code?: number